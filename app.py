@@ -1,6 +1,6 @@
 import streamlit as st
 
-from utils.session import initialize_session_state_variables
+from utils.session import initialize_session_state_variables, session_memory_usage
 
 # define pages
 landing_page = st.Page("landing.py", title="Hello", icon="👋")
@@ -47,5 +47,13 @@ st.set_page_config(
     page_icon="👋",
 )
 
-pg.run()
 initialize_session_state_variables()
+
+# per-session memory report, computed on request since measuring large tables takes a moment
+with st.sidebar.expander("Session Memory"):
+    if st.button("Measure Session Memory"):
+        memory_usage = session_memory_usage()
+        st.markdown(f"**Total:** {sum(memory_usage.values()) / 2**10:,.1f} KB")
+        st.markdown("\n".join(f"- {key}: {size / 2**10:,.1f} KB" for key, size in memory_usage.items() if not key.startswith('_')))
+
+pg.run()
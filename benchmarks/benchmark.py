@@ -0,0 +1,458 @@
+"""
+Headless benchmarks for the non-UI paths of the web workflow.
+
+Usage (from the repository root):
+    python -m benchmarks.benchmark run --sizes small medium --output bench.json
+    python -m benchmarks.benchmark imports
+    python -m benchmarks.benchmark compare baseline.json bench.json --threshold 0.2
+    python -m benchmarks.benchmark fastpath --sizes small medium
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# size presets: (number of banks, number of accounts, number of transactions)
+SIZES = {
+    'small': (5, 10, 1_000),
+    'medium': (10, 50, 5_000),
+    'large': (25, 200, 20_000),
+}
+
+SIM_PARAMETERS = {
+    'Opening Time': '08:00',
+    'Closing Time': '17:00',
+    'Processing Window': 15,
+    'Number of Days': 1,
+    'EOD Clear Queue': False,
+    'EOD Force Settlement': False
+}
+
+# modules whose cold import time is reported: Streamlit itself, what the app imports when a session starts,
+# and what running a simulation pulls in
+STARTUP_MODULES = ['streamlit', 'utils.session', 'core.settings', 'core.runner']
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generate_inputs(num_banks: int, num_accounts: int, num_transactions: int, seed: int = 0, num_days: int = 1):
+    """Builds synthetic Banks, Accounts and Transactions frames of the requested size."""
+    from utils.generator import generate_transactions
+
+    df_banks = pd.DataFrame({'name': [f'b{i}' for i in range(num_banks)]})
+    df_accounts = pd.DataFrame({
+        'id': [f'acc{i}' for i in range(num_accounts)],
+        'owner': [f'b{i % num_banks}' for i in range(num_accounts)],
+        'balance': 1000
+    })
+    df_transactions = generate_transactions(
+        df_accounts,
+        num_transactions,
+        open_time=SIM_PARAMETERS['Opening Time'],
+        close_time=SIM_PARAMETERS['Closing Time'],
+        num_days=num_days,
+        seed=seed
+    )
+    return df_banks, df_accounts, df_transactions
+
+
+class PeakMemorySampler:
+    """
+    Samples the resident set size of the process in a background thread to find the peak memory used by a step.
+    Native allocations (e.g. numpy and pandas buffers) are included, which tracemalloc does not fully capture.
+    """
+
+    STATM_PATH = '/proc/self/statm'
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+        self._stop = threading.Event()
+        self._thread = None
+        self.baseline = 0
+        self.peak = 0
+
+    @classmethod
+    def is_supported(cls) -> bool:
+        return os.path.exists(cls.STATM_PATH)
+
+    def _rss(self) -> int:
+        with open(self.STATM_PATH) as f:
+            return int(f.read().split()[1]) * self.page_size
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.baseline = self.peak = self._rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+    @property
+    def peak_increase(self) -> int:
+        return self.peak - self.baseline
+
+
+def measure(step: Callable[[], object], repeat: int = 1, track_memory: bool = True) -> Dict[str, float]:
+    """
+    Times a benchmark step and measures its peak memory.
+    Wall time is the best of `repeat` runs. Peak memory is the largest increase in resident memory over the step,
+    sampled during the timed runs where /proc is available. Elsewhere, it comes from one additional run traced
+    with tracemalloc, since tracing slows down pure Python code considerably.
+    """
+    use_sampler = track_memory and PeakMemorySampler.is_supported()
+    wall_times = []
+    peak_increase = 0
+    for _ in range(repeat):
+        if use_sampler:
+            with PeakMemorySampler() as sampler:
+                start = time.perf_counter()
+                step()
+                wall_times.append(time.perf_counter() - start)
+            peak_increase = max(peak_increase, sampler.peak_increase)
+        else:
+            start = time.perf_counter()
+            step()
+            wall_times.append(time.perf_counter() - start)
+
+    result = {'wall_time_s': min(wall_times)}
+    if track_memory and not use_sampler:
+        tracemalloc.start()
+        try:
+            step()
+            _, peak_increase = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    if track_memory:
+        result['peak_memory_mb'] = peak_increase / 2**20
+    return result
+
+
+def measure_import_time(module: str, repeat: int = 1) -> Dict[str, float]:
+    """
+    Measures the cold import time of a module in a fresh interpreter, using Python's -X importtime.
+    The cumulative time of the module, including everything it imports, is the best of `repeat` runs.
+    """
+    import_times = []
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=REPOSITORY_ROOT, capture_output=True, text=True, check=True
+        )
+        # lines are formatted as "import time: <self us> | <cumulative us> | <module>", nested imports are indented
+        cumulative_us = [
+            int(line.split('|')[1]) for line in completed.stderr.splitlines()
+            if line.startswith('import time:') and line.split('|')[2].rstrip() == f' {module}'
+        ]
+        import_times.append(max(cumulative_us) / 1e6)
+    return {'wall_time_s': min(import_times)}
+
+
+def run_import_benchmarks(modules: List[str] = STARTUP_MODULES, repeat: int = 1) -> List[dict]:
+    """Reports the cold import time of each module, to catch heavy dependencies creeping into app startup."""
+    results = []
+    for module in modules:
+        measurement = measure_import_time(module, repeat)
+        results.append({'size': 'startup', 'step': f'import {module}', **measurement})
+        print(f"{'startup':>8} {'import ' + module:<32} {measurement['wall_time_s']:>10.4f}s")
+    return results
+
+
+def build_steps(size: str, workdir: str) -> Dict[str, Callable[[], object]]:
+    """Creates the benchmark steps for one input size. Steps run in order and may depend on earlier steps."""
+    from core.config import SimulationConfig
+    from core.fastpath import FastSimulation
+    from core.indicators import calculate_turnover_ratios, calculate_avg_pmt_delay
+    from core.logs import load_simulation_logs, delete_log_files
+    from core.runner import build_simulation
+    from core.settings import write_settings_bundle, read_settings_bundle
+    from utils.file import check_missing_headers
+
+    num_banks, num_accounts, num_transactions = SIZES[size]
+    state = {}
+
+    def generate():
+        state['inputs'] = generate_inputs(num_banks, num_accounts, num_transactions)
+        # csv payloads as they would be uploaded on the Input Data page
+        state['uploads'] = [df.to_csv(index=False).encode('utf-8') for df in state['inputs']]
+
+    def ingest():
+        # mirrors the Input Data page: parse the uploaded csv files and validate their headers
+        required_headers = [['name'], ['id', 'owner', 'balance'], ['sender_account', 'recipient_account', 'amount', 'time']]
+        for upload, headers in zip(state['uploads'], required_headers):
+            check_missing_headers(pd.read_csv(io.BytesIO(upload)), headers)
+
+    def simulate():
+        df_banks, df_accounts, df_transactions = state['inputs']
+        state['config'] = SimulationConfig(parameters=dict(SIM_PARAMETERS), banks=df_banks, accounts=df_accounts, transactions=df_transactions)
+        delete_log_files(log_dir=workdir)
+        build_simulation(state['config'], log_dir=workdir).run()
+
+    def fast_simulate():
+        # the same run on the vectorized fast path, which the default agents qualify for; its logs are loaded next
+        delete_log_files(log_dir=workdir)
+        FastSimulation(state['config'], log_dir=workdir).run()
+
+    def load_logs():
+        state['logs'] = load_simulation_logs(log_dir=workdir)
+
+    def turnover_ratios():
+        calculate_turnover_ratios(
+            state['logs']['Processed Transactions'],
+            state['logs']['Account Balance'],
+            SIM_PARAMETERS['Opening Time'],
+            SIM_PARAMETERS['Closing Time'],
+            SIM_PARAMETERS['Processing Window'],
+            SIM_PARAMETERS['Number of Days']
+        )
+
+    def payment_delay():
+        # delay is measured from submission: arrivals within a window are settled at the window's start time,
+        # so delays measured from arrival are only defined for window-aligned arrival times
+        calculate_avg_pmt_delay(
+            state['logs']['Processed Transactions'],
+            SIM_PARAMETERS['Opening Time'],
+            SIM_PARAMETERS['Closing Time'],
+            SIM_PARAMETERS['Processing Window'],
+            SIM_PARAMETERS['Number of Days']
+        )
+
+    def settings_save():
+        state['settings_counter'] = state.get('settings_counter', 0) + 1
+        state['settings_path'] = write_settings_bundle(
+            state['config'],
+            f'benchmark_{size}_{state["settings_counter"]}',
+            include_data=True,
+            save_folder=os.path.join(workdir, 'saved_settings')
+        )
+
+    def settings_import():
+        # reads the settings with their data, as needed to run them; agents are compiled when first used
+        read_settings_bundle(state['settings_path']).apply_to_session_state({})
+
+    return {
+        'generate': generate,
+        'ingest': ingest,
+        'simulation': simulate,
+        'fast_simulation': fast_simulate,
+        'log_loading': load_logs,
+        'turnover_ratio': turnover_ratios,
+        'payment_delay': payment_delay,
+        'settings_save': settings_save,
+        'settings_import': settings_import,
+    }
+
+
+def run_benchmarks(sizes: List[str], repeat: int = 1, track_memory: bool = True) -> dict:
+    """Measures the startup import times, runs every benchmark step for each size and returns a machine-readable report."""
+    results = run_import_benchmarks(repeat=repeat)
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            for step_name, step in build_steps(size, workdir).items():
+                measurement = measure(step, repeat, track_memory)
+                results.append({'size': size, 'step': step_name, **measurement})
+                print(f"{size:>8} {step_name:<32} {measurement['wall_time_s']:>10.4f}s"
+                      + (f" {measurement['peak_memory_mb']:>10.2f} MB" if 'peak_memory_mb' in measurement else ''))
+
+    return {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'repeat': repeat,
+            'sizes': {size: dict(zip(['banks', 'accounts', 'transactions'], SIZES[size])) for size in sizes},
+        },
+        'results': results
+    }
+
+
+def fast_path_scenarios(size: str) -> Dict[str, object]:
+    """
+    Configurations that qualify for the fast path, covering settlement from balances, intraday credit and its repayment,
+    time-of-day fee rates and the end-of-day queue clearing.
+    """
+    import inspect
+    import textwrap
+    from PSSimPy.credit_facilities import SimplePriced
+    from core.config import AgentSpec, SimulationConfig
+    from core.fees import ScheduledTransactionFee
+
+    num_banks, num_accounts, num_transactions = SIZES[size]
+    parameters = dict(SIM_PARAMETERS, **{'Number of Days': 2, 'EOD Force Settlement': True})
+    df_banks, df_accounts, df_transactions = generate_inputs(num_banks, num_accounts, num_transactions, num_days=2)
+    low_balances = df_accounts.assign(balance=df_accounts['balance'] // 10)
+    priced_code = '\n\n'.join(
+        textwrap.dedent(inspect.getsource(getattr(SimplePriced, method))) for method in ('calculate_fee', 'lend_credit', 'collect_repayment')
+    )
+    scheduled_fee = AgentSpec(textwrap.dedent(inspect.getsource(ScheduledTransactionFee.calculate_fee)), base=ScheduledTransactionFee.__name__)
+    return {
+        'default agents': SimulationConfig(parameters=parameters, banks=df_banks, accounts=df_accounts, transactions=df_transactions),
+        'scheduled fee rate': SimulationConfig(parameters=parameters, banks=df_banks, accounts=low_balances, transactions=df_transactions,
+                                               transaction_fee_rate={'08:00': 0.001, '12:00': 0.002, '15:30': 0.0005},
+                                               transaction_fee=scheduled_fee),
+        'EOD queue clearing': SimulationConfig(parameters=dict(parameters, **{'EOD Clear Queue': True, 'EOD Force Settlement': False}),
+                                               banks=df_banks, accounts=low_balances, transactions=df_transactions),
+        'intraday credit': SimulationConfig(parameters=parameters, banks=df_banks, accounts=low_balances, transactions=df_transactions,
+                                            transaction_fee_rate=0.001),
+        'priced credit': SimulationConfig(
+            parameters=parameters, banks=df_banks, accounts=low_balances, transactions=df_transactions.assign(amount=df_transactions['amount'] * 0.5),
+            credit_facility=AgentSpec(priced_code, [{'name': 'base_fee', 'default': '1'}, {'name': 'base_rate', 'default': '0.01'}])
+        ),
+    }
+
+
+def logs_match(reference: Dict[str, pd.DataFrame], candidate: Dict[str, pd.DataFrame]) -> bool:
+    """
+    Whether two runs logged the same rows. Rows are compared regardless of their order, which ABMSim does not fix
+    within a processing window, and numbers up to floating-point summation order.
+    """
+    for log_name, reference_log in reference.items():
+        candidate_log = candidate[log_name]
+        if list(reference_log.columns) != list(candidate_log.columns) or len(reference_log) != len(candidate_log):
+            return False
+        reference_log = reference_log.sort_values(list(reference_log.columns)).reset_index(drop=True)
+        candidate_log = candidate_log.sort_values(list(candidate_log.columns)).reset_index(drop=True)
+        numeric = reference_log.select_dtypes('number').columns
+        if not (reference_log.drop(columns=numeric).equals(candidate_log.drop(columns=numeric))
+                and np.allclose(reference_log[numeric], candidate_log[numeric], rtol=1e-12, atol=1e-9)):
+            return False
+    return True
+
+
+def check_fast_path(sizes: List[str]) -> List[dict]:
+    """Runs each fast path scenario on ABMSim and on the fast path, and reports whether their logs match and the speedup."""
+    from core.fastpath import fast_path_blockers
+    from core.runner import run_simulation
+
+    rows = []
+    for size in sizes:
+        for scenario, config in fast_path_scenarios(size).items():
+            assert not fast_path_blockers(config), fast_path_blockers(config)
+            with tempfile.TemporaryDirectory() as workdir:
+                start = time.perf_counter()
+                reference = run_simulation(config, log_dir=workdir, fast_path=False)
+                agent_time = time.perf_counter() - start
+                start = time.perf_counter()
+                candidate = run_simulation(config, log_dir=workdir, fast_path=True)
+                fast_time = time.perf_counter() - start
+            row = {'size': size, 'scenario': scenario, 'agent_time_s': agent_time, 'fast_time_s': fast_time, 'match': logs_match(reference, candidate)}
+            rows.append(row)
+            print(f"{size:>8} {scenario:<20} ABMSim {agent_time:>8.3f}s  fast path {fast_time:>8.3f}s  "
+                  f"{agent_time / fast_time:>7.1f}x  {'logs match' if row['match'] else 'LOGS DIFFER'}")
+    return rows
+
+
+def compare_reports(baseline: dict, candidate: dict, threshold: float = 0.2, min_time: float = 0.005, min_memory: float = 1.0) -> List[dict]:
+    """
+    Compares two benchmark reports step by step.
+
+    Args:
+        baseline (dict): The reference report.
+        candidate (dict): The report to check.
+        threshold (float): Relative increase in wall time or peak memory above which a step is flagged.
+        min_time (float): Steps faster than this (in seconds) in both reports are never flagged for time, as they are dominated by noise.
+        min_memory (float): Likewise, steps using less than this much memory (in MB) in both reports are never flagged for memory.
+
+    Returns:
+        List[dict]: One row per step present in both reports, with the ratios and whether it regressed.
+    """
+    baseline_results = {(r['size'], r['step']): r for r in baseline['results']}
+    rows = []
+    for result in candidate['results']:
+        key = (result['size'], result['step'])
+        if key not in baseline_results:
+            continue
+        reference = baseline_results[key]
+        time_ratio = result['wall_time_s'] / reference['wall_time_s'] if reference['wall_time_s'] > 0 else float('inf')
+        time_regressed = time_ratio > 1 + threshold and max(result['wall_time_s'], reference['wall_time_s']) >= min_time
+        memory_ratio = None
+        memory_regressed = False
+        if 'peak_memory_mb' in result and 'peak_memory_mb' in reference and reference['peak_memory_mb'] > 0:
+            memory_ratio = result['peak_memory_mb'] / reference['peak_memory_mb']
+            memory_regressed = memory_ratio > 1 + threshold and max(result['peak_memory_mb'], reference['peak_memory_mb']) >= min_memory
+        rows.append({
+            'size': result['size'],
+            'step': result['step'],
+            'time_ratio': time_ratio,
+            'memory_ratio': memory_ratio,
+            'regressed': time_regressed or memory_regressed
+        })
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks for the non-UI paths of PSSimPy-web.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run the benchmarks and write a JSON report.')
+    run_parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['small', 'medium'])
+    run_parser.add_argument('--repeat', type=int, default=1, help='Number of timed runs per step; the best one is reported.')
+    run_parser.add_argument('--no-memory', action='store_true', help='Skip peak memory measurement.')
+    run_parser.add_argument('--output', default='bench.json')
+
+    imports_parser = subparsers.add_parser('imports', help='Report the cold import time of the app startup modules.')
+    imports_parser.add_argument('modules', nargs='*', default=STARTUP_MODULES)
+    imports_parser.add_argument('--repeat', type=int, default=3)
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two reports and flag regressions.')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help='Relative slowdown or memory growth that counts as a regression.')
+
+    fastpath_parser = subparsers.add_parser('fastpath', help='Check the fast path engine against ABMSim and report its speedup.')
+    fastpath_parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['small', 'medium'])
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        report = run_benchmarks(args.sizes, args.repeat, not args.no_memory)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Report written to {args.output}')
+        return 0
+
+    if args.command == 'imports':
+        run_import_benchmarks(args.modules, args.repeat)
+        return 0
+
+    if args.command == 'fastpath':
+        rows = check_fast_path(args.sizes)
+        return 0 if all(row['match'] for row in rows) else 1
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    rows = compare_reports(baseline, candidate, args.threshold)
+    for row in rows:
+        memory_ratio = f"{row['memory_ratio']:.2f}x" if row['memory_ratio'] is not None else 'n/a'
+        flag = 'REGRESSION' if row['regressed'] else ''
+        print(f"{row['size']:>8} {row['step']:<32} time {row['time_ratio']:>6.2f}x  memory {memory_ratio:>7}  {flag}")
+    num_regressions = sum(row['regressed'] for row in rows)
+    print(f'{num_regressions} regression(s) found.')
+    return 1 if num_regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""
+Simulation core of PSSimPy-web.
+
+These modules hold the configuration model, agent compilation, simulation runner, log loading and indicator
+calculations used by the Streamlit pages. None of them depend on Streamlit, so they can be imported and run headless.
+"""
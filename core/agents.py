@@ -0,0 +1,256 @@
+import ast
+import inspect
+import textwrap
+from functools import lru_cache
+import numpy as np
+from typing import Tuple, List, Set, Dict, Optional, Union
+from sortedcontainers import SortedList
+from PSSimPy import Bank, Account, Transaction
+from PSSimPy.constraint_handler import AbstractConstraintHandler, PassThroughHandler
+from PSSimPy.transaction_fee import AbstractTransactionFee, FixedTransactionFee
+from PSSimPy.queues import AbstractQueue, DirectQueue
+from PSSimPy.credit_facilities import AbstractCreditFacility, SimplePriced
+from PSSimPy.utils import min_balance_maintained
+
+from core.constraint_handlers import CONSTRAINT_TEMPLATE_CLASSES
+from core.credit_facilities import CREDIT_FACILITY_TEMPLATE_CLASSES
+from core.fees import FEE_TEMPLATE_CLASSES
+from core.queues import QUEUE_TEMPLATE_CLASSES
+from utils.helper import ClassImplementationModifier, ClassCodeAssembler, replace_whitespace_with_underscore, remove_one_indent_level, dict_to_list
+
+# agent classes used when no custom implementation is provided
+DEFAULT_AGENT_CLASSES = {
+    'Constraint Handler': PassThroughHandler,
+    'Transaction Fee': FixedTransactionFee,
+    'Queue': DirectQueue,
+    'Credit Facility': SimplePriced
+}
+
+# abstract base class and the methods that users implement for each agent type
+AGENT_BASE_CLASSES = {
+    'Constraint Handler': AbstractConstraintHandler,
+    'Transaction Fee': AbstractTransactionFee,
+    'Queue': AbstractQueue,
+    'Credit Facility': AbstractCreditFacility
+}
+# optimized template classes that custom agents can extend instead of the abstract class, by class name
+AGENT_TEMPLATE_CLASSES = {
+    'Constraint Handler': CONSTRAINT_TEMPLATE_CLASSES,
+    'Transaction Fee': FEE_TEMPLATE_CLASSES,
+    'Queue': QUEUE_TEMPLATE_CLASSES,
+    'Credit Facility': CREDIT_FACILITY_TEMPLATE_CLASSES
+}
+AGENT_METHODS = {
+    'Bank Strategy': ['strategy'],
+    'Constraint Handler': ['process_transaction'],
+    'Transaction Fee': ['calculate_fee'],
+    'Queue': ['sorting_logic', 'dequeue_criteria'],
+    'Credit Facility': ['calculate_fee', 'lend_credit', 'collect_repayment']
+}
+
+# import statements prepended to exported agent modules
+AGENT_SOURCE_IMPORTS = {
+    'Constraint Handler': [
+        'from PSSimPy.constraint_handler import AbstractConstraintHandler',
+        'from PSSimPy.transaction import Transaction',
+        'from typing import List',
+        'import numpy as np'
+    ],
+    'Transaction Fee': [
+        'from PSSimPy.transaction_fee import AbstractTransactionFee'
+    ],
+    'Queue': [
+        'from PSSimPy.utils import min_balance_maintained',
+        'from PSSimPy import Transaction',
+        'from PSSimPy.queues import AbstractQueue',
+        'from typing import Tuple'
+    ],
+    'Credit Facility': [
+        'from PSSimPy import Account',
+        'from PSSimPy.credit_facilities import AbstractCreditFacility',
+        'from typing import List, Dict'
+    ]
+}
+
+
+def agent_namespace() -> dict:
+    """Names available to user-written agent code."""
+    return {
+        'Bank': Bank,
+        'Account': Account,
+        'Transaction': Transaction,
+        'AbstractConstraintHandler': AbstractConstraintHandler,
+        'AbstractTransactionFee': AbstractTransactionFee,
+        'AbstractQueue': AbstractQueue,
+        'AbstractCreditFacility': AbstractCreditFacility,
+        'min_balance_maintained': min_balance_maintained,
+        'SortedList': SortedList,
+        'Tuple': Tuple,
+        'List': List,
+        'Set': Set,
+        'Dict': Dict,
+        'Union': Union,
+        'np': np,
+        **CONSTRAINT_TEMPLATE_CLASSES,
+        **FEE_TEMPLATE_CLASSES,
+        **CREDIT_FACILITY_TEMPLATE_CLASSES,
+        **QUEUE_TEMPLATE_CLASSES
+    }
+
+
+def _params_to_dict(params: List[dict]) -> dict:
+    return {param["name"]: param["default"] for param in params}
+
+
+def _exec_agent_code(*code_blocks: str) -> dict:
+    """Executes agent code blocks in order in a shared namespace and returns the namespace."""
+    namespace = agent_namespace()
+    for code in code_blocks:
+        exec(code, namespace)
+    return namespace
+
+
+@lru_cache(maxsize=256)
+def compile_bank_strategy(strategy_name: str, implementation: str) -> type:
+    """Builds a Bank subclass whose strategy method is the provided implementation. Compiled classes are cached."""
+    namespace = _exec_agent_code(implementation)
+
+    def __init__(self, name, strategy_type=strategy_name, **kwargs):
+        Bank.__init__(self, name, strategy_type, **kwargs)
+
+    return type('CustomBank', (Bank,), {'__init__': __init__, 'strategy': namespace['strategy']})
+
+
+def agent_base_class(agent_type: str, base: Optional[str] = None) -> type:
+    """Returns the template class named base, or the agent type's abstract class if base is None."""
+    if base is None:
+        return AGENT_BASE_CLASSES[agent_type]
+    if base not in AGENT_TEMPLATE_CLASSES[agent_type]:
+        raise ValueError(f"Unknown {agent_type} template '{base}'. Expected one of {', '.join(AGENT_TEMPLATE_CLASSES[agent_type]) or 'none'}.")
+    return AGENT_TEMPLATE_CLASSES[agent_type][base]
+
+
+def agent_methods(agent_type: str, base: Optional[str] = None) -> List[str]:
+    """Returns the methods that users implement for the agent type, which a template class can replace with its user_methods."""
+    if base is None:
+        return AGENT_METHODS[agent_type]
+    return getattr(agent_base_class(agent_type, base), 'user_methods', AGENT_METHODS[agent_type])
+
+
+def compile_agent(agent_type: str, implementation: str, params: List[dict] = None, base: Optional[str] = None) -> type:
+    """
+    Builds a custom agent class from user-written method implementations.
+    Compiled classes are cached, so the same implementation and parameters are only compiled once.
+
+    Args:
+        agent_type (str): One of 'Constraint Handler', 'Transaction Fee', 'Queue' or 'Credit Facility'.
+        implementation (str): Code defining the methods returned by agent_methods for the agent type and base.
+        params (List[dict]): Custom init parameters as a list of {'name': ..., 'default': ...} rows.
+        base (str): Name of the template class in AGENT_TEMPLATE_CLASSES to extend. Defaults to the abstract class.
+
+    Returns:
+        type: The compiled subclass of the agent type's abstract class or template class.
+    """
+    # parameter rows are not hashable, so the cache is keyed by their literal representation
+    return _compile_agent(agent_type, implementation, repr(params or []), base)
+
+
+@lru_cache(maxsize=256)
+def _compile_agent(agent_type: str, implementation: str, params_literal: str, base: Optional[str] = None) -> type:
+    params = ast.literal_eval(params_literal)
+    base_class = agent_base_class(agent_type, base)
+    init_implementation = ClassImplementationModifier.generate_init_method(_params_to_dict(params), True, base_class.__name__)
+    namespace = _exec_agent_code(init_implementation, implementation)
+    class_attributes = {method: namespace[method] for method in ['__init__'] + agent_methods(agent_type, base)}
+    return type(f"Custom{agent_type.replace(' ', '')}", (base_class,), class_attributes)
+
+
+def resolve_agent_class(agent_type: str, implementation: str = None, params: List[dict] = None, base: Optional[str] = None) -> type:
+    """Returns the compiled custom agent class, or the default class if there is no custom implementation."""
+    if implementation is None:
+        return DEFAULT_AGENT_CLASSES[agent_type]
+    return compile_agent(agent_type, implementation, params, base)
+
+
+# Source generation for exported settings
+
+@lru_cache(maxsize=None)
+def _class_source(cls: type) -> str:
+    # the source of PSSimPy's classes does not change while the app runs
+    return inspect.getsource(cls)
+
+
+def generate_bank_strategy_source(strategy_name: str, implementation: str) -> str:
+    """Generates a standalone module defining the bank strategy class, based on the source of PSSimPy's Bank."""
+    strategy_name = replace_whitespace_with_underscore(strategy_name)
+    strategy_mod = ClassCodeAssembler(_class_source(Bank))
+    strategy_mod.replace_class_name(strategy_name)
+    strategy_mod_init_params = ClassImplementationModifier.generate_init_method(
+            {'name': None, 'strategy_type': strategy_name},
+            has_kwargs=True
+    )
+    strategy_mod.replace_function('__init__', strategy_mod_init_params)
+    strategy_mod.replace_function('strategy', implementation)
+    strategy_mod.insert_import_statement('from PSSimPy.queues import AbstractQueue')
+    return strategy_mod.code
+
+
+def generate_agent_source(agent_type: str, implementation: str, params: List[dict] = None, base: Optional[str] = None) -> str:
+    """
+    Generates a standalone module defining the custom agent class, based on the source of its abstract class.
+    Agents that extend a template class are written as a subclass of the template that imports it from this app.
+    """
+    if base is not None:
+        return _generate_template_agent_source(agent_type, implementation, params, base)
+    base_class = AGENT_BASE_CLASSES[agent_type]
+    agent_mod = ClassCodeAssembler(_class_source(base_class))
+    agent_mod.replace_class_name(f"Custom{agent_type.replace(' ', '')}({base_class.__name__})")
+
+    # replace init
+    init_params = ClassImplementationModifier.generate_init_method(_params_to_dict(params or []), True, base_class.__name__)
+    agent_mod.replace_function('__init__', init_params)
+
+    # extract and replace custom implementation of agent functions
+    methods = AGENT_METHODS[agent_type]
+    method_codes = {methods[0]: implementation} if len(methods) == 1 else ClassCodeAssembler.extract_functions(implementation, methods)
+    for method in methods:
+        agent_mod.replace_function(method, method_codes[method])
+
+    for import_statement in AGENT_SOURCE_IMPORTS[agent_type]:
+        agent_mod.insert_import_statement(import_statement)
+    return agent_mod.code
+
+
+def _generate_template_agent_source(agent_type: str, implementation: str, params: List[dict], base: str) -> str:
+    base_class = agent_base_class(agent_type, base)
+    init_method = ClassImplementationModifier.generate_init_method(_params_to_dict(params or []), True, base)
+    imports = [f'from {base_class.__module__} import {base}', *AGENT_SOURCE_IMPORTS[agent_type]]
+    body = textwrap.indent(f'{init_method}\n\n{implementation}', '    ')
+    return '\n'.join(imports) + f"\n\n\nclass Custom{agent_type.replace(' ', '')}({base}):\n\n{body}\n"
+
+
+def parse_agent_base(agent_type: str, source: str) -> Optional[str]:
+    """Returns the name of the template class that an exported agent module extends, or None for the abstract class."""
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.ClassDef):
+            bases = [b.id for b in node.bases if isinstance(b, ast.Name)]
+            return next((b for b in bases if b in AGENT_TEMPLATE_CLASSES[agent_type]), None)
+    return None
+
+
+def parse_agent_source(agent_type: str, source: str) -> Tuple[str, str, List[dict]]:
+    """
+    Recovers the editable parts of an exported agent module.
+
+    Returns:
+        Tuple[str, str, List[dict]]: The class name, the implementation of the user-written methods and the init parameters.
+    """
+    class_name = ClassImplementationModifier.get_first_class_name(source)
+    methods = AGENT_METHODS[agent_type] if agent_type == 'Bank Strategy' else agent_methods(agent_type, parse_agent_base(agent_type, source))
+    method_codes = ClassCodeAssembler.extract_functions(source, methods)
+    implementation = '\n\n'.join(remove_one_indent_level(method_codes[method]) for method in methods)
+    if agent_type == 'Bank Strategy':
+        params = []
+    else:
+        params = dict_to_list(ClassImplementationModifier.extract_init_params(source), 'name', 'default')
+    return class_name, implementation, params
@@ -0,0 +1,108 @@
+"""
+Runs exported simulation settings without the app.
+
+Each settings zip is imported and simulated in a worker process, and the simulation logs are written
+as columnar files to <output>/<settings name>/<log type>.<format>:
+
+    python -m core.batch saved_settings/*.zip --output batch_results --workers 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Optional
+
+from core.logs import LOG_FILE_TYPES
+from core.runner import run_simulation
+from core.settings import read_settings_bundle
+
+# columnar output formats and the pandas writer used for each
+OUTPUT_FORMATS = {
+    'parquet': 'to_parquet',
+    'feather': 'to_feather'
+}
+
+
+def run_settings_file(settings_path: str, output_dir: str, output_format: str = 'parquet') -> dict:
+    """
+    Imports a settings zip, runs the simulation and writes its logs.
+
+    Args:
+        settings_path (str): Path of the settings zip exported from the app.
+        output_dir (str): Folder the logs are written to.
+        output_format (str): One of OUTPUT_FORMATS.
+
+    Returns:
+        dict: Summary of the run with its status, wall time, number of rows per log and the error message, if any.
+    """
+    start = time.perf_counter()
+    summary = {'settings': settings_path, 'output': output_dir}
+    try:
+        config = read_settings_bundle(settings_path)
+        # each run writes its log files to its own folder so that concurrent runs do not collide
+        with tempfile.TemporaryDirectory() as log_dir:
+            logs = run_simulation(config, log_dir=log_dir)
+
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        for log_name, df in logs.items():
+            getattr(df, OUTPUT_FORMATS[output_format])(os.path.join(output_dir, f'{LOG_FILE_TYPES[log_name]}.{output_format}'))
+        summary.update(status='ok', rows={log_name: len(df) for log_name, df in logs.items()})
+    except Exception as e:
+        summary.update(status='failed', error=f'{type(e).__name__}: {e}')
+    summary['wall_time_s'] = time.perf_counter() - start
+    return summary
+
+
+def run_batch(settings_paths: List[str], output_dir: str, workers: Optional[int] = None, output_format: str = 'parquet') -> List[dict]:
+    """
+    Runs several settings zips in parallel worker processes.
+    The logs of each run are written to a subfolder of output_dir named after its settings file.
+
+    Returns:
+        List[dict]: The summary of each run, in the order of settings_paths.
+    """
+    run_names = [Path(path).stem for path in settings_paths]
+    if len(set(run_names)) != len(run_names):
+        raise ValueError("Settings files must have unique names, as the names are used as output folders.")
+
+    summaries = [None] * len(settings_paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_settings_file, path, os.path.join(output_dir, name), output_format): i
+            for i, (path, name) in enumerate(zip(settings_paths, run_names))
+        }
+        for future in as_completed(futures):
+            summary = future.result()
+            summaries[futures[future]] = summary
+            print(f"{summary['status']:>6} {summary['wall_time_s']:>8.2f}s  {summary['settings']}"
+                  + (f"  {summary['error']}" if summary['status'] == 'failed' else ''))
+    return summaries
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Run exported PSSimPy-web settings without the app.')
+    parser.add_argument('settings', nargs='+', help='Settings zip files exported from the app.')
+    parser.add_argument('--output', default='batch_results', help='Folder the simulation logs are written to.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes. Defaults to the number of CPUs.')
+    parser.add_argument('--format', choices=list(OUTPUT_FORMATS), default='parquet', help='File format of the simulation logs.')
+    args = parser.parse_args(argv)
+
+    try:
+        summaries = run_batch(args.settings, args.output, args.workers, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    Path(args.output).mkdir(parents=True, exist_ok=True)
+    with open(os.path.join(args.output, 'summary.json'), 'w') as f:
+        json.dump(summaries, f, indent=2)
+    num_failed = sum(summary['status'] == 'failed' for summary in summaries)
+    print(f'{len(summaries) - num_failed} run(s) completed, {num_failed} failed. Summary written to {args.output}/summary.json')
+    return 1 if num_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
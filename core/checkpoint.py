@@ -0,0 +1,235 @@
+"""
+Checkpoints of a simulation's state at day boundaries, to resume a run or fork it with other settings.
+
+After each day's end-of-day processing, the run can write a checkpoint holding its configuration, the state of the
+banks, accounts, transactions, queue and agents, the state of Python's random number generator (which generates random
+transactions) and the logs written so far. The checkpoint is pickled and compressed with zlib into one file per day.
+
+Banks, accounts and agents are instances of classes compiled from user code, which pickle cannot import again, so
+they are stored as references plus their attribute values. Resuming builds the simulation from a configuration as
+usual and then restores the stored values into its objects. Resuming with a configuration other than the checkpoint's
+forks the run: parameters, agents, fee rates, bank strategies and the transactions that arrive after the checkpoint's
+day come from the new configuration, while balances, earlier transactions, queued payments and outstanding credit
+carry over. An agent whose code or parameters changed starts afresh, except that the queued transactions are enqueued
+into the new queue and the outstanding loans are recorded with the new credit facility.
+
+Checkpoints are pickles, so only checkpoints written by the app itself should be loaded.
+"""
+import io
+import os
+import pickle
+import random
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Optional
+import simpy
+from PSSimPy.simulator import ABMSim
+from PSSimPy.utils.time_utils import minutes_between
+
+from core.config import SimulationConfig
+from core.constraint_handlers import PerTransactionAdapter
+from core.credit_facilities import IndexedCreditFacility
+
+CHECKPOINT_FORMAT_VERSION = 1
+CHECKPOINT_SUFFIX = '.ckpt'
+
+
+def checkpoint_path(checkpoint_dir: str, day: int) -> str:
+    """Path of the checkpoint written after the given day of a run that keeps its checkpoints in checkpoint_dir."""
+    return os.path.join(checkpoint_dir, f'day{day:04d}{CHECKPOINT_SUFFIX}')
+
+
+def list_checkpoints(checkpoint_dir: str) -> Dict[int, str]:
+    """Paths of the checkpoints in a folder, by day."""
+    if not os.path.isdir(checkpoint_dir):
+        return {}
+    names = sorted(name for name in os.listdir(checkpoint_dir) if name.startswith('day') and name.endswith(CHECKPOINT_SUFFIX))
+    return {int(name[3:-len(CHECKPOINT_SUFFIX)]): os.path.join(checkpoint_dir, name) for name in names}
+
+
+def _stateful_objects(sim: ABMSim) -> Dict[tuple, object]:
+    """Objects of the simulation that are pickled by reference, keyed by their persistent id."""
+    objects = {('bank', name): bank for name, bank in sim.banks.items()}
+    objects.update({('account', account_id): account for account_id, account in sim.accounts.items()})
+    handler = sim.system.constraint_handler
+    objects.update({
+        ('agent', 'Constraint Handler'): handler,
+        ('agent', 'Transaction Fee'): sim.transaction_fee_handler,
+        ('agent', 'Queue'): sim.queue,
+        ('agent', 'Credit Facility'): sim.credit_facility
+    })
+    if isinstance(handler, PerTransactionAdapter):
+        objects[('agent', 'Constraint Handler (per transaction)')] = handler.handler
+    return objects
+
+
+def _day_loggers(sim: ABMSim) -> dict:
+    """The simulator's loggers that are written every period, by log file type."""
+    return {
+        'processed_transactions': sim.transaction_logger,
+        'transaction_fees': sim.transaction_fee_logger,
+        'queue_stats': sim.queue_stats_logger,
+        'account_balance': sim.account_balance_logger,
+        'credit_facility': sim.credit_facility_logger
+    }
+
+
+class _StatePickler(pickle.Pickler):
+    def __init__(self, file, objects: Dict[tuple, object]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._keys = {id(obj): key for key, obj in objects.items()}
+
+    def persistent_id(self, obj):
+        return self._keys.get(id(obj))
+
+
+class _StateUnpickler(pickle.Unpickler):
+    def __init__(self, file, objects: Dict[tuple, object]):
+        super().__init__(file)
+        self._objects = objects
+
+    def persistent_load(self, key):
+        if key in self._objects:
+            return self._objects[key]
+        if key[0] == 'agent':
+            # only referenced from the state of an agent that the new configuration replaced
+            return None
+        raise ValueError(f"The checkpoint refers to {key[0]} '{key[1]}', which the configuration lacks.")
+
+
+@dataclass
+class Checkpoint:
+    """The state of a simulation after the end-of-day processing of day, and the configuration of the run that reached it."""
+    day: int
+    config: SimulationConfig
+    state: bytes  # pickled with references to the simulation's banks, accounts and agents
+    logs: Dict[str, bytes]  # contents of the log files written up to day, by log file type
+
+    def restore(self, sim: ABMSim, config: SimulationConfig):
+        """
+        Restores the checkpoint into a simulation that was just built from config, so that running it from day + 1
+        continues the checkpointed run, or forks it if config differs from the checkpoint's configuration.
+
+        Raises:
+            ValueError: If config lacks a bank or account of the checkpoint.
+        """
+        objects = _stateful_objects(sim)
+        state = _StateUnpickler(io.BytesIO(self.state), objects).load()
+        missing = [f"bank '{name}'" for name in state['banks'] if name not in sim.banks]
+        missing += [f"account '{account_id}'" for account_id in state['accounts'] if account_id not in sim.accounts]
+        if missing:
+            raise ValueError(f"The checkpoint refers to {', '.join(missing)}, which the configuration lacks.")
+        for name, attributes in state['banks'].items():
+            vars(objects[('bank', name)]).update(attributes)
+        for account_id, attributes in state['accounts'].items():
+            vars(objects[('account', account_id)]).update(attributes)
+
+        # transactions that arrived up to the checkpoint carry over, later ones come from the configuration
+        sim.transactions = {entry for entry in state['transactions'] if entry[1] <= self.day} | {
+            entry for entry in sim.transactions if entry[1] > self.day
+        }
+        sim.outstanding_transactions = set(state['outstanding_transactions'])
+
+        for agent_type in ('Constraint Handler', 'Transaction Fee', 'Credit Facility'):
+            if config.agent(agent_type) != self.config.agent(agent_type):
+                continue
+            for key, attributes in state['agents'].items():
+                if key.startswith(agent_type):
+                    vars(objects[('agent', key)]).update(attributes)
+        if config.agent('Credit Facility') != self.config.agent('Credit Facility'):
+            _record_loans(sim.credit_facility, sim.accounts, state['agents']['Credit Facility'])
+        # queued transactions are enqueued again, which rebuilds whatever indexes the queue keeps
+        queue = sim.queue
+        for transaction, period in state['queue']['items']:
+            queue.period_counter = period
+            queue.enqueue(transaction)
+        queue.period_counter = state['queue']['period_counter']
+        random.setstate(state['random_state'])
+
+        for log_file_type, logger in _day_loggers(sim).items():
+            if log_file_type in self.logs:
+                with open(logger.file_path, 'wb') as f:
+                    f.write(self.logs[log_file_type])
+
+
+def _record_loans(credit_facility, accounts: dict, previous_state: dict):
+    """Records the outstanding loans and repayment history of a replaced credit facility with a new one, without moving balances."""
+    for account_id, loans in previous_state.get('used_credit', {}).items():
+        for amount in loans:
+            if isinstance(credit_facility, IndexedCreditFacility):
+                credit_facility.record_loan(accounts[account_id], amount)
+            else:
+                credit_facility.used_credit[account_id].append(amount)
+    for account_id, entries in previous_state.get('history', {}).items():
+        credit_facility.history[account_id].extend(entries)
+
+
+def save_checkpoint(sim: ABMSim, config: SimulationConfig, day: int, path: str):
+    """
+    Writes the state of a simulation after the end-of-day processing of day to path.
+    The file is replaced in one step, so an interrupted write leaves an earlier checkpoint intact.
+
+    Raises:
+        ValueError: If an agent holds state that cannot be pickled.
+    """
+    objects = _stateful_objects(sim)
+    queue = sim.queue
+    state = {
+        'banks': {name: vars(bank) for name, bank in sim.banks.items()},
+        'accounts': {account_id: vars(account) for account_id, account in sim.accounts.items()},
+        'transactions': list(sim.transactions),
+        'outstanding_transactions': list(sim.outstanding_transactions),
+        'queue': {'items': list(queue.queue), 'period_counter': queue.period_counter},
+        'agents': {key[1]: vars(obj) for key, obj in objects.items() if key[0] == 'agent' and obj is not queue},
+        'random_state': random.getstate()
+    }
+    buffer = io.BytesIO()
+    try:
+        _StatePickler(buffer, objects).dump(state)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        raise ValueError(f'The simulation state after day {day} cannot be checkpointed: {e}') from e
+    logs = {}
+    for log_file_type, logger in _day_loggers(sim).items():
+        if os.path.exists(logger.file_path):
+            with open(logger.file_path, 'rb') as f:
+                logs[log_file_type] = f.read()
+
+    payload = {'version': CHECKPOINT_FORMAT_VERSION, 'day': day, 'config': config, 'state': buffer.getvalue(), 'logs': logs}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f'{path}.tmp', 'wb') as f:
+        f.write(zlib.compress(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)))
+    os.replace(f'{path}.tmp', path)
+
+
+def load_checkpoint(path: str) -> Checkpoint:
+    """
+    Reads a checkpoint written by save_checkpoint.
+
+    Raises:
+        ValueError: If the file was written by an incompatible version of the app.
+    """
+    with open(path, 'rb') as f:
+        payload = pickle.loads(zlib.decompress(f.read()))
+    if payload.get('version') != CHECKPOINT_FORMAT_VERSION:
+        raise ValueError(f'{path} was written in checkpoint format {payload.get("version")}, but format {CHECKPOINT_FORMAT_VERSION} is expected.')
+    return Checkpoint(payload['day'], payload['config'], payload['state'], payload['logs'])
+
+
+def run_days(sim: ABMSim, config: SimulationConfig, first_day: int = 1, checkpoint_dir: Optional[str] = None):
+    """
+    Runs the simulation from first_day to its last day like ABMSim.run, writing a checkpoint to checkpoint_dir after
+    each day's end-of-day processing if it is set.
+    """
+    for day in range(first_day, sim.num_days + 1):
+        # as in ABMSim.run
+        sim.env = simpy.Environment()
+        sim.env.process(sim._simulate_day(day))
+        sim.env.run(until=minutes_between(sim.open_time, sim.close_time))
+        sim._perform_eod(day)
+        if checkpoint_dir is not None:
+            save_checkpoint(sim, config, day, checkpoint_path(checkpoint_dir, day))
+    if sim.generate_txns_flag == 1:
+        sim.transaction_arrival_logger.write([
+            (day, time, transaction.sender_account.id, transaction.recipient_account.id, transaction.amount, transaction.priority)
+            for transaction, day, time in sim.transactions
+        ])
@@ -0,0 +1,157 @@
+from copy import copy, deepcopy
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Dict, List, Optional, Tuple, Union
+import pandas as pd
+
+from core.agents import compile_bank_strategy, resolve_agent_class
+
+# session state key of each customizable agent and the matching SimulationConfig field
+AGENT_FIELDS = {
+    'Constraint Handler': 'constraint_handler',
+    'Transaction Fee': 'transaction_fee',
+    'Queue': 'queue',
+    'Credit Facility': 'credit_facility'
+}
+
+
+def _default_parameters() -> dict:
+    return {
+        'Opening Time': None,
+        'Closing Time': None,
+        'Processing Window': None,
+        'Number of Days': None,
+        'EOD Clear Queue': None,
+        'EOD Force Settlement': None
+    }
+
+
+class LazyAgentEntry(dict):
+    """
+    Session state entry of a bank strategy or agent whose 'class' is compiled on first access rather than when the
+    entry is created. Compiled classes are cached, so compiling the same code again is cheap.
+    """
+    __slots__ = ('_compile',)
+
+    def __init__(self, compile_class, **entries):
+        super().__init__(**entries)
+        self._compile = compile_class
+
+    def __missing__(self, key):
+        if key != 'class':
+            raise KeyError(key)
+        agent_class = self['class'] = self._compile()
+        return agent_class
+
+    def __reduce__(self):
+        return (self.__class__, (self._compile,), None, None, iter(self.items()))
+
+
+@dataclass
+class AgentSpec:
+    """
+    User-written implementation and custom init parameters of an agent. No implementation means the default agent is used.
+    base names the template class in core.agents.AGENT_TEMPLATE_CLASSES that the agent extends, if any.
+    """
+    implementation: Optional[str] = None
+    params: List[dict] = field(default_factory=list)
+    base: Optional[str] = None
+
+
+@dataclass
+class SimulationConfig:
+    """
+    Everything needed to run a simulation, independent of Streamlit.
+    Agents are kept as source code so that the configuration can be saved, sent to other processes and compiled where it is used.
+    """
+    parameters: dict = field(default_factory=_default_parameters)
+    banks: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=['name']))
+    accounts: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=['id', 'owner', 'balance']))
+    transactions: Optional[pd.DataFrame] = None
+    random_transactions: bool = False
+    transaction_probability: Optional[float] = None
+    transaction_amount_range: Optional[Tuple[int, int]] = None
+    transaction_fee_rate: Union[float, Dict[str, float]] = 0.0
+    bank_strategies: Dict[str, str] = field(default_factory=dict)  # strategy name -> strategy implementation
+    constraint_handler: AgentSpec = field(default_factory=AgentSpec)
+    transaction_fee: AgentSpec = field(default_factory=AgentSpec)
+    queue: AgentSpec = field(default_factory=AgentSpec)
+    credit_facility: AgentSpec = field(default_factory=AgentSpec)
+
+    def agent(self, agent_type: str) -> AgentSpec:
+        """Returns the agent specification for a session state agent name such as 'Queue'."""
+        return getattr(self, AGENT_FIELDS[agent_type])
+
+    def static_data(self) -> dict:
+        """Returns the JSON-serializable settings, keyed as in the exported static_data.json."""
+        return {
+            'Parameters': self.parameters,
+            'Random Transactions': self.random_transactions,
+            'Transaction Probability': self.transaction_probability,
+            'Transaction Amount Range': self.transaction_amount_range,
+            'Transaction Fee Rate': self.transaction_fee_rate
+        }
+
+    def update_static_data(self, static_data: dict):
+        """Sets the settings from a dictionary in the format returned by static_data."""
+        self.parameters = static_data['Parameters']
+        self.random_transactions = static_data['Random Transactions']
+        self.transaction_probability = static_data['Transaction Probability']
+        self.transaction_amount_range = static_data['Transaction Amount Range']
+        self.transaction_fee_rate = static_data['Transaction Fee Rate']
+
+    @classmethod
+    def from_session_state(cls, state, include_data: bool = True) -> 'SimulationConfig':
+        """
+        Builds a configuration from the app's session state, or any mapping with the same keys.
+        Without include_data, the input data of the session is not accessed and the configuration has empty data.
+        """
+        data = {}
+        if include_data:
+            data = {
+                'banks': state['Input Data']['Banks'],
+                'accounts': state['Input Data']['Accounts'],
+                'transactions': state['Input Data']['Transactions']
+            }
+        return cls(
+            parameters=copy(state['Parameters']),
+            **data,
+            random_transactions=state['Random Transactions'],
+            transaction_probability=state['Transaction Probability'],
+            transaction_amount_range=state['Transaction Amount Range'],
+            transaction_fee_rate=state['Transaction Fee']['rate'],
+            bank_strategies={name: value['implementation'] for name, value in state['Bank Strategies'].items()},
+            **{
+                config_field: AgentSpec(
+                    state[agent_type]['implementation'],
+                    deepcopy(state[agent_type]['params']),
+                    state[agent_type].get('base')
+                )
+                for agent_type, config_field in AGENT_FIELDS.items()
+            }
+        )
+
+    def apply_to_session_state(self, state, include_data: bool = True):
+        """
+        Writes the configuration into the app's session state. The custom bank and agent classes are compiled
+        when their 'class' entry is first accessed. Without include_data, the input data of the session is kept.
+        """
+        state['Parameters'] = self.parameters
+        if include_data:
+            state['Input Data'] = {'Banks': self.banks, 'Accounts': self.accounts, 'Transactions': self.transactions}
+        state['Random Transactions'] = self.random_transactions
+        state['Transaction Probability'] = self.transaction_probability
+        state['Transaction Amount Range'] = self.transaction_amount_range
+        state['Bank Strategies'] = {
+            name: LazyAgentEntry(partial(compile_bank_strategy, name, implementation), implementation=implementation)
+            for name, implementation in self.bank_strategies.items()
+        }
+        for agent_type in AGENT_FIELDS:
+            spec = self.agent(agent_type)
+            state[agent_type] = LazyAgentEntry(
+                partial(resolve_agent_class, agent_type, spec.implementation, spec.params, spec.base),
+                implementation=spec.implementation,
+                params=spec.params,
+                base=spec.base
+            )
+        state['Transaction Fee']['rate'] = self.transaction_fee_rate
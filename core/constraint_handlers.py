@@ -0,0 +1,202 @@
+"""
+Batch constraint handlers that evaluate a processing window's candidate transactions at once.
+
+PSSimPy's System hands the constraint handler one transaction at a time and collects the passed transactions again
+after each one. BatchSystem hands it the whole window instead, so a BatchConstraintHandler checks the window with
+array operations, and constraints that depend on the window as a whole, such as a cap on each bank's submitted
+value, can be expressed. Per-transaction handlers keep working under BatchSystem through PerTransactionAdapter.
+"""
+from abc import abstractmethod
+from itertools import compress
+from typing import List, Set
+import numpy as np
+from PSSimPy import Transaction
+from PSSimPy.constraint_handler import AbstractConstraintHandler
+from PSSimPy.queues import AbstractQueue
+from PSSimPy.system import System
+from PSSimPy.utils.transaction_utils import settle_transaction
+from PSSimPy.utils.constants import TRANSACTION_STATUS_CODES
+
+
+class BatchConstraintHandler(AbstractConstraintHandler):
+    """
+    Base of the batch templates. Custom process_batch code receives the window's transactions as a list, appends
+    those that pass to self.passed_transactions and fails or modifies the rest, e.g. with self.pass_transactions(transactions, mask).
+    """
+    # methods that users implement when extending a batch template, in place of process_transaction
+    user_methods = ['process_batch']
+
+    def __init__(self) -> None:
+        super().__init__()
+
+    @abstractmethod
+    def process_batch(self, transactions: List[Transaction]) -> None:
+        """Evaluates the candidate transactions of a processing window."""
+        pass
+
+    def process_transaction(self, transaction: Transaction) -> None:
+        # PSSimPy's System evaluates every transaction as a window of its own
+        self.process_batch([transaction])
+
+    def pass_transactions(self, transactions: List[Transaction], passed: np.ndarray) -> None:
+        """Passes the transactions where the boolean mask is set and fails the others."""
+        passed = passed.tolist()
+        self.passed_transactions.extend(compress(transactions, passed))
+        for transaction in compress(transactions, [not p for p in passed]):
+            transaction.update_transaction_status('Failed')
+
+    @staticmethod
+    def amounts(transactions: List[Transaction]) -> np.ndarray:
+        return np.fromiter((transaction.amount for transaction in transactions), dtype=float, count=len(transactions))
+
+    @staticmethod
+    def sender_balances(transactions: List[Transaction]) -> np.ndarray:
+        return np.fromiter((transaction.sender_account.balance for transaction in transactions), dtype=float, count=len(transactions))
+
+    @staticmethod
+    def sender_banks(transactions: List[Transaction]) -> np.ndarray:
+        """Names of the banks that own the sending accounts."""
+        return np.array([transaction.sender_account.owner.name for transaction in transactions], dtype=str)
+
+
+class BatchMaxSizeConstraintHandler(BatchConstraintHandler):
+    """
+    Splits transactions larger than max_txn_size into transactions of max_txn_size and a remainder, like PSSimPy's
+    Maximum Size handler, and passes all of them. A max_txn_size of None passes the window unchanged.
+    The sizes of the window are compared in one array operation, and windows without oversized transactions pass at once.
+    """
+
+    def __init__(self, max_txn_size: float = None) -> None:
+        super().__init__()
+        self.max_txn_size = max_txn_size
+
+    def process_batch(self, transactions: List[Transaction]) -> None:
+        if self.max_txn_size is None:
+            self.passed_transactions.extend(transactions)
+            return
+        oversized = self.amounts(transactions) > self.max_txn_size
+        if not oversized.any():
+            self.passed_transactions.extend(transactions)
+            return
+        for transaction, split in zip(transactions, oversized.tolist()):
+            if split:
+                self.passed_transactions.extend(self.split_transaction(transaction))
+            else:
+                self.passed_transactions.append(transaction)
+
+    def split_transaction(self, transaction: Transaction) -> List[Transaction]:
+        """Splits a transaction into parts of at most max_txn_size and marks it as modified."""
+        kwargs = (transaction.kwargs if hasattr(transaction, 'kwargs') else {})
+        parts = []
+        remainder = transaction.amount
+        # amounts are subtracted one part at a time, so the remainder is the same as after PSSimPy's recursive split
+        while remainder > self.max_txn_size:
+            parts.append(Transaction(transaction.sender_account, transaction.recipient_account, self.max_txn_size, transaction.priority, **kwargs))
+            remainder -= self.max_txn_size
+        parts.append(Transaction(transaction.sender_account, transaction.recipient_account, remainder, transaction.priority, **kwargs))
+        transaction.update_transaction_status('Modified')
+        return parts
+
+
+class BatchMinBalanceConstraintHandler(BatchConstraintHandler):
+    """
+    Fails transactions that would take the sender's balance below min_balance, like PSSimPy's Minimum Balance handler.
+    The whole window is checked in one array operation.
+    """
+
+    def __init__(self, min_balance: float = 0) -> None:
+        super().__init__()
+        self.min_balance = min_balance
+
+    def process_batch(self, transactions: List[Transaction]) -> None:
+        self.pass_transactions(transactions, self.sender_balances(transactions) - self.amounts(transactions) >= self.min_balance)
+
+
+class BankCapConstraintHandler(BatchConstraintHandler):
+    """
+    Caps the total value that each bank submits in a processing window. A bank's transactions are admitted by
+    priority and then from the smallest amount up while their total stays within the bank's cap; the rest fail.
+    bank_caps maps bank names to caps, and banks without one use max_bank_value, where None means no cap.
+    The running totals of all banks are computed with one sort and one cumulative sum over the window.
+    """
+
+    def __init__(self, max_bank_value: float = None, bank_caps: dict = None) -> None:
+        super().__init__()
+        self.max_bank_value = max_bank_value
+        self.bank_caps = bank_caps
+
+    def process_batch(self, transactions: List[Transaction]) -> None:
+        if not transactions:
+            return
+        banks, bank_codes = np.unique(self.sender_banks(transactions), return_inverse=True)
+        caps = np.array([(self.bank_caps or {}).get(bank, self.max_bank_value) for bank in banks.tolist()], dtype=float)
+        caps[np.isnan(caps)] = np.inf
+        amounts = self.amounts(transactions)
+        priorities = np.fromiter((transaction.priority for transaction in transactions), dtype=float, count=len(transactions))
+        # ties are broken by the accounts, so the outcome does not depend on the order of the window
+        senders = np.array([transaction.sender_account.id for transaction in transactions], dtype=str)
+        recipients = np.array([transaction.recipient_account.id for transaction in transactions], dtype=str)
+        order = np.lexsort((recipients, senders, amounts, priorities, bank_codes))
+
+        sorted_codes, sorted_amounts = bank_codes[order], amounts[order]
+        totals = np.cumsum(sorted_amounts)
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        # subtract the total of the banks before each bank's first transaction to get per-bank running totals
+        totals -= np.repeat(totals[starts] - sorted_amounts[starts], np.diff(np.r_[starts, len(order)]))
+        passed = np.empty(len(order), dtype=bool)
+        passed[order] = totals <= caps[sorted_codes]
+        self.pass_transactions(transactions, passed)
+
+
+class PerTransactionAdapter(BatchConstraintHandler):
+    """Evaluates a window with a per-transaction constraint handler, one transaction at a time, in the window's order."""
+
+    def __init__(self, handler: AbstractConstraintHandler) -> None:
+        super().__init__()
+        self.handler = handler
+
+    def process_batch(self, transactions: List[Transaction]) -> None:
+        for transaction in transactions:
+            self.handler.process_transaction(transaction)
+
+    def get_passed_transactions(self) -> List[Transaction]:
+        return self.handler.get_passed_transactions()
+
+    def clear(self) -> None:
+        self.handler.clear()
+
+
+def as_batch_handler(handler: AbstractConstraintHandler) -> BatchConstraintHandler:
+    """Returns the handler if it evaluates batches, or wraps a per-transaction handler in a PerTransactionAdapter."""
+    return handler if isinstance(handler, BatchConstraintHandler) else PerTransactionAdapter(handler)
+
+
+class BatchSystem(System):
+    """
+    PSSimPy's System, except that each processing window's transactions go to the constraint handler as one batch and
+    the passed transactions are collected once per window rather than after every transaction.
+    """
+
+    def __init__(self, constraint_handler: AbstractConstraintHandler, queue: AbstractQueue):
+        super().__init__(as_batch_handler(constraint_handler), queue)
+
+    def process(self, transactions: Set[Transaction], submission_day: int, submission_time: str) -> dict:
+        batch = list(transactions)
+        for transaction in batch:
+            transaction.submission_day = submission_day
+            transaction.submission_time = submission_time
+        self.constraint_handler.process_batch(batch)
+        txns_to_queue = set(self.constraint_handler.get_passed_transactions())
+        self.constraint_handler.clear()
+        # the rest is as in System.process
+        self.queue.bulk_enqueue(txns_to_queue)
+        txns_to_process = self.queue.begin_dequeueing()
+        for _ in map(settle_transaction, txns_to_process): pass
+        failed_transactions = [transaction for transaction in batch if transaction.status_code == TRANSACTION_STATUS_CODES['Failed']]
+        return {'Processed': txns_to_process, 'Failed': failed_transactions}
+
+
+# batch constraint handler templates by class name, as referenced by constraint handlers that extend them
+CONSTRAINT_TEMPLATE_CLASSES = {cls.__name__: cls for cls in (
+    BatchConstraintHandler, BatchMaxSizeConstraintHandler, BatchMinBalanceConstraintHandler, BankCapConstraintHandler
+)}
@@ -0,0 +1,123 @@
+"""
+Credit facility templates that keep outstanding credit and fees indexed by account.
+
+PSSimPy's credit facilities store the loans of each account in a list and sum the list, calling calculate_fee for every
+loan, whenever the simulator asks for an account's credit or fees, which it does for every account in every period.
+The templates below update per-account and aggregate totals when credit is lent or repaid instead, so these queries
+cost O(1).
+"""
+from typing import Dict
+from PSSimPy import Account
+from PSSimPy.credit_facilities import AbstractCreditFacility
+
+
+class IndexedCreditFacility(AbstractCreditFacility):
+    """
+    Base of the indexed templates. Custom lend_credit and collect_repayment code records loans with record_loan and
+    repays them with repay_loans, which keep used_credit, the per-account totals and the aggregate totals in step.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._credit: Dict[str, float] = {}  # account id -> outstanding credit, only for accounts with outstanding loans
+        self._fee: Dict[str, float] = {}  # account id -> fees of the outstanding loans
+        self.total_credit = 0  # outstanding credit of all accounts
+        self.total_fee = 0  # fees of all outstanding loans
+
+    def record_loan(self, account: Account, amount: float) -> None:
+        """Records credit lent to an account. The caller credits the account's balance."""
+        fee = self.calculate_fee(amount)
+        self.used_credit[account.id].append(amount)
+        self._credit[account.id] = self._credit.get(account.id, 0) + amount
+        self._fee[account.id] = self._fee.get(account.id, 0) + fee
+        self.total_credit += amount
+        self.total_fee += fee
+
+    def repay_loans(self, account: Account, restore_collateral: bool = False) -> None:
+        """
+        Repays an account's loans, in the order they were taken, that its balance covers, like PSSimPy's templates.
+        Costs O(loans of the account).
+
+        Args:
+            account (Account): The account repaying its credit.
+            restore_collateral (bool): Whether repaid credit is returned to the account's posted collateral.
+        """
+        loans = self.used_credit.get(account.id)
+        if not loans:
+            return
+        outstanding = []
+        for amount in loans:
+            if amount <= account.balance:
+                account.balance -= amount
+                if restore_collateral:
+                    account.posted_collateral += amount
+            else:
+                outstanding.append(amount)
+        self.used_credit[account.id] = outstanding
+
+        # the account's totals are summed again from its remaining loans, so they match a sum over used_credit exactly
+        credit, fee = self._credit.pop(account.id), self._fee.pop(account.id)
+        if outstanding:
+            self._credit[account.id] = sum(outstanding)
+            self._fee[account.id] = sum(self.calculate_fee(amount) for amount in outstanding)
+        if self._credit:
+            self.total_credit += self._credit.get(account.id, 0) - credit
+            self.total_fee += self._fee.get(account.id, 0) - fee
+        else:
+            self.total_credit, self.total_fee = 0, 0
+
+    def get_total_credit(self, account: Account) -> float:
+        return self._credit.get(account.id, 0)
+
+    def get_total_fee(self, account: Account) -> float:
+        return self._fee.get(account.id, 0)
+
+
+class IndexedPricedCreditFacility(IndexedCreditFacility):
+    """
+    Lends any amount, charging a fee of base_fee plus base_rate times the amount for each loan, like PSSimPy's
+    Simple Priced facility. Lending costs O(1) and the simulator's queries of an account's credit and fees O(1).
+    """
+
+    def __init__(self, base_fee: float = 0, base_rate: float = 0) -> None:
+        super().__init__()
+        self.base_fee = base_fee
+        self.base_rate = base_rate
+
+    def calculate_fee(self, amount: float) -> float:
+        return amount * self.base_rate + self.base_fee
+
+    def lend_credit(self, account: Account, amount: float) -> None:
+        self.record_loan(account, amount)
+        account.balance += amount
+
+    def collect_repayment(self, account: Account) -> None:
+        self.repay_loans(account)
+
+
+class IndexedCollateralizedCreditFacility(IndexedCreditFacility):
+    """
+    Lends free of charge against the account's posted collateral, like PSSimPy's Simple Collateralized facility: a loan
+    larger than the collateral still available is refused, and repaid credit frees the collateral again.
+    Lending costs O(1) and the simulator's queries of an account's credit and fees O(1).
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+
+    def calculate_fee(self, amount: float) -> float:
+        return 0.0
+
+    def lend_credit(self, account: Account, amount: float) -> None:
+        if amount > account.posted_collateral:
+            return
+        self.record_loan(account, amount)
+        account.balance += amount
+        account.posted_collateral -= amount
+
+    def collect_repayment(self, account: Account) -> None:
+        self.repay_loans(account, restore_collateral=True)
+
+
+# optimized credit facility templates by class name, as referenced by credit facility agents that extend them
+CREDIT_FACILITY_TEMPLATE_CLASSES = {cls.__name__: cls for cls in (IndexedPricedCreditFacility, IndexedCollateralizedCreditFacility)}
@@ -0,0 +1,113 @@
+import io
+import os
+import hashlib
+import threading
+import weakref
+from typing import Optional, Tuple
+import pandas as pd
+
+
+def dataset_key(data: bytes) -> str:
+    """Content address of an uploaded file: the SHA-256 hex digest of its bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class DatasetStore:
+    """
+    Content-addressed store of parsed CSV datasets, shared by every session of the app.
+
+    Identical uploads hash to the same key, so they are parsed once and all sessions reference the same DataFrame.
+    Datasets are held weakly: a dataset stays in the store while any session holds it, and is freed with the last one.
+    Shared datasets are read-only by convention; callers must copy a DataFrame before modifying it.
+
+    If a directory is given, parsed datasets are also written there as Arrow IPC files and loaded memory-mapped,
+    so that numeric columns are backed by the page cache rather than process memory, and a dataset that has been
+    freed can be reloaded without parsing the CSV again.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self._datasets = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._parsing = {}  # key -> lock held while the dataset is parsed
+        self.hits = 0
+        self.misses = 0
+
+    def _arrow_path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.arrow')
+
+    def _load(self, key: str, data: bytes) -> pd.DataFrame:
+        if self.directory is None:
+            return pd.read_csv(io.BytesIO(data))
+
+        import pyarrow as pa
+        path = self._arrow_path(key)
+        if not os.path.exists(path):
+            table = pa.Table.from_pandas(pd.read_csv(io.BytesIO(data)), preserve_index=False)
+            # write to a temporary file first so that concurrent readers never see a partial file
+            temp_path = f'{path}.{threading.get_ident()}.tmp'
+            with pa.OSFile(temp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(temp_path, path)
+        with pa.memory_map(path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+        # split_blocks lets numeric columns without nulls reference the memory-mapped buffers without copying
+        return table.to_pandas(split_blocks=True)
+
+    def get_or_parse(self, data: bytes) -> Tuple[str, pd.DataFrame]:
+        """
+        Returns the key and the DataFrame of a CSV file, parsing it only if no identical file is in the store.
+
+        Args:
+            data (bytes): Content of the CSV file.
+
+        Returns:
+            Tuple[str, pd.DataFrame]: The content key and the shared, read-only DataFrame.
+
+        Raises:
+            ValueError: If the file cannot be parsed as CSV.
+        """
+        key = dataset_key(data)
+        with self._lock:
+            df = self._datasets.get(key)
+            if df is not None:
+                self.hits += 1
+                return key, df
+            key_lock = self._parsing.setdefault(key, threading.Lock())
+
+        # concurrent uploads of the same file wait for the first one to be parsed, other files are parsed in parallel
+        with key_lock:
+            with self._lock:
+                df = self._datasets.get(key)
+            if df is None:
+                try:
+                    df = self._load(key, data)
+                except ValueError as e:  # including pandas' parser errors, pyarrow's ArrowInvalid and decoding errors
+                    raise ValueError(f'The file cannot be parsed as CSV: {e}') from e
+                finally:
+                    # a failed parse leaves nothing behind, so the next upload of the file parses it again
+                    with self._lock:
+                        if df is not None:
+                            self._datasets[key] = df
+                            self.misses += 1
+                        self._parsing.pop(key, None)
+                return key, df
+        with self._lock:
+            self.hits += 1
+        return key, df
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Returns the dataset with the given key, if it is held by the store."""
+        return self._datasets.get(key)
+
+    def stats(self) -> dict:
+        """Number of datasets held, their total memory and the cache hits and misses so far."""
+        datasets = list(self._datasets.values())
+        return {
+            'datasets': len(datasets),
+            'memory_bytes': int(sum(df.memory_usage(deep=True).sum() for df in datasets)),
+            'hits': self.hits,
+            'misses': self.misses
+        }
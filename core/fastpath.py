@@ -0,0 +1,295 @@
+"""
+Vectorized settlement engine for configurations that use only the default agents.
+
+With pass-through constraints, a direct queue, Normal bank strategies and PSSimPy's Simple Priced credit facility,
+every transaction is settled in the processing window it arrives in, after its sender borrows whatever its balance
+does not cover. FastSimulation settles each window with NumPy over arrays of account balances indexed by account,
+instead of moving Transaction objects through the agents, and writes the same log files as ABMSim.
+
+Logs match ABMSim's row for row, up to the order of the rows within a processing window, which ABMSim does not fix
+either. Balances of non-integer amounts may differ in the last digit, since the amounts are summed in another order.
+"""
+import inspect
+import textwrap
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from PSSimPy.constraint_handler import PassThroughHandler
+from PSSimPy.credit_facilities import SimplePriced
+from PSSimPy.queues import DirectQueue
+from PSSimPy.transaction_fee import FixedTransactionFee
+from PSSimPy.utils.constants import TRANSACTION_LOGGER_HEADER, TRANSACTION_FEE_LOGGER_HEADER, QUEUE_STATS_HEADER, \
+    ACCOUNT_BALANCE_HEADER, CREDIT_FACILITY_LOGGER_HEADER
+from PSSimPy.utils.logger import Logger
+from PSSimPy.utils.time_utils import add_minutes_to_time, minutes_between
+
+from core.agents import AGENT_TEMPLATE_CLASSES, DEFAULT_AGENT_CLASSES, agent_methods, resolve_agent_class
+from core.config import SimulationConfig
+from core.fees import ScheduledTransactionFee, fee_schedule, time_to_minutes
+from core.logs import log_file_path
+
+# agent classes that the fast path reproduces, used as defaults or with their template code unchanged
+FAST_PATH_AGENTS = {
+    'Constraint Handler': (PassThroughHandler,),
+    'Queue': (DirectQueue,),
+    'Transaction Fee': (FixedTransactionFee, ScheduledTransactionFee),
+    'Credit Facility': (SimplePriced,)
+}
+
+
+@lru_cache(maxsize=None)
+def _template_code(agent_type: str, cls: type) -> str:
+    # the template code as the agent pages put it into the code editor
+    return '\n\n'.join(textwrap.dedent(inspect.getsource(getattr(cls, method))) for method in agent_methods(agent_type)).strip()
+
+
+def stock_agent_class(config: SimulationConfig, agent_type: str) -> Optional[type]:
+    """Returns the fast path agent class that the configured agent behaves as, or None if it has custom logic."""
+    spec = config.agent(agent_type)
+    if spec.implementation is None:
+        return DEFAULT_AGENT_CLASSES[agent_type]
+    for cls in FAST_PATH_AGENTS[agent_type]:
+        base = cls.__name__ if cls.__name__ in AGENT_TEMPLATE_CLASSES[agent_type] else None
+        if spec.base == base and spec.implementation.strip() == _template_code(agent_type, cls):
+            return cls
+    return None
+
+
+def fast_path_blockers(config: SimulationConfig) -> List[str]:
+    """
+    Checks whether a configuration can run on the fast path.
+
+    Returns:
+        List[str]: The reasons that the configuration needs the agent-based simulator, empty if the fast path applies.
+    """
+    blockers = []
+    if config.random_transactions:
+        blockers.append('Transactions are generated during the simulation.')
+    elif config.transactions is None or 'time' not in config.transactions.columns:
+        blockers.append('The transactions have no arrival times.')
+    if 'strategy_type' in config.banks.columns and (config.banks['strategy_type'] != 'Normal').any():
+        blockers.append('Some banks use custom strategies.')
+    for agent_type in FAST_PATH_AGENTS:
+        if stock_agent_class(config, agent_type) is None:
+            names = ' or '.join(cls.__name__ for cls in FAST_PATH_AGENTS[agent_type])
+            blockers.append(f'The {agent_type.lower()} has custom logic; the fast path supports {names}.')
+    if stock_agent_class(config, 'Transaction Fee') is FixedTransactionFee and isinstance(config.transaction_fee_rate, dict):
+        blockers.append('A time-of-day fee rate needs the scheduled rate fee template.')
+    return blockers
+
+
+def window_slots(
+    arrival_times: Sequence[str],
+    arrival_days: Sequence[int],
+    open_time: str,
+    close_time: str,
+    processing_window: int,
+    num_days: int
+) -> Tuple[List[int], np.ndarray]:
+    """
+    Assigns transactions to the processing window in which ABMSim gathers them.
+
+    Args:
+        arrival_times (Sequence[str]): The 'HH:MM' arrival time of each transaction.
+        arrival_days (Sequence[int]): The arrival day of each transaction, counted from 1.
+        open_time (str): Opening time of the system.
+        close_time (str): Closing time of the system.
+        processing_window (int): Length of a processing window in minutes.
+        num_days (int): Number of simulated days.
+
+    Returns:
+        Tuple[List[int], np.ndarray]: The start of each day's windows in minutes after opening, and the slot of each
+            transaction, (day - 1) * windows per day + window, or -1 for transactions that are never gathered.
+    """
+    window_starts = list(range(0, max(minutes_between(open_time, close_time), 0), processing_window))
+    open_minutes = time_to_minutes(open_time)
+    minutes = np.fromiter((time_to_minutes(time) for time in arrival_times), dtype=int, count=len(arrival_times)) - open_minutes
+    window = np.floor_divide(minutes, processing_window)
+    # windows whose last minute is past midnight gather nothing, as ABMSim compares clock times
+    last_valid_window = (24 * 60 - open_minutes) // processing_window - 1
+    days = np.asarray(arrival_days)
+    gathered = (minutes >= 0) & (window < min(len(window_starts), last_valid_window + 1)) & (days >= 1) & (days <= num_days) & (days == days.astype(int))
+    return window_starts, np.where(gathered, (days.astype(int) - 1) * len(window_starts) + window, -1)
+
+
+class FastSimulation:
+    """
+    Runs a simulation whose configuration passes fast_path_blockers, like ABMSim with the same settings.
+    Each processing window costs O(accounts + transactions in the window) in NumPy operations, and transactions are
+    assigned to their windows once, rather than searched for in every window.
+    """
+
+    def __init__(self, config: SimulationConfig, sim_name: str = 'PSSimPy-web', log_dir: Optional[str] = None):
+        blockers = fast_path_blockers(config)
+        if blockers:
+            raise ValueError(' '.join(blockers))
+        self.sim_name = sim_name
+        self.log_dir = log_dir
+        self.open_time = config.parameters['Opening Time']
+        self.close_time = config.parameters['Closing Time']
+        self.processing_window = config.parameters['Processing Window']
+        self.num_days = config.parameters['Number of Days']
+
+        # accounts, with their values as loaded by ABMSim, so that the logs show the same numbers
+        accounts = config.accounts.to_dict(orient='list')
+        bank_names = set(config.banks['name'])
+        for owner in accounts['owner']:
+            if owner not in bank_names:
+                # as raised by ABMSim when an account's owner is not a bank
+                raise KeyError(owner)
+        self.account_ids = accounts['id']
+        account_index = {account_id: i for i, account_id in enumerate(self.account_ids)}
+        balances = accounts.get('balance', [0] * len(self.account_ids))
+        self.balance = np.array(balances, dtype=float)
+        # ABMSim's balances stay integers until a float amount or credit is added to them
+        self.integer_balance = np.array([isinstance(balance, int) for balance in balances], dtype=bool)
+        self.posted_collateral = accounts.get('posted_collateral', [0] * len(self.account_ids))
+
+        # transactions, assigned to the processing window that gathers them
+        transactions = config.transactions.to_dict(orient='list')
+        self.amounts = transactions['amount']
+        self.arrival_days = transactions.get('day', [1] * len(self.amounts))
+        self.arrival_times = transactions['time']
+        self.senders = np.array([account_index[account_id] for account_id in transactions['sender_account']], dtype=np.intp)
+        self.recipients = np.array([account_index[account_id] for account_id in transactions['recipient_account']], dtype=np.intp)
+        self.amount_array = np.array(self.amounts, dtype=float)
+        self.float_amount = np.array([not isinstance(amount, int) for amount in self.amounts], dtype=bool)
+        self._assign_windows()
+
+        # outstanding loans of the credit facility in the order they were lent, as in SimplePriced.used_credit
+        credit_facility = resolve_agent_class('Credit Facility', **vars(config.credit_facility))()
+        self.base_fee = credit_facility.base_fee
+        self.base_rate = credit_facility.base_rate
+        self.loan_accounts: List[np.ndarray] = []
+        self.loan_amounts: List[np.ndarray] = []
+        self.total_credit = np.zeros(len(self.account_ids))
+        self.total_fee = np.zeros(len(self.account_ids))
+        self.num_loans = np.zeros(len(self.account_ids), dtype=int)
+
+        self.fee_rate = config.transaction_fee_rate
+        self.scheduled_fee = stock_agent_class(config, 'Transaction Fee') is ScheduledTransactionFee
+
+        self.loggers = {
+            log_type: Logger(log_file_path(log_type, sim_name, log_dir), header) for log_type, header in (
+                ('processed_transactions', TRANSACTION_LOGGER_HEADER),
+                ('transaction_fees', TRANSACTION_FEE_LOGGER_HEADER),
+                ('queue_stats', QUEUE_STATS_HEADER),
+                ('account_balance', ACCOUNT_BALANCE_HEADER),
+                ('credit_facility', CREDIT_FACILITY_LOGGER_HEADER)
+            )
+        }
+        self.rows: Dict[str, list] = {log_type: [] for log_type in self.loggers}
+
+    def _assign_windows(self):
+        """Sorts the transactions by the (day, window) in which ABMSim gathers them, leaving out those it never gathers."""
+        self.window_starts, slots = window_slots(
+            self.arrival_times, self.arrival_days, self.open_time, self.close_time, self.processing_window, self.num_days
+        )
+        num_windows = len(self.window_starts)
+        self.window_order = np.argsort(slots, kind='stable')
+        sorted_slots = slots[self.window_order]
+        self.window_bounds = np.searchsorted(sorted_slots, np.arange(self.num_days * num_windows + 1))
+
+    def run(self):
+        """Runs every day of the simulation and writes the logs."""
+        num_windows = len(self.window_starts)
+        for day in range(1, self.num_days + 1):
+            for window, start in enumerate(self.window_starts):
+                slot = (day - 1) * num_windows + window
+                batch = self.window_order[self.window_bounds[slot]:self.window_bounds[slot + 1]]
+                self._settle_window(day, add_minutes_to_time(self.open_time, start), batch)
+            self._perform_eod(day)
+            self._flush()
+
+    def _settle_window(self, day: int, time: str, batch: np.ndarray):
+        if len(batch):
+            senders, recipients, amounts = self.senders[batch], self.recipients[batch], self.amount_array[batch]
+            num_accounts = len(self.balance)
+            # senders borrow what their balance does not cover of the window's payments
+            requirement = np.bincount(senders, amounts, num_accounts)
+            credit = requirement - self.balance
+            borrowers = np.flatnonzero((np.bincount(senders, minlength=num_accounts) > 0) & (credit > 0))
+            if len(borrowers):
+                self._lend(borrowers, credit[borrowers])
+            self.balance -= requirement
+            self.balance += np.bincount(recipients, amounts, num_accounts)
+            float_batch = batch[self.float_amount[batch]]
+            self.integer_balance[self.senders[float_batch]] = False
+            self.integer_balance[self.recipients[float_batch]] = False
+
+            day_values = [self.arrival_days[i] for i in batch.tolist()]
+            self.rows['processed_transactions'].extend(
+                (arrival_day, self.arrival_times[i], self.account_ids[sender], self.account_ids[recipient], self.amounts[i], 'Success', day, time, day, time)
+                for arrival_day, i, sender, recipient in zip(day_values, batch.tolist(), senders.tolist(), recipients.tolist())
+            )
+            fees = self._fees(batch, time)
+            self.rows['transaction_fees'].extend((self.account_ids[sender], day, time, fee) for sender, fee in zip(senders.tolist(), fees))
+        self._log_period(day, time)
+
+    def _fees(self, batch: np.ndarray, time: str) -> list:
+        if self.scheduled_fee:
+            return fee_schedule(self.fee_rate).fees(self.amount_array[batch], time).tolist()
+        if isinstance(self.fee_rate, int):
+            # integer amounts keep integer fees, as with FixedTransactionFee
+            return [self.amounts[i] * self.fee_rate for i in batch.tolist()]
+        return (self.amount_array[batch] * self.fee_rate).tolist()
+
+    def _lend(self, accounts: np.ndarray, amounts: np.ndarray):
+        self.balance[accounts] += amounts
+        self.integer_balance[accounts] = False
+        self.loan_accounts.append(accounts)
+        self.loan_amounts.append(amounts)
+        self.total_credit[accounts] += amounts
+        self.total_fee[accounts] += amounts * self.base_rate + self.base_fee
+        self.num_loans[accounts] += 1
+
+    def _collect_repayment(self):
+        """Repays each account's loans in the order they were lent while its balance covers them, like SimplePriced."""
+        if not self.loan_accounts:
+            return
+        accounts, amounts = np.concatenate(self.loan_accounts), np.concatenate(self.loan_amounts)
+        # the n-th loans of all accounts are repaid together, in the order of n
+        order = np.argsort(accounts, kind='stable')
+        group_starts = np.searchsorted(accounts[order], accounts[order], side='left')
+        rank = np.empty(len(order), dtype=int)
+        rank[order] = np.arange(len(order)) - group_starts
+        outstanding = np.ones(len(accounts), dtype=bool)
+        for n in range(rank.max() + 1):
+            loans = np.flatnonzero(rank == n)
+            repaid = loans[amounts[loans] <= self.balance[accounts[loans]]]
+            self.balance[accounts[repaid]] -= amounts[repaid]
+            outstanding[repaid] = False
+
+        accounts, amounts = accounts[outstanding], amounts[outstanding]
+        self.loan_accounts, self.loan_amounts = ([accounts], [amounts]) if len(accounts) else ([], [])
+        # totals are summed again over the remaining loans in their order, as SimplePriced sums its lists
+        self.total_credit[:] = 0
+        self.total_fee[:] = 0
+        np.add.at(self.total_credit, accounts, amounts)
+        np.add.at(self.total_fee, accounts, amounts * self.base_rate + self.base_fee)
+        self.num_loans = np.bincount(accounts, minlength=len(self.balance))
+
+    def _perform_eod(self, day: int):
+        # the direct queue is empty and every gathered transaction is settled, so queue clearing and forced settlement do nothing
+        self._collect_repayment()
+        self._log_period(day, self.close_time)
+
+    def _log_period(self, day: int, time: str):
+        self.rows['queue_stats'].append((day, time, 0, 0))
+        num_accounts = len(self.account_ids)
+        balances = self.balance.astype(object)
+        balances[self.integer_balance] = self.balance[self.integer_balance].astype(np.int64).astype(object)
+        self.rows['account_balance'].extend(zip([day] * num_accounts, [time] * num_accounts, self.account_ids, balances.tolist()))
+        # accounts without loans report the integer 0 of summing an empty list
+        no_loans = self.num_loans == 0
+        total_credit, total_fee = self.total_credit.astype(object), self.total_fee.astype(object)
+        total_credit[no_loans] = 0
+        total_fee[no_loans] = 0
+        self.rows['credit_facility'].extend(zip(
+            [day] * num_accounts, [time] * num_accounts, self.account_ids, self.posted_collateral, total_credit.tolist(), total_fee.tolist()
+        ))
+
+    def _flush(self):
+        for log_type, logger in self.loggers.items():
+            logger.write(self.rows[log_type])
+            self.rows[log_type] = []
@@ -0,0 +1,138 @@
+"""
+Time-of-day transaction fee schedules.
+
+With a dynamic transaction fee, the fee rate is a {'HH:MM': rate} dictionary in which each rate applies from its time
+until the next time in the schedule. A FeeSchedule compiles the dictionary once into sorted minute breakpoints, so the
+rate at a time is found by binary search instead of comparing time strings on every fee calculation.
+"""
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+import numpy as np
+from PSSimPy.transaction_fee import AbstractTransactionFee
+
+from utils.date_time import is_24_hour_format
+
+
+def time_to_minutes(time: str) -> int:
+    """Minutes since midnight of an 'HH:MM' time."""
+    hours, minutes = time.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def validate_fee_schedule(time_rate_pairs: Sequence[Tuple[str, float]]) -> List[str]:
+    """
+    Checks the breakpoints of a dynamic fee rate before it is saved.
+
+    Args:
+        time_rate_pairs (Sequence[Tuple[str, float]]): (time, rate) pairs as entered, which may repeat times.
+
+    Returns:
+        List[str]: A description of each problem found, empty if the schedule is valid.
+    """
+    if not time_rate_pairs:
+        return ['The fee schedule needs at least one time-rate pair.']
+    problems = []
+    seen = set()
+    for time, rate in time_rate_pairs:
+        if not is_24_hour_format(time):
+            problems.append(f"'{time}' is not a time in 24h HH:MM format.")
+            continue
+        minutes = time_to_minutes(time)
+        if minutes in seen:
+            problems.append(f"The time {time} is used more than once.")
+        seen.add(minutes)
+        if not 0 <= rate <= 1:
+            problems.append(f"The rate {rate} at {time} is not between 0 and 1.")
+    return problems
+
+
+class FeeSchedule:
+    """
+    Compiled time-of-day fee rates. Times before the first breakpoint use the first breakpoint's rate.
+    Looking up a rate costs O(log k) for k breakpoints, and O(1) for a time that was looked up before.
+    """
+
+    def __init__(self, rates: Union[float, Dict[str, float]]):
+        if not isinstance(rates, dict):
+            rates = {'00:00': float(rates)}
+        problems = validate_fee_schedule(list(rates.items()))
+        if problems:
+            raise ValueError(' '.join(problems))
+        breakpoints = sorted((time_to_minutes(time), rate) for time, rate in rates.items())
+        self.breakpoints = np.array([minutes for minutes, _ in breakpoints])
+        self.rates = np.array([rate for _, rate in breakpoints], dtype=float)
+        self._breakpoint_list = self.breakpoints.tolist()
+        self._rate_list = self.rates.tolist()
+        self._rate_at_time: Dict[str, float] = {}  # a simulation only uses the times of its processing windows
+
+    def rate_at(self, time: str) -> float:
+        """Fee rate at an 'HH:MM' time."""
+        rate = self._rate_at_time.get(time)
+        if rate is None:
+            index = bisect_right(self._breakpoint_list, time_to_minutes(time)) - 1
+            rate = self._rate_at_time[time] = self._rate_list[max(index, 0)]
+        return rate
+
+    def rates_at(self, times: Iterable[str]) -> np.ndarray:
+        """Fee rates at many 'HH:MM' times at once."""
+        minutes = np.fromiter((time_to_minutes(time) for time in times), dtype=int)
+        indices = np.searchsorted(self.breakpoints, minutes, side='right') - 1
+        return self.rates[np.maximum(indices, 0)]
+
+    def fees(self, txn_amounts: Sequence[float], times: Union[str, Iterable[str]]) -> np.ndarray:
+        """
+        Fees of many transactions at once, e.g. of all transactions settled in a processing window.
+
+        Args:
+            txn_amounts (Sequence[float]): The transaction amounts.
+            times (Union[str, Iterable[str]]): The settlement time shared by all transactions, or one time per transaction.
+
+        Returns:
+            np.ndarray: The fee of each transaction.
+        """
+        amounts = np.asarray(txn_amounts, dtype=float)
+        rates = self.rate_at(times) if isinstance(times, str) else self.rates_at(times)
+        return amounts * rates
+
+
+@lru_cache(maxsize=64)
+def _compile_fee_schedule(rate_items: Tuple[Tuple[str, float], ...]) -> FeeSchedule:
+    return FeeSchedule(dict(rate_items))
+
+
+def fee_schedule(rate: Union[float, Dict[str, float]]) -> FeeSchedule:
+    """Returns the compiled schedule of a fixed or dynamic fee rate. Schedules are cached, so each rate is compiled once."""
+    if not isinstance(rate, dict):
+        return _compile_fee_schedule((('00:00', float(rate)),))
+    return _compile_fee_schedule(tuple(sorted(rate.items())))
+
+
+class ScheduledTransactionFee(AbstractTransactionFee):
+    """
+    Charges the transaction amount times the rate that applies at the settlement time, for fixed and dynamic fee rates.
+    The schedule is compiled once per rate, so calculate_fee costs O(1) for times that were priced before and O(log k) otherwise.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._schedule_rate = None
+        self._schedule = None
+
+    def fee_schedule(self, rate: Union[float, Dict[str, float]]) -> FeeSchedule:
+        """The compiled schedule of the rate. The simulator passes the same rate to every call, so it is compiled once."""
+        if rate is not self._schedule_rate:
+            self._schedule = fee_schedule(rate)
+            self._schedule_rate = rate
+        return self._schedule
+
+    def calculate_fee(self, txn_amount: int, time: str, rate: Union[float, Dict[str, float]]) -> float:
+        return txn_amount * self.fee_schedule(rate).rate_at(time)
+
+    def calculate_fees(self, txn_amounts: Sequence[float], time: Union[str, Iterable[str]], rate: Union[float, Dict[str, float]]) -> np.ndarray:
+        """Fees of many transactions settled at one time, or at one time each, computed at once."""
+        return self.fee_schedule(rate).fees(txn_amounts, time)
+
+
+# optimized transaction fee templates by class name, as referenced by fee agents that extend them
+FEE_TEMPLATE_CLASSES = {ScheduledTransactionFee.__name__: ScheduledTransactionFee}
@@ -0,0 +1,102 @@
+import pandas as pd
+
+from utils.date_time import get_time_windows, is_time_earlier_or_equal
+from utils.indicator import turnover_ratio, average_payment_delay
+
+# Turnover Ratio Calculation Function
+def calculate_turnover_ratios(transactions_df, balances_df, opening_time, closing_time, processing_window, num_days, first_day=1):
+    # Create an empty list to store the results
+    results = []
+
+    # Loop through each day of the simulation, from the first day requested
+    for day in range(first_day, num_days + 1):
+        # Get the time windows for the day
+        time_windows = get_time_windows(opening_time, closing_time, processing_window)
+        
+        # For each time window, calculate the turnover ratio
+        for i, time_window in enumerate(time_windows):
+            # Filter transactions up to the current time window
+            filtered_transactions = transactions_df[
+                (transactions_df['day'] == day) & 
+                (transactions_df['time'].apply(lambda t: is_time_earlier_or_equal(t, time_window))) &
+                (transactions_df['status'] == 'Success')
+            ]
+
+            
+            # Sum of all successful payments settled
+            total_payments_settled = filtered_transactions['amount'].sum()
+            
+            # Filter balances up to the current time window
+            filtered_balances = balances_df[
+                (balances_df['day'] == day) & 
+                (balances_df['time'] <= time_window)
+            ]
+            
+            # Average liquidity (sum of all balances divided by number of periods passed)
+            periods_passed = i + 1
+            average_liquidity = filtered_balances['balance'].sum() / periods_passed
+            
+            # Calculate turnover ratio for the current period
+            turnover = turnover_ratio(total_payments_settled, average_liquidity)
+            
+            # Append results to the list
+            results.append({
+                'day': day,
+                'time': time_window,
+                'turnover_ratio': turnover
+            })
+
+    # Convert the results list to a DataFrame
+    turnover_df = pd.DataFrame(results)
+
+    return turnover_df
+
+# Average Payment Delay Calculation Function
+def calculate_avg_pmt_delay(transactions_df, opening_time, closing_time, processing_window, num_days, delay_from_arrival=False, first_day=1):
+    # Create an empty list to store the results
+    results = []
+
+    # Loop through each day of the simulation, from the first day requested
+    for day in range(first_day, num_days + 1):
+        # Get the time windows for the day
+        time_windows = get_time_windows(opening_time, closing_time, processing_window)
+    
+        # For each time window, calculate the average payment delay
+        for i, time_window in enumerate(time_windows):
+            # Filter transactions up to the current time window
+            filtered_transactions = transactions_df[
+                (
+                    (transactions_df['day'] == day) & 
+                    (transactions_df['time'].apply(lambda t: is_time_earlier_or_equal(t, time_window))) &
+                    (transactions_df['status'] == 'Success')
+                ) |
+                (
+                    (transactions_df['day'] < day) &
+                    (transactions_df['status'] == 'Success')
+                )
+            ]
+            
+            # select whether to calculate delay from time of arrival or time of payment submission
+            transaction_start_times = filtered_transactions['time'] if delay_from_arrival else filtered_transactions['submission_time']
+            transaction_start_days = filtered_transactions['day'] if delay_from_arrival else filtered_transactions['submission_day']
+
+            payment_delay_metric = average_payment_delay(
+                transaction_start_times.tolist(), 
+                filtered_transactions['settlement_time'].tolist(), 
+                transaction_start_days.tolist(),
+                filtered_transactions['settlement_day'].tolist(),
+                filtered_transactions['amount'].tolist(),
+                True
+            )
+            
+            # Append results to the list
+            results.append({
+                'day': day,
+                'time': time_window,
+                'average_payment_delay': payment_delay_metric
+            })
+
+    # Convert the results list to a DataFrame
+    payment_delay_df = pd.DataFrame(results)
+
+    return payment_delay_df
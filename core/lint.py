@@ -0,0 +1,189 @@
+import ast
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from core.agents import AGENT_METHODS
+
+# rules and the severity they are reported with, 'error' rules block the code from being saved
+LINT_RULES = {
+    'syntax-error': 'error',
+    'missing-method': 'error',
+    'unbounded-loop': 'error',
+    'registry-scan': 'warning',
+    'pandas-in-hot-path': 'warning',
+    'import-in-hot-path': 'warning',
+    'nested-loop': 'warning',
+    'sort-in-hot-path': 'warning',
+    'io-in-hot-path': 'warning',
+    'deepcopy-in-hot-path': 'warning'
+}
+
+# methods of each agent type that the simulator calls for every transaction, queue item or bank in every period,
+# and the rule severities that differ from LINT_RULES (None disables a rule)
+AGENT_LINT_CONFIG = {
+    'Bank Strategy': {
+        'hot_methods': ['strategy'],
+        # a strategy is called once per bank and period, so ordering its transactions is expected
+        'rules': {'sort-in-hot-path': None}
+    },
+    # process_batch is called once per processing window with all of its transactions
+    'Constraint Handler': {'hot_methods': ['process_transaction', 'process_batch'], 'rules': {}},
+    'Transaction Fee': {'hot_methods': ['calculate_fee'], 'rules': {}},
+    'Queue': {
+        'hot_methods': ['sorting_logic', 'dequeue_criteria'],
+        # called for every queued transaction whenever the queue is sorted or dequeued
+        'rules': {'registry-scan': 'error'}
+    },
+    'Credit Facility': {'hot_methods': ['calculate_fee', 'lend_credit', 'collect_repayment'], 'rules': {}}
+}
+
+PANDAS_NAMES = {'pd', 'pandas'}
+PANDAS_METHODS = {'iterrows', 'itertuples', 'apply', 'applymap', 'groupby', 'merge', 'to_dict', 'to_frame', 'read_csv'}
+IO_CALLS = {'print', 'open', 'input'}
+
+
+@dataclass
+class LintIssue:
+    """A problem found in agent code. Line numbers are those of the linted code, starting at 1."""
+    rule: str
+    severity: str
+    line: int
+    message: str
+
+    def __str__(self) -> str:
+        return f"Line {self.line}: {self.message} [{self.rule}]"
+
+
+def _call_name(node: ast.Call) -> Optional[str]:
+    """Name of a called function or method, e.g. 'sorted' or 'get_instances'."""
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+def _call_owner(node: ast.Call) -> Optional[str]:
+    """Name of the object a method is called on, e.g. 'pd' for pd.DataFrame()."""
+    if isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name):
+        return node.func.value.id
+    return None
+
+
+def _exits_loop(loop: ast.While) -> bool:
+    """Whether a while loop contains a break, return or raise that is not inside a nested loop or function."""
+    nodes = list(loop.body)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, (ast.Break, ast.Return, ast.Raise)):
+            return True
+        if isinstance(node, (ast.For, ast.While)):
+            # a break in a nested loop only leaves that loop, but a return still leaves the method
+            nodes.extend(n for n in ast.walk(node) if isinstance(n, (ast.Return, ast.Raise)))
+            continue
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            continue
+        nodes.extend(ast.iter_child_nodes(node))
+    return False
+
+
+class _HotPathVisitor(ast.NodeVisitor):
+    """Collects issues within one method that is called on the simulator's hot path."""
+
+    def __init__(self, method_name: str, report):
+        self.method_name = method_name
+        self.report = report
+        self.loop_depth = 0
+
+    def _visit_loop(self, node):
+        if self.loop_depth > 0:
+            self.report('nested-loop', node, f"Nested loop in '{self.method_name}'; its cost grows with the square of the number of items.")
+        self.loop_depth += 1
+        self.generic_visit(node)
+        self.loop_depth -= 1
+
+    visit_For = visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _visit_loop
+
+    def visit_While(self, node: ast.While):
+        if isinstance(node.test, ast.Constant) and node.test.value and not _exits_loop(node):
+            self.report('unbounded-loop', node, f"Loop in '{self.method_name}' never ends: it has a constant condition and no break or return.")
+        self._visit_loop(node)
+
+    def visit_Import(self, node):
+        self.report('import-in-hot-path', node, f"Import inside '{self.method_name}' runs on every call; import at the top of the code instead.")
+        if any(alias.name.split('.')[0] == 'pandas' for alias in node.names):
+            self.report('pandas-in-hot-path', node, f"pandas is used in '{self.method_name}', which is called for every item; use plain Python objects instead.")
+
+    def visit_ImportFrom(self, node):
+        self.report('import-in-hot-path', node, f"Import inside '{self.method_name}' runs on every call; import at the top of the code instead.")
+        if (node.module or '').split('.')[0] == 'pandas':
+            self.report('pandas-in-hot-path', node, f"pandas is used in '{self.method_name}', which is called for every item; use plain Python objects instead.")
+
+    def visit_Attribute(self, node: ast.Attribute):
+        if node.attr == '_instances':
+            self.report('registry-scan', node, f"'{self.method_name}' reads every instance ever created; keep the data it needs in the agent instead.")
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call):
+        name, owner = _call_name(node), _call_owner(node)
+        if name == 'get_instances':
+            self.report('registry-scan', node, f"'{self.method_name}' scans every instance ever created on each call; keep the data it needs in the agent instead.")
+        elif owner in PANDAS_NAMES or name in PANDAS_METHODS:
+            self.report('pandas-in-hot-path', node, f"pandas is used in '{self.method_name}', which is called for every item; use plain Python objects instead.")
+        elif name in ('sorted', 'sort'):
+            self.report('sort-in-hot-path', node, f"Sorting in '{self.method_name}' on every call; sort once outside the per-item method instead.")
+        elif name in IO_CALLS or (owner == 'time' and name == 'sleep'):
+            self.report('io-in-hot-path', node, f"'{name}' in '{self.method_name}' runs on every call and slows down the simulation.")
+        elif name == 'deepcopy':
+            self.report('deepcopy-in-hot-path', node, f"Deep copy in '{self.method_name}' on every call; copy only what needs to change.")
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node):
+        # nested functions are visited with the loop depth of their own body
+        depth, self.loop_depth = self.loop_depth, 0
+        self.generic_visit(node)
+        self.loop_depth = depth
+
+
+def lint_agent_code(agent_type: str, code: str, rules: Optional[Dict[str, Optional[str]]] = None, methods: Optional[List[str]] = None) -> List[LintIssue]:
+    """
+    Checks user-written agent code for syntax errors, missing methods and known performance traps in the methods
+    that the simulator calls on its hot path, without executing the code.
+
+    Args:
+        agent_type (str): 'Bank Strategy' or one of the agent types, e.g. 'Queue'.
+        code (str): Code defining the methods listed in AGENT_METHODS for the agent type.
+        rules (Dict[str, Optional[str]]): Rule severities that override LINT_RULES and the agent type's configuration.
+            A severity of None disables the rule.
+        methods (List[str]): The methods the code must define, e.g. those of the template class it extends.
+            Defaults to the methods listed in AGENT_METHODS for the agent type.
+
+    Returns:
+        List[LintIssue]: The issues found, ordered by line.
+    """
+    config = AGENT_LINT_CONFIG[agent_type]
+    severities = {**LINT_RULES, **config['rules'], **(rules or {})}
+    issues = []
+
+    def report(rule: str, node, message: str):
+        if severities.get(rule) is not None:
+            issues.append(LintIssue(rule, severities[rule], getattr(node, 'lineno', None) or 1, message))
+
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        report('syntax-error', e, f"Syntax error: {e.msg}.")
+        return issues
+
+    defined = {node.name: node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    for method in methods or AGENT_METHODS[agent_type]:
+        if method not in defined:
+            report('missing-method', tree, f"The method '{method}' is not defined.")
+
+    for method in config['hot_methods']:
+        if method in defined:
+            visitor = _HotPathVisitor(method, report)
+            for statement in defined[method].body:
+                visitor.visit(statement)
+
+    return sorted(issues, key=lambda issue: issue.line)
@@ -0,0 +1,105 @@
+"""
+Liquidity bounds of the banks, computed from the input data before a simulation is run.
+
+A bank's upper bound is the liquidity it needs to settle every payment in the processing window it arrives in: the
+largest cumulative net debit (payments sent minus payments received) that it reaches at the end of a window. Its lower
+bound is the liquidity it needs if payments can wait for incoming ones until the end of the day: the largest
+cumulative net debit at the end of a day, i.e. its multilateral net debit position. A bank whose balance is below its
+lower bound cannot settle all of its payments without intraday credit. Between the bounds, settlement depends on
+queueing and on the timing of incoming payments.
+
+Bounds are computed for each bank as a whole, as if its accounts pooled their balances.
+"""
+from typing import Tuple
+import numpy as np
+import pandas as pd
+from PSSimPy.utils.time_utils import add_minutes_to_time
+
+from core.fastpath import window_slots
+
+# status of a bank's balance relative to its bounds
+BELOW_LOWER_BOUND = 'Needs intraday credit'
+BETWEEN_BOUNDS = 'Depends on payment timing'
+ABOVE_UPPER_BOUND = 'Settles immediately'
+
+
+def _window_flows(banks: pd.DataFrame, accounts: pd.DataFrame, transactions: pd.DataFrame, parameters: dict) -> Tuple[pd.Index, list, np.ndarray, np.ndarray]:
+    """Sums each bank's outgoing and incoming payments per (day, window) slot, in one pass over the transactions."""
+    bank_names = pd.Index(banks['name'])
+    owners = dict(zip(accounts['id'], accounts['owner']))
+    sender_banks = bank_names.get_indexer(transactions['sender_account'].map(owners))
+    recipient_banks = bank_names.get_indexer(transactions['recipient_account'].map(owners))
+    arrival_days = transactions['day'].to_numpy() if 'day' in transactions.columns else np.ones(len(transactions), dtype=int)
+    window_starts, slots = window_slots(
+        transactions['time'].tolist(), arrival_days, parameters['Opening Time'], parameters['Closing Time'],
+        parameters['Processing Window'], parameters['Number of Days']
+    )
+    # transactions between unknown accounts or outside the simulated windows never settle
+    counted = (slots >= 0) & (sender_banks >= 0) & (recipient_banks >= 0)
+    num_slots = parameters['Number of Days'] * len(window_starts)
+    amounts = transactions['amount'].to_numpy(dtype=float)[counted]
+    size = len(bank_names) * num_slots
+    outflow = np.bincount(sender_banks[counted] * num_slots + slots[counted], amounts, size).reshape(len(bank_names), num_slots)
+    inflow = np.bincount(recipient_banks[counted] * num_slots + slots[counted], amounts, size).reshape(len(bank_names), num_slots)
+    times = [add_minutes_to_time(parameters['Opening Time'], start) for start in window_starts]
+    return bank_names, times, outflow, inflow
+
+
+def window_net_debits(banks: pd.DataFrame, accounts: pd.DataFrame, transactions: pd.DataFrame, parameters: dict) -> pd.DataFrame:
+    """
+    Cumulative net debit of each bank at the end of each processing window, if every payment settled in the window it arrives in.
+
+    Args:
+        banks (pd.DataFrame): Banks data with a 'name' column.
+        accounts (pd.DataFrame): Accounts data with 'id' and 'owner' columns.
+        transactions (pd.DataFrame): Transactions data with 'sender_account', 'recipient_account', 'amount', 'time'
+            and optionally 'day' columns.
+        parameters (dict): Simulation parameters, as in the session state's 'Parameters'.
+
+    Returns:
+        pd.DataFrame: One row per bank and window, with the window's 'day' and start 'time', the bank's 'outflow'
+            and 'inflow' in the window and its cumulative 'net_debit' since the first window.
+    """
+    bank_names, times, outflow, inflow = _window_flows(banks, accounts, transactions, parameters)
+    num_banks, num_slots = outflow.shape
+    slots = np.tile(np.arange(num_slots), num_banks)
+    return pd.DataFrame({
+        'bank': np.repeat(bank_names.to_numpy(), num_slots),
+        'day': slots // max(len(times), 1) + 1,
+        'time': np.array(times, dtype=object)[slots % len(times)] if times else np.array([], dtype=object),
+        'outflow': outflow.ravel(),
+        'inflow': inflow.ravel(),
+        'net_debit': np.cumsum(outflow - inflow, axis=1).ravel()
+    })
+
+
+def liquidity_bounds(banks: pd.DataFrame, accounts: pd.DataFrame, transactions: pd.DataFrame, parameters: dict) -> pd.DataFrame:
+    """
+    Lower and upper liquidity bounds of each bank, compared with the balances of its accounts.
+
+    Args:
+        banks (pd.DataFrame): Banks data with a 'name' column.
+        accounts (pd.DataFrame): Accounts data with 'id', 'owner' and 'balance' columns.
+        transactions (pd.DataFrame): Transactions data, as for window_net_debits.
+        parameters (dict): Simulation parameters, as in the session state's 'Parameters'.
+
+    Returns:
+        pd.DataFrame: One row per bank with its total 'balance', 'lower_bound', 'upper_bound' and the 'status' of the
+            balance: BELOW_LOWER_BOUND, BETWEEN_BOUNDS or ABOVE_UPPER_BOUND.
+    """
+    bank_names, times, outflow, inflow = _window_flows(banks, accounts, transactions, parameters)
+    net_debit = np.cumsum(outflow - inflow, axis=1)
+    if net_debit.shape[1]:
+        upper_bound = np.maximum(net_debit.max(axis=1), 0)
+        # the net debit at the end of each day, after the day's last window
+        lower_bound = np.maximum(net_debit[:, len(times) - 1::len(times)].max(axis=1), 0)
+    else:
+        upper_bound = lower_bound = np.zeros(len(bank_names))
+    balance = accounts.groupby('owner')['balance'].sum().reindex(bank_names, fill_value=0).to_numpy(dtype=float)
+    return pd.DataFrame({
+        'bank': bank_names.to_numpy(),
+        'balance': balance,
+        'lower_bound': lower_bound,
+        'upper_bound': upper_bound,
+        'status': np.select([balance < lower_bound, balance < upper_bound], [BELOW_LOWER_BOUND, BETWEEN_BOUNDS], ABOVE_UPPER_BOUND)
+    })
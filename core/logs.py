@@ -0,0 +1,88 @@
+import os
+from typing import Dict, Optional, Union
+import pandas as pd
+
+from core.spill import SpillDirectory, SpilledLog, spill_log_file
+
+# session state name of each log and the log file type written by the simulator
+LOG_FILE_TYPES = {
+    'Processed Transactions': 'processed_transactions',
+    'Transaction Fees': 'transaction_fees',
+    'Queue Stats': 'queue_stats',
+    'Account Balance': 'account_balance',
+    'Credit Facility': 'credit_facility',
+    'Transactions Arrival': 'transactions_arrival'
+}
+
+
+def log_file_path(log_file_type: str, sim_name: str = 'PSSimPy-web', log_dir: Optional[str] = None) -> str:
+    """Returns the path of a log file written by a simulation with the given name."""
+    file_name = f'{sim_name}-{log_file_type}.csv'
+    return file_name if log_dir is None else os.path.join(log_dir, file_name)
+
+
+def log_file_reader(log_file_type: str, sim_name: str = 'PSSimPy-web', log_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    Reads and returns log files as a Pandas dataframe. Valid log file types are:
+    1. account_balance
+    2. credit_facility
+    3. queue_stats
+    4. transaction_fees
+    5. transactions_arrival
+    6. processed_transactions
+
+    Raises:
+        ValueError: If the log_file_type is invalid.
+    """
+    # Check if the provided log_file_type is valid
+    valid_log_file_types = list(LOG_FILE_TYPES.values())
+    if log_file_type not in valid_log_file_types:
+        raise ValueError(f"Invalid log file type: {log_file_type}. Valid types are: {', '.join(valid_log_file_types)}")
+
+    # Read and return the log file as a Pandas DataFrame
+    return pd.read_csv(log_file_path(log_file_type, sim_name, log_dir))
+
+
+def load_simulation_logs(
+    include_arrival: bool = False,
+    sim_name: str = 'PSSimPy-web',
+    log_dir: Optional[str] = None,
+    spill_threshold: Optional[int] = None,
+    spill_dir: Optional[str] = None
+) -> Dict[str, Union[pd.DataFrame, SpilledLog]]:
+    """
+    Reads all logs of a simulation run, keyed by their session state names.
+    The transactions arrival log is only written for randomly generated transactions.
+
+    Args:
+        include_arrival (bool): Whether to read the transactions arrival log.
+        sim_name (str): Name of the simulation.
+        log_dir (str): Folder of the log files. Defaults to the working directory.
+        spill_threshold (int): Size in bytes above which a log file is spilled to a memory-mapped Arrow file instead of
+            being read into memory. Defaults to reading every log into memory.
+        spill_dir (str): Folder in which the directory of spilled logs is created. Defaults to the system's temporary folder.
+
+    Returns:
+        Dict[str, Union[pd.DataFrame, SpilledLog]]: The logs, as DataFrames or as handles to spilled logs.
+    """
+    logs = {}
+    spill_directory = None
+    for log_name, log_file_type in LOG_FILE_TYPES.items():
+        if not include_arrival and log_file_type == 'transactions_arrival':
+            continue
+        file_path = log_file_path(log_file_type, sim_name, log_dir)
+        if spill_threshold is not None and os.path.getsize(file_path) > spill_threshold:
+            # all spilled logs of a run share one directory, which is removed with the last of their handles
+            spill_directory = spill_directory or SpillDirectory(spill_dir)
+            logs[log_name] = spill_log_file(file_path, spill_directory)
+        else:
+            logs[log_name] = log_file_reader(log_file_type, sim_name, log_dir)
+    return logs
+
+
+def delete_log_files(sim_name: str = 'PSSimPy-web', log_dir: Optional[str] = None):
+    """Removes the log files of a simulation run, if they exist."""
+    for log_file_type in LOG_FILE_TYPES.values():
+        file_path = log_file_path(log_file_type, sim_name, log_dir)
+        if os.path.exists(file_path):  # Check if the file exists
+            os.remove(file_path)  # Remove the file
@@ -0,0 +1,326 @@
+"""
+Searches for the smallest opening liquidity that meets a settlement target.
+
+The balances of all accounts, or of the accounts of some banks, are multiplied by a scaling factor, and the simulation
+is run at several factors in parallel, each in a sandboxed worker process (see core.sandbox). Each round simulates evenly spaced factors between the largest
+factor known to miss the target and the smallest known to meet it, and narrows the bracket to the pair around the first
+factor that meets it. With one point per round this is a bisection. Outcomes are cached by scaling, so points repeated
+across rounds and searches are simulated once.
+
+ABMSim borrows each account's shortfall in a processing window from the credit facility before settling, so with a
+facility that lends without limit, such as Simple Priced, every scaling settles and the search would end at zero
+balances. The scalings are therefore simulated with a credit facility that lends nothing, unless the search is asked
+to allow the configured facility. ABMSim then still settles what the queue and constraint handler let through, which
+for the default agents is every payment, leaving the sender overdrawn. A scaling only meets the target if none of the
+scaled accounts is overdrawn at the end of a processing window, so that the balances fund the payments settled.
+The liquidity of a scaling is the opening balance of the scaled accounts plus the largest intraday credit they have
+outstanding at the end of a processing window, which is zero without credit.
+
+The search assumes that more liquidity never worsens the outcome, which need not hold for custom agents, and ABMSim
+does not fix the order of the transactions within a processing window, so outcomes close to the target can differ
+between runs. The transactions must be uploaded, so that every factor simulates the same payments.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+from core.config import AgentSpec, SimulationConfig
+from core.fastpath import window_slots
+from core.fees import time_to_minutes
+from core.sandbox import SandboxLimits, SandboxPool
+
+# settlement metrics that a target can be set on, with their label and whether the target is a minimum or a maximum
+TARGET_METRICS = {
+    'settled_value_share': ('Share of value settled', 'min'),
+    'average_delay': ('Average payment delay (minutes)', 'max')
+}
+
+# credit facility that lends nothing, so that the opening balances alone have to settle the payments
+NO_CREDIT_FACILITY = AgentSpec(
+    'def calculate_fee(self, amount):\n    return 0.0\n\n'
+    'def lend_credit(self, account, amount):\n    pass\n\n'
+    'def collect_repayment(self, account):\n    pass\n'
+)
+
+
+@dataclass
+class SettlementTarget:
+    """
+    Outcome that the search has to reach: settled_value_share of at least threshold, or average_delay of at most threshold.
+    """
+    metric: str = 'settled_value_share'
+    threshold: float = 0.99
+
+    def __post_init__(self):
+        if self.metric not in TARGET_METRICS:
+            raise ValueError(f"Unknown target metric '{self.metric}'. Expected one of {', '.join(TARGET_METRICS)}.")
+
+    def met(self, metrics: dict) -> bool:
+        """Whether the settlement metrics of a run reach the target."""
+        if TARGET_METRICS[self.metric][1] == 'min':
+            return metrics[self.metric] >= self.threshold
+        return metrics[self.metric] <= self.threshold
+
+
+def scale_balances(accounts: pd.DataFrame, scaling: float, banks: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Returns a copy of the accounts with the balances of the given banks' accounts, or of all accounts, multiplied by scaling."""
+    scaled = accounts['balance'] * scaling
+    if banks is not None:
+        scaled = scaled.where(accounts['owner'].isin(banks), accounts['balance'])
+    return accounts.assign(balance=scaled)
+
+
+def _minute_of_simulation(days: np.ndarray, times: pd.Series) -> np.ndarray:
+    """Minutes since midnight of the first day of each (day, 'HH:MM' time) pair."""
+    # times repeat across payments, so each distinct time is converted once
+    minutes = {time: time_to_minutes(time) for time in pd.unique(times)}
+    return (days - 1) * 24 * 60 + times.map(minutes).to_numpy()
+
+
+def peak_credit(credit_log: pd.DataFrame, account_ids: Optional[Sequence[str]] = None) -> float:
+    """
+    Largest intraday credit that the given accounts, or all accounts, have outstanding in total at the end of a
+    processing window, from the Credit Facility log of a run.
+    """
+    if account_ids is not None:
+        credit_log = credit_log[credit_log['account'].isin(account_ids)]
+    if credit_log.empty:
+        return 0.0
+    return float(credit_log.groupby(['day', 'time'])['total_credit'].sum().max())
+
+
+def peak_overdraft(balance_log: pd.DataFrame, account_ids: Optional[Sequence[str]] = None) -> float:
+    """
+    Largest amount by which the given accounts, or all accounts, are overdrawn in total at the end of a processing
+    window, from the Account Balance log of a run.
+    """
+    if account_ids is not None:
+        balance_log = balance_log[balance_log['account'].isin(account_ids)]
+    # balances within floating-point summation error of zero are not overdrawn
+    overdrawn = balance_log['balance'].where(balance_log['balance'] < -1e-9, 0)
+    if not overdrawn.any():
+        return 0.0
+    return float(-overdrawn.groupby([balance_log['day'], balance_log['time']]).sum().min())
+
+
+def settlement_metrics(transactions: pd.DataFrame, processed_transactions: pd.DataFrame, parameters: dict) -> dict:
+    """
+    Settlement outcome of a simulation run.
+
+    Args:
+        transactions (pd.DataFrame): The uploaded transactions.
+        processed_transactions (pd.DataFrame): The processed transactions log of the run.
+        parameters (dict): Simulation parameters, as in the session state's 'Parameters'.
+
+    Returns:
+        dict: 'settled_value_share', the value of the settled payments over the value of the payments that arrive in
+            the simulated processing windows, and 'average_delay', the value-weighted average time in minutes from
+            submission to settlement of the arrived payments, where payments that are not settled count as delayed
+            until the close of the last day.
+    """
+    arrival_days = transactions['day'].to_numpy() if 'day' in transactions.columns else np.ones(len(transactions), dtype=int)
+    window_starts, slots = window_slots(
+        transactions['time'].tolist(), arrival_days, parameters['Opening Time'], parameters['Closing Time'],
+        parameters['Processing Window'], parameters['Number of Days']
+    )
+    arrived_amounts = transactions['amount'].to_numpy(dtype=float)[slots >= 0]
+    arrived_value = arrived_amounts.sum()
+    if not arrived_value:
+        return {'settled_value_share': 1.0, 'average_delay': 0.0}
+    slots = slots[slots >= 0]
+    windows_per_day = len(window_starts)
+    # payments are submitted at the start of the window they arrive in
+    submitted_at = slots // windows_per_day * 24 * 60 + time_to_minutes(parameters['Opening Time']) + np.array(window_starts)[slots % windows_per_day]
+    last_close = (parameters['Number of Days'] - 1) * 24 * 60 + time_to_minutes(parameters['Closing Time'])
+
+    settled = processed_transactions[processed_transactions['status'] == 'Success']
+    settled_amounts = settled['amount'].to_numpy(dtype=float)
+    settled_submitted_at = _minute_of_simulation(settled['submission_day'].to_numpy(), settled['submission_time'])
+    settled_delay = settled_amounts @ (_minute_of_simulation(settled['settlement_day'].to_numpy(), settled['settlement_time']) - settled_submitted_at)
+    # the value and submission minutes of the unsettled payments are those of all arrived payments less the settled ones
+    unsettled_value = arrived_value - settled_amounts.sum()
+    unsettled_delay = unsettled_value * last_close - (arrived_amounts @ submitted_at - settled_amounts @ settled_submitted_at)
+    return {
+        'settled_value_share': float(settled_amounts.sum() / arrived_value),
+        'average_delay': float(max(settled_delay + unsettled_delay, 0) / arrived_value)
+    }
+
+
+@dataclass
+class LiquiditySearchResult:
+    """
+    Outcome of a search. curve has one row per simulated scaling, in increasing order, with the total opening balance
+    of the scaled accounts as 'balance', their peak intraday credit as 'credit_drawn', the sum of both as 'liquidity',
+    the largest amount they are overdrawn by as 'overdraft', the settlement metrics and whether the scaling meets the
+    target without overdrafts as 'feasible'. minimal_scaling is the smallest scaling found to meet the target, or None
+    if even the largest one tried does not. minimal_liquidity is the liquidity at minimal_scaling, of which
+    minimal_credit is intraday credit.
+    """
+    target: SettlementTarget
+    banks: Optional[List[str]]
+    curve: pd.DataFrame
+    minimal_scaling: Optional[float] = None
+    minimal_liquidity: Optional[float] = None
+    minimal_credit: Optional[float] = None
+
+
+class LiquidityOptimizer:
+    """
+    Runs liquidity searches for one configuration. Each scaling is simulated on a worker of pool, within limits, so
+    custom agent code runs sandboxed. Simulated outcomes are kept for the lifetime of the optimizer and shared by its
+    searches. The configured credit facility is only used if allow_credit is set; otherwise the scalings are simulated
+    without intraday credit.
+
+    The simulations are started with submit(run, *args), which returns a handle with result() and cancel(), e.g. the
+    submit method of an executor, or of a RunScheduler bound to a session so that the searches share the app's
+    simulation slots. By default the optimizer starts them on its own threads, one for each worker of the pool. Use it
+    as a context manager, or call close, to stop these threads. The pool is left running.
+    """
+
+    def __init__(
+        self,
+        config: SimulationConfig,
+        pool: SandboxPool,
+        limits: Optional[SandboxLimits] = None,
+        submit: Optional[Callable] = None,
+        allow_credit: bool = False
+    ):
+        if config.random_transactions or config.transactions is None:
+            raise ValueError("The liquidity search needs uploaded transactions, so that every scaling simulates the same payments.")
+        self.config = config if allow_credit else replace(config, credit_facility=NO_CREDIT_FACILITY)
+        self.allow_credit = allow_credit
+        self.pool = pool
+        self.limits = limits
+        self.workers = pool.workers
+        self._executor = None
+        if submit is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='liquidity-search')
+            submit = self._executor.submit
+        self._submit = submit
+        self._outcomes: Dict[Tuple[Optional[Tuple[str, ...]], float], dict] = {}
+
+    def __enter__(self) -> 'LiquidityOptimizer':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+
+    def _simulate(self, scaling: float, banks: Optional[List[str]]) -> dict:
+        config = replace(self.config, accounts=scale_balances(self.config.accounts, scaling, banks))
+        logs = self.pool.run(config, self.limits)
+        account_ids = None if banks is None else config.accounts.loc[config.accounts['owner'].isin(banks), 'id']
+        return {
+            **settlement_metrics(config.transactions, logs['Processed Transactions'], config.parameters),
+            'credit_drawn': peak_credit(logs['Credit Facility'], account_ids),
+            'overdraft': peak_overdraft(logs['Account Balance'], account_ids)
+        }
+
+    @staticmethod
+    def feasible(target: SettlementTarget, metrics: dict) -> bool:
+        """Whether a simulated scaling meets the target with none of the scaled accounts overdrawn."""
+        return target.met(metrics) and not metrics['overdraft']
+
+    def _key(self, scaling: float, banks: Optional[List[str]]) -> Tuple[Optional[Tuple[str, ...]], float]:
+        # the credit drawn is counted for the scaled banks only, so even an unchanged scaling of 1 is kept per set of banks
+        return (None if banks is None else tuple(sorted(banks)), round(float(scaling), 12))
+
+    def evaluate(self, scalings: Sequence[float], banks: Optional[List[str]] = None) -> List[dict]:
+        """
+        Simulates the scalings that have not been simulated yet, in parallel, and returns the settlement metrics of each scaling.
+        banks limits the scaling to the accounts of these banks.
+
+        Raises:
+            SandboxError: If a simulation fails or exceeds a limit. The scalings that have not started yet are withdrawn.
+        """
+        keys = [self._key(scaling, banks) for scaling in scalings]
+        futures = {
+            key: self._submit(self._simulate, key[1], banks)
+            for key in dict.fromkeys(keys) if key not in self._outcomes
+        }
+        try:
+            for key, future in futures.items():
+                self._outcomes[key] = future.result()
+        except BaseException:
+            for future in futures.values():
+                future.cancel()
+            raise
+        return [self._outcomes[key] for key in keys]
+
+    def search(
+        self,
+        target: SettlementTarget,
+        banks: Optional[List[str]] = None,
+        lower: float = 0.0,
+        upper: float = 1.0,
+        tolerance: float = 0.01,
+        max_scaling: float = 64.0,
+        points: Optional[int] = None
+    ) -> LiquiditySearchResult:
+        """
+        Finds the smallest scaling of the opening balances that meets the target without overdrafts, up to tolerance.
+
+        Args:
+            target (SettlementTarget): The settlement outcome to reach.
+            banks (List[str]): Banks whose accounts are scaled. Defaults to all banks.
+            lower (float): Smallest scaling considered.
+            upper (float): First scaling expected to meet the target. It is doubled, up to max_scaling, until it does.
+            tolerance (float): Width of the bracket around the minimal scaling at which the search stops.
+            max_scaling (float): Largest scaling tried.
+            points (int): Scalings simulated in parallel in each round. Defaults to the number of workers.
+
+        Returns:
+            LiquiditySearchResult: The simulated curve and the minimal scaling that meets the target.
+        """
+        points = points or self.workers
+
+        def feasible(scaling: float) -> bool:
+            return self.feasible(target, self.evaluate([scaling], banks)[0])
+
+        # the bounds are simulated together, since a search often ends at one of them
+        self.evaluate([lower, upper], banks)
+        if feasible(lower):
+            return self._result(target, banks, lower)
+        while not feasible(upper):
+            if upper >= max_scaling:
+                return self._result(target, banks, None)
+            lower, upper = upper, min(upper * 2, max_scaling)
+
+        while upper - lower > tolerance:
+            grid = [round(scaling, 12) for scaling in np.linspace(lower, upper, points + 2)[1:-1].tolist()]
+            met = [self.feasible(target, metrics) for metrics in self.evaluate(grid, banks)]
+            first = met.index(True) if True in met else len(grid)
+            lower = grid[first - 1] if first > 0 else lower
+            upper = grid[first] if first < len(grid) else upper
+        return self._result(target, banks, upper)
+
+    def search_per_bank(self, target: SettlementTarget, banks: Optional[List[str]] = None, **kwargs) -> Dict[str, LiquiditySearchResult]:
+        """Searches the minimal scaling of each bank's balances on its own, with the other banks' balances unchanged."""
+        banks = list(self.config.banks['name']) if banks is None else banks
+        return {bank: self.search(target, [bank], **kwargs) for bank in banks}
+
+    def _result(self, target: SettlementTarget, banks: Optional[List[str]], minimal_scaling: Optional[float]) -> LiquiditySearchResult:
+        accounts = self.config.accounts
+        base_liquidity = float(accounts['balance'].sum() if banks is None else accounts.loc[accounts['owner'].isin(banks), 'balance'].sum())
+        bank_key = self._key(0, banks)[0]
+        rows = [
+            {
+                'scaling': scaling, 'balance': scaling * base_liquidity, 'credit_drawn': metrics['credit_drawn'],
+                'liquidity': scaling * base_liquidity + metrics['credit_drawn'], 'overdraft': metrics['overdraft'],
+                **{metric: metrics[metric] for metric in TARGET_METRICS}, 'feasible': self.feasible(target, metrics)
+            }
+            for (key_banks, scaling), metrics in self._outcomes.items()
+            if key_banks == bank_key
+        ]
+        curve = pd.DataFrame(
+            rows, columns=['scaling', 'balance', 'credit_drawn', 'liquidity', 'overdraft', *TARGET_METRICS, 'feasible']
+        ).sort_values('scaling', ignore_index=True)
+        if minimal_scaling is None:
+            return LiquiditySearchResult(target, banks, curve)
+        minimal = curve[curve['scaling'] == round(float(minimal_scaling), 12)].iloc[0]
+        return LiquiditySearchResult(target, banks, curve, minimal_scaling, float(minimal['liquidity']), float(minimal['credit_drawn']))
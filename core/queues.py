@@ -0,0 +1,201 @@
+"""
+Queue templates whose dequeueing cost grows with the number of settled transactions rather than with the size of the queue.
+
+PSSimPy's queues keep every queued transaction in one sorted list and, in every period, call dequeue_criteria for each of
+them and sum the whole queue for the queue statistics. The templates below index the queue by sender account instead and
+keep running totals, so an account whose balance has not changed since its transactions were last checked is skipped.
+They assume that dequeue_criteria depends only on the transaction and its sender's balance, as in PSSimPy's templates.
+
+Like PSSimPy's queues, they hold (transaction, period) items, ordered by sorting_logic, and the 'queue' attribute lists
+the queued items in that order.
+"""
+import heapq
+from itertools import count
+from typing import Dict, List, Set, Tuple
+from sortedcontainers import SortedList
+from PSSimPy import Account, Transaction
+from PSSimPy.queues import AbstractQueue
+from PSSimPy.utils import min_balance_maintained
+
+
+class SenderFIFOQueue(AbstractQueue):
+    """
+    Keeps a sub-queue per sender account and dequeues from its head until a transaction fails dequeue_criteria, which
+    then holds back the sender's later transactions. An account is checked again only once its balance changes or its
+    sub-queue does, so a dequeueing round costs O(accounts with queued transactions + dequeued transactions * log n).
+    Enqueueing and removing a transaction cost O(log n), where n is the length of the sender's sub-queue.
+    """
+
+    # whether a transaction that fails dequeue_criteria is skipped instead of holding back the sender's later transactions
+    bypass = False
+
+    def __init__(self):
+        # the items are kept in the sub-queues rather than in AbstractQueue's sorted list
+        self.period_counter = 0
+        # sub-queues hold (sort key, insertion order, item) entries, so that equal sort keys keep their arrival order and
+        # a removal finds its entry by bisection instead of scanning all items with the same key
+        self._sub_queues: Dict[Account, SortedList] = {}
+        self._entries: Dict[Tuple[Transaction, int], tuple] = {}
+        self._order = count()
+        self._blocked: Dict[Account, float] = {}  # sender account -> its balance when nothing more could be dequeued
+        self._num_txns = 0
+        self._txn_amount_total = 0
+
+    @staticmethod
+    def sorting_logic(queue_item: Tuple[Transaction, int]) -> int:
+        _, period = queue_item
+        return period
+
+    @staticmethod
+    def dequeue_criteria(queue_item: Tuple[Transaction, int]) -> bool:
+        transaction, _ = queue_item
+        return min_balance_maintained(transaction.sender_account, transaction.amount, min_balance=0)
+
+    @property
+    def queue(self) -> List[Tuple[Transaction, int]]:
+        return [entry[2] for entry in sorted(self._entries.values())]
+
+    def enqueue(self, transaction: Transaction) -> None:
+        sender = transaction.sender_account
+        item = (transaction, self.period_counter)
+        entry = self._entries[item] = (self.sorting_logic(item), next(self._order), item)
+        sub_queue = self._sub_queues.get(sender)
+        if sub_queue is None:
+            sub_queue = self._sub_queues[sender] = SortedList()
+        sub_queue.add(entry)
+        self._blocked.pop(sender, None)
+        self._num_txns += 1
+        self._txn_amount_total += transaction.amount
+
+    def bulk_enqueue(self, transactions: Set[Transaction]) -> None:
+        for transaction in transactions:
+            self.enqueue(transaction)
+
+    def _remove(self, queue_item: Tuple[Transaction, int]) -> None:
+        transaction, _ = queue_item
+        sender = transaction.sender_account
+        sub_queue = self._sub_queues[sender]
+        sub_queue.remove(self._entries.pop(queue_item))
+        if not sub_queue:
+            del self._sub_queues[sender]
+        self._num_txns -= 1
+        self._txn_amount_total = self._txn_amount_total - transaction.amount if self._num_txns else 0
+
+    def dequeue(self, queue_item: Tuple[Transaction, int]) -> None:
+        self._remove(queue_item)
+        # the sender's next transaction may pass dequeue_criteria
+        self._blocked.pop(queue_item[0].sender_account, None)
+
+    def _dequeue_sender(self, sub_queue: SortedList) -> List[Tuple[Transaction, int]]:
+        """Items of one sender's sub-queue that pass dequeue_criteria."""
+        items = []
+        for _, _, item in sub_queue:
+            if self.dequeue_criteria(item):
+                items.append(item)
+            elif not self.bypass:
+                break
+        return items
+
+    def begin_dequeueing(self) -> List[Transaction]:
+        items_to_dequeue = []
+        for sender, sub_queue in self._sub_queues.items():
+            if self._blocked.get(sender) == sender.balance:
+                continue
+            items = self._dequeue_sender(sub_queue)
+            if len(items) < len(sub_queue):
+                self._blocked[sender] = sender.balance
+            items_to_dequeue.extend(items)
+        for item in items_to_dequeue:
+            self._remove(item)
+        return [transaction for transaction, _ in items_to_dequeue]
+
+    def get_num_txns(self) -> int:
+        return self._num_txns
+
+    def get_txn_amount_total(self) -> float:
+        return self._txn_amount_total
+
+
+class BypassFIFOQueue(SenderFIFOQueue):
+    """
+    Keeps a sub-queue per sender account and dequeues every transaction that passes dequeue_criteria, skipping those that
+    do not, like PSSimPy's FIFO Queue. Senders that could not dequeue all their transactions are kept in an index of
+    blocked senders together with their balance, and are skipped until their balance or their sub-queue changes, so a
+    dequeueing round costs O(accounts with queued transactions + transactions of the accounts that changed).
+    """
+
+    bypass = True
+
+
+class HeapPriorityQueue(SenderFIFOQueue):
+    """
+    Keeps a binary heap per sender account, ordered by sorting_logic, and dequeues from its top until a transaction
+    fails dequeue_criteria, which then holds back the sender's lower-priority transactions. Removed transactions are only
+    marked as deleted and are discarded once they reach the top of the heap. Like the Sender FIFO Queue, an account is
+    checked again only once its balance or its heap changes, so a dequeueing round costs
+    O(accounts with queued transactions + (dequeued + deleted transactions) * log n). Enqueueing costs O(log n) and
+    removing a transaction O(1).
+    """
+
+    def __init__(self):
+        super().__init__()
+        # the heaps hold [sort key, insertion order, item] entries, with item set to None once removed
+        self._num_deleted: Dict[Account, int] = {}  # sender account -> number of deleted entries still in its heap
+
+    @staticmethod
+    def sorting_logic(queue_item: Tuple[Transaction, int]) -> int:
+        transaction, _ = queue_item
+        priority = transaction.priority
+        return priority
+
+    def enqueue(self, transaction: Transaction) -> None:
+        sender = transaction.sender_account
+        item = (transaction, self.period_counter)
+        entry = self._entries[item] = [self.sorting_logic(item), next(self._order), item]
+        heapq.heappush(self._sub_queues.setdefault(sender, []), entry)
+        self._blocked.pop(sender, None)
+        self._num_txns += 1
+        self._txn_amount_total += transaction.amount
+
+    def _remove(self, queue_item: Tuple[Transaction, int]) -> None:
+        transaction, _ = queue_item
+        sender = transaction.sender_account
+        self._entries.pop(queue_item)[2] = None
+        self._num_txns -= 1
+        self._txn_amount_total = self._txn_amount_total - transaction.amount if self._num_txns else 0
+        heap = self._sub_queues[sender]
+        num_deleted = self._num_deleted[sender] = self._num_deleted.get(sender, 0) + 1
+        if num_deleted == len(heap):
+            del self._sub_queues[sender], self._num_deleted[sender]
+        elif num_deleted > 32 and 2 * num_deleted > len(heap):
+            # rebuild the heap once it is mostly deleted entries, so that it does not grow with every removal
+            heap[:] = [entry for entry in heap if entry[2] is not None]
+            heapq.heapify(heap)
+            del self._num_deleted[sender]
+
+    def begin_dequeueing(self) -> List[Transaction]:
+        transactions = []
+        for sender, heap in list(self._sub_queues.items()):
+            if self._blocked.get(sender) == sender.balance:
+                continue
+            while heap:
+                item = heap[0][2]
+                if item is not None and not self.dequeue_criteria(item):
+                    self._blocked[sender] = sender.balance
+                    break
+                heapq.heappop(heap)
+                if item is None:
+                    self._num_deleted[sender] -= 1
+                else:
+                    del self._entries[item]
+                    self._num_txns -= 1
+                    self._txn_amount_total = self._txn_amount_total - item[0].amount if self._num_txns else 0
+                    transactions.append(item[0])
+            if not heap:
+                del self._sub_queues[sender]
+                self._num_deleted.pop(sender, None)
+        return transactions
+
+
+# optimized queue templates by class name, as referenced by queue agents that extend them
+QUEUE_TEMPLATE_CLASSES = {cls.__name__: cls for cls in (SenderFIFOQueue, BypassFIFOQueue, HeapPriorityQueue)}
@@ -0,0 +1,126 @@
+import os
+from typing import Dict, Optional, Union
+import pandas as pd
+from PSSimPy import Transaction
+from PSSimPy.simulator import ABMSim
+
+from core.agents import compile_bank_strategy, resolve_agent_class
+from core.checkpoint import load_checkpoint, run_days
+from core.config import SimulationConfig
+from core.constraint_handlers import BatchSystem
+from core.fastpath import FastSimulation, fast_path_blockers
+from core.logs import load_simulation_logs, delete_log_files
+from core.spill import SpilledLog
+
+
+def build_simulation(config: SimulationConfig, sim_name: str = 'PSSimPy-web', log_dir: Optional[str] = None) -> ABMSim:
+    """
+    Compiles the custom agents of the configuration and initializes the simulator.
+
+    Args:
+        config (SimulationConfig): The simulation settings.
+        sim_name (str): Name of the simulation, used as the prefix of the log files.
+        log_dir (str): Folder the log files are written to. Defaults to the working directory.
+
+    Returns:
+        ABMSim: The simulator, ready to run.
+    """
+    def build_agent(agent_type: str):
+        spec = config.agent(agent_type)
+        return resolve_agent_class(agent_type, spec.implementation, spec.params, spec.base)()
+
+    sim_params = {
+        'name': sim_name if log_dir is None else os.path.join(log_dir, sim_name),
+        'banks': config.banks,
+        'accounts': config.accounts,
+        'open_time': config.parameters['Opening Time'],
+        'close_time': config.parameters['Closing Time'],
+        'processing_window': config.parameters['Processing Window'],
+        'num_days': config.parameters['Number of Days'],
+        'eod_clear_queue': config.parameters['EOD Clear Queue'],
+        'eod_force_settlement': config.parameters['EOD Force Settlement'],
+        'constraint_handler': build_agent('Constraint Handler'),
+        'queue': build_agent('Queue'),
+        'credit_facility': build_agent('Credit Facility'),
+        'transaction_fee_handler': build_agent('Transaction Fee'),
+        'transaction_fee_rate': config.transaction_fee_rate,
+        'strategy_mapping': {name: compile_bank_strategy(name, implementation) for name, implementation in config.bank_strategies.items()}
+    }
+
+    if config.random_transactions:
+        sim_params['txn_arrival_prob'] = config.transaction_probability
+        sim_params['txn_amount_range'] = config.transaction_amount_range
+    else:
+        sim_params['transactions'] = config.transactions
+
+    sim = ABMSim(**sim_params)
+    # constraint handlers evaluate each processing window as one batch, per-transaction handlers through an adapter
+    sim.system = BatchSystem(sim.system.constraint_handler, sim.system.queue)
+    return sim
+
+
+def execute_simulation(
+    config: SimulationConfig,
+    sim_name: str = 'PSSimPy-web',
+    log_dir: Optional[str] = None,
+    fast_path: bool = True,
+    checkpoint_dir: Optional[str] = None,
+    resume_from: Optional[str] = None
+):
+    """
+    Runs a simulation and leaves its log files in log_dir, replacing the logs of an earlier run with the same name.
+    Configurations that only use the default agents run on the vectorized fast path unless fast_path is False.
+    With checkpoint_dir, a checkpoint is written there after each day, and resume_from, the path of a checkpoint,
+    continues its run from the next day, forking it if config differs from the checkpoint's configuration.
+    Both run on ABMSim, see core.checkpoint.
+    """
+    # transactions of earlier runs are tracked by PSSimPy until cleared
+    Transaction.clear_instances()
+    # the simulator appends to existing log files
+    delete_log_files(sim_name, log_dir)
+
+    if checkpoint_dir is not None or resume_from is not None:
+        sim = build_simulation(config, sim_name, log_dir)
+        first_day = 1
+        if resume_from is not None:
+            checkpoint = load_checkpoint(resume_from)
+            checkpoint.restore(sim, config)
+            first_day = checkpoint.day + 1
+        run_days(sim, config, first_day, checkpoint_dir)
+    elif fast_path and not fast_path_blockers(config):
+        FastSimulation(config, sim_name, log_dir).run()
+    else:
+        build_simulation(config, sim_name, log_dir).run()
+
+
+def run_simulation(
+    config: SimulationConfig,
+    sim_name: str = 'PSSimPy-web',
+    log_dir: Optional[str] = None,
+    spill_threshold: Optional[int] = None,
+    spill_dir: Optional[str] = None,
+    fast_path: bool = True,
+    checkpoint_dir: Optional[str] = None,
+    resume_from: Optional[str] = None
+) -> Dict[str, Union[pd.DataFrame, SpilledLog]]:
+    """
+    Runs a simulation and returns its logs keyed by their session state names. The log files are removed afterwards.
+
+    Args:
+        config (SimulationConfig): The simulation settings.
+        sim_name (str): Name of the simulation, used as the prefix of the log files.
+        log_dir (str): Folder the log files are written to. Defaults to the working directory.
+        spill_threshold (int): Size in bytes above which a log is spilled to a memory-mapped file rather than read into memory.
+            Defaults to reading every log into memory.
+        spill_dir (str): Folder in which spilled logs are kept. Defaults to the system's temporary folder.
+        fast_path (bool): Whether a configuration that qualifies runs on the vectorized fast path, see core.fastpath.
+        checkpoint_dir (str): Folder to write a checkpoint to after each day. Defaults to no checkpoints.
+        resume_from (str): Path of a checkpoint to continue the run from, see execute_simulation.
+
+    Returns:
+        Dict[str, Union[pd.DataFrame, SpilledLog]]: The simulation logs, as DataFrames or as handles to spilled logs.
+    """
+    execute_simulation(config, sim_name, log_dir, fast_path, checkpoint_dir, resume_from)
+    logs = load_simulation_logs(config.random_transactions, sim_name, log_dir, spill_threshold, spill_dir)
+    delete_log_files(sim_name, log_dir)
+    return logs
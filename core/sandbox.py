@@ -0,0 +1,450 @@
+"""
+Runs simulations, including their custom agent code, in a separate worker process with CPU time and memory limits.
+
+The worker writes the simulation logs as Arrow IPC files into a directory owned by the calling process, which
+memory-maps them, so the logs are not pickled through a pipe. Only a short status message is sent back.
+
+run_simulation_sandboxed starts a fresh worker for each run. SandboxPool keeps a set of long-lived workers instead,
+which import PSSimPy and the simulation core once and keep the agent classes they compiled (cached by their source
+code in core.agents) between runs, so a run starts without the interpreter startup and imports. A pooled worker is
+replaced after a number of runs, once its peak memory use exceeds a threshold, and after a run that failed on a
+limit or left it in an unknown state.
+
+A pooled worker cannot have a hard CPU limit per run, as a hard limit cannot be raised again, and its soft limit only
+stops code that returns to the interpreter. The calling process therefore watches the worker's CPU time while it
+waits and kills the worker once a run exceeds its limit by the grace period that a one-off worker's hard limit allows.
+"""
+import os
+import sys
+import queue
+import signal
+import tempfile
+import threading
+import time
+import traceback
+import multiprocessing
+from dataclasses import dataclass
+from typing import Dict, Optional, Union
+import pandas as pd
+
+from core.config import SimulationConfig
+from core.spill import SpillDirectory, SpilledLog
+
+try:
+    import resource
+except ImportError:  # not available on Windows, where only the wall time limit applies
+    resource = None
+
+# CPU seconds beyond its limit that a run gets to stop by itself, as between the soft and hard limit of a one-off worker
+CPU_GRACE_SECONDS = 5
+# interval in seconds at which a pooled worker's CPU time is checked while its run is going
+WATCHDOG_INTERVAL = 0.5
+
+
+@dataclass
+class SandboxLimits:
+    """Resource limits of a sandboxed simulation run. None means unlimited."""
+    cpu_seconds: Optional[int] = 600
+    memory_mb: Optional[int] = 4096
+    wall_seconds: Optional[float] = None
+
+
+class SandboxError(RuntimeError):
+    """
+    Raised when a sandboxed simulation fails. reason is one of 'cpu_time', 'memory', 'timeout', 'crashed' or 'error',
+    and details holds the traceback of the worker, if there is one.
+    """
+
+    def __init__(self, reason: str, message: str, details: Optional[str] = None):
+        super().__init__(message)
+        self.reason = reason
+        self.details = details
+
+
+class _CpuTimeExceeded(BaseException):
+    # a BaseException, so that agent code catching Exception cannot swallow it
+    pass
+
+
+def _raise_cpu_time_exceeded(signum, frame):
+    raise _CpuTimeExceeded()
+
+
+def _apply_limits(limits: SandboxLimits):
+    if resource is None:
+        return
+    if limits.cpu_seconds is not None:
+        # SIGXCPU is sent at the soft limit, and the process is killed at the hard limit if it does not stop
+        signal.signal(signal.SIGXCPU, _raise_cpu_time_exceeded)
+        resource.setrlimit(resource.RLIMIT_CPU, (limits.cpu_seconds, limits.cpu_seconds + CPU_GRACE_SECONDS))
+    if limits.memory_mb is not None:
+        memory_bytes = limits.memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+
+
+def _apply_run_limits(limits: SandboxLimits):
+    """
+    Limits the next run of a pooled worker. Only the soft limits are set, relative to the CPU time used so far, so
+    that they can be lifted again after the run. At the soft CPU limit, SIGXCPU is sent every second until the run stops.
+    """
+    if resource is None:
+        return
+    if limits.cpu_seconds is not None:
+        signal.signal(signal.SIGXCPU, _raise_cpu_time_exceeded)
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _set_soft_limit(resource.RLIMIT_CPU, int(usage.ru_utime + usage.ru_stime) + 1 + limits.cpu_seconds)
+    if limits.memory_mb is not None:
+        _set_soft_limit(resource.RLIMIT_AS, limits.memory_mb * 1024 * 1024)
+
+
+def _lift_run_limits():
+    if resource is None:
+        return
+    for limit in (resource.RLIMIT_CPU, resource.RLIMIT_AS):
+        _set_soft_limit(limit, None)
+
+
+def _set_soft_limit(limit: int, value: Optional[int]):
+    """Sets the soft limit to value, capped at the hard limit, or to the hard limit if value is None."""
+    _, hard = resource.getrlimit(limit)
+    if value is None or (hard != resource.RLIM_INFINITY and value > hard):
+        value = hard
+    resource.setrlimit(limit, (value, hard))
+
+
+def _peak_memory_mb() -> Optional[float]:
+    """Peak resident memory of the process so far, or None where it is unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _simulate(config: SimulationConfig, limits: SandboxLimits, sim_name: str, output_dir: str,
+              checkpoint_dir: Optional[str] = None, resume_from: Optional[str] = None) -> tuple:
+    """
+    Runs a simulation in a worker process and converts its logs to Arrow files in output_dir. Returns
+    ('ok', {log name: (path, rows, columns)}) when the simulation succeeds, or (reason, message, traceback) when it fails.
+    """
+    from core.logs import LOG_FILE_TYPES, log_file_path
+    from core.runner import execute_simulation
+    from core.spill import convert_log_file
+
+    try:
+        logs = {}
+        with tempfile.TemporaryDirectory() as log_dir:
+            execute_simulation(config, sim_name, log_dir, checkpoint_dir=checkpoint_dir, resume_from=resume_from)
+            for log_name, log_file_type in LOG_FILE_TYPES.items():
+                if not config.random_transactions and log_file_type == 'transactions_arrival':
+                    continue
+                arrow_path = os.path.join(output_dir, f'{log_file_type}.arrow')
+                num_rows, column_names = convert_log_file(log_file_path(log_file_type, sim_name, log_dir), arrow_path)
+                logs[log_name] = (arrow_path, num_rows, column_names)
+        return ('ok', logs)
+    except _CpuTimeExceeded:
+        return ('cpu_time', f'The simulation exceeded its CPU time limit of {limits.cpu_seconds} seconds.', None)
+    except MemoryError:
+        return ('memory', f'The simulation exceeded its memory limit of {limits.memory_mb} MB.', traceback.format_exc())
+    except BaseException as e:
+        return ('error', f'The simulation failed with {type(e).__name__}: {e}', traceback.format_exc())
+
+
+def _sandbox_worker(config: SimulationConfig, limits: SandboxLimits, sim_name: str, output_dir: str, connection,
+                    checkpoint_dir: Optional[str] = None, resume_from: Optional[str] = None):
+    """Entry point of a one-off worker process. Sends the outcome of _simulate."""
+    try:
+        _apply_limits(limits)
+        connection.send(_simulate(config, limits, sim_name, output_dir, checkpoint_dir, resume_from))
+    except _CpuTimeExceeded:
+        # the limit was reached while sending
+        connection.send(('cpu_time', f'The simulation exceeded its CPU time limit of {limits.cpu_seconds} seconds.', None))
+    finally:
+        connection.close()
+
+
+def _process_cpu_seconds(pid: int) -> Optional[float]:
+    """CPU time used by a process so far, or None where it cannot be read."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # the fields after the parenthesized command name, starting with the 3rd field
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    # utime and stime, the 14th and 15th fields, in clock ticks
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def _receive_outcome(process, connection, limits: SandboxLimits, watch_cpu: bool = False):
+    """
+    Waits for the worker's reply to a run and returns it. With watch_cpu, the worker is stopped once the run uses more
+    than its CPU time limit plus CPU_GRACE_SECONDS. Where the worker's CPU time cannot be read, the time waited is
+    counted instead, which bounds the CPU time of a single-threaded run.
+
+    Raises:
+        SandboxError: If the run does not finish within its wall time or CPU time limit, or the worker dies before replying.
+    """
+    start = time.monotonic()
+    cpu_start = _process_cpu_seconds(process.pid) if watch_cpu else None
+    try:
+        while True:
+            elapsed = time.monotonic() - start
+            if limits.wall_seconds is not None and elapsed >= limits.wall_seconds:
+                raise SandboxError('timeout', f'The simulation did not finish within {limits.wall_seconds} seconds.')
+            if watch_cpu and limits.cpu_seconds is not None:
+                cpu = _process_cpu_seconds(process.pid)
+                used = elapsed if cpu is None or cpu_start is None else cpu - cpu_start
+                if used > limits.cpu_seconds + CPU_GRACE_SECONDS:
+                    process.kill()
+                    raise SandboxError('cpu_time', f'The simulation exceeded its CPU time limit of {limits.cpu_seconds} seconds.')
+            wait = WATCHDOG_INTERVAL if limits.wall_seconds is None else min(WATCHDOG_INTERVAL, limits.wall_seconds - elapsed)
+            if connection.poll(wait):
+                return connection.recv()
+    except (EOFError, ConnectionResetError):
+        # the worker died without reporting, e.g. killed at the hard CPU limit or by the operating system. Its CPU
+        # time can still be read until join reaps it.
+        cpu = _process_cpu_seconds(process.pid)
+        process.join()
+        exit_code = process.exitcode
+        if limits.cpu_seconds is not None and hasattr(signal, 'SIGXCPU'):
+            # SIGKILL is also sent by the kernel's out-of-memory killer or another process, so it is only attributed
+            # to the hard limit of a one-off worker if the worker used that much CPU time, less the lag of its accounting
+            at_hard_limit = not watch_cpu and cpu is not None and cpu >= limits.cpu_seconds + CPU_GRACE_SECONDS - 0.25
+            if exit_code == -signal.SIGXCPU or (exit_code == -signal.SIGKILL and at_hard_limit):
+                raise SandboxError('cpu_time', f'The simulation exceeded its CPU time limit of {limits.cpu_seconds} seconds.')
+        if hasattr(signal, 'SIGKILL') and exit_code == -signal.SIGKILL:
+            if limits.cpu_seconds is not None and not watch_cpu and cpu is None:
+                raise SandboxError('crashed', 'The simulation worker was killed, at its CPU time limit or e.g. by the operating system for lack of memory.')
+            raise SandboxError('crashed', 'The simulation worker was killed, e.g. by the operating system for lack of memory.')
+        raise SandboxError('crashed', f'The simulation worker stopped unexpectedly with exit code {exit_code}.')
+
+
+def _collect_logs(outcome: tuple, output_directory: SpillDirectory, spill_threshold: Optional[int]) -> Dict[str, Union[pd.DataFrame, SpilledLog]]:
+    """Opens the logs that a worker wrote to output_directory, or raises its SandboxError if the run failed."""
+    status, *payload = outcome
+    if status != 'ok':
+        raise SandboxError(status, payload[0], payload[1])
+
+    logs = {}
+    for log_name, (path, num_rows, column_names) in payload[0].items():
+        log = SpilledLog(path, output_directory, num_rows, column_names, os.path.getsize(path))
+        if spill_threshold is None or log.num_bytes <= spill_threshold:
+            log = log.to_pandas()
+        logs[log_name] = log
+    return logs
+
+
+def run_simulation_sandboxed(
+    config: SimulationConfig,
+    limits: Optional[SandboxLimits] = None,
+    sim_name: str = 'PSSimPy-web',
+    spill_threshold: Optional[int] = None,
+    spill_dir: Optional[str] = None,
+    checkpoint_dir: Optional[str] = None,
+    resume_from: Optional[str] = None
+) -> Dict[str, Union[pd.DataFrame, SpilledLog]]:
+    """
+    Runs a simulation in a new worker process with resource limits and returns its logs keyed by their session state names,
+    like run_simulation.
+
+    Args:
+        config (SimulationConfig): The simulation settings.
+        limits (SandboxLimits): CPU time, memory and wall time limits of the worker. Defaults to SandboxLimits().
+        sim_name (str): Name of the simulation, used as the prefix of the log files.
+        spill_threshold (int): Size in bytes above which a log is kept as a memory-mapped file rather than read into memory.
+            Defaults to reading every log into memory.
+        spill_dir (str): Folder in which the worker's output directory is created. Defaults to the system's temporary folder.
+        checkpoint_dir (str): Folder to write a checkpoint to after each day. Defaults to no checkpoints.
+        resume_from (str): Path of a checkpoint to continue the run from, see core.runner.execute_simulation.
+
+    Returns:
+        Dict[str, Union[pd.DataFrame, SpilledLog]]: The simulation logs, as DataFrames or as handles to spilled logs.
+
+    Raises:
+        SandboxError: If the simulation fails, exceeds a limit or the worker process dies.
+    """
+    limits = SandboxLimits() if limits is None else limits
+    output_directory = SpillDirectory(spill_dir)
+    # a fresh interpreter, rather than a fork of the app's process with its threads and session data
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_sandbox_worker,
+        args=(config, limits, sim_name, output_directory.path, sender, checkpoint_dir, resume_from),
+        daemon=True
+    )
+    process.start()
+    sender.close()
+
+    try:
+        outcome = _receive_outcome(process, receiver, limits)
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+    return _collect_logs(outcome, output_directory, spill_threshold)
+
+
+def _pool_worker(connection):
+    """
+    Entry point of a pooled worker process. Runs the simulations it receives until it receives None, replying with
+    (outcome of _simulate, peak memory in MB) to each. It stops after a run that reached a limit.
+    """
+    # imported up front, so that the first run does not wait for them
+    import core.runner
+    import core.spill
+    import core.logs
+
+    try:
+        while True:
+            task = connection.recv()
+            if task is None:
+                break
+            config, limits, sim_name, output_dir, checkpoint_dir, resume_from = task
+            try:
+                _apply_run_limits(limits)
+                outcome = _simulate(config, limits, sim_name, output_dir, checkpoint_dir, resume_from)
+            finally:
+                _lift_run_limits()
+            connection.send((outcome, _peak_memory_mb()))
+            if outcome[0] in ('cpu_time', 'memory'):
+                break
+    except (EOFError, KeyboardInterrupt):
+        # the pool closed the connection or the app is shutting down
+        pass
+    finally:
+        connection.close()
+
+
+class _PooledWorker:
+    def __init__(self, context):
+        self.connection, worker_connection = context.Pipe()
+        self.process = context.Process(target=_pool_worker, args=(worker_connection,), daemon=True)
+        self.process.start()
+        worker_connection.close()
+        self.runs = 0
+
+    def stop(self, timeout: float = 5.0):
+        """Asks the worker to exit, and kills it if it does not."""
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class SandboxPool:
+    """
+    Long-lived worker processes that run sandboxed simulations like run_simulation_sandboxed, without starting a new
+    interpreter for each run. The workers start when the pool is created. run is thread-safe and waits for a free
+    worker if all are busy. Use the pool as a context manager, or call close, to stop the workers.
+
+    Runs are isolated from the calling process, but not from earlier runs of the same worker, e.g. from agent code
+    that changes PSSimPy's classes. Recycling workers limits how long such changes last.
+
+    Args:
+        workers (int): Number of worker processes. Defaults to the number of CPUs.
+        max_runs (int): Runs after which a worker is replaced by a fresh one. None never replaces a worker for its number of runs.
+        max_memory_mb (float): Peak resident memory above which a worker is replaced after its run. None means no threshold.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_runs: Optional[int] = 50, max_memory_mb: Optional[float] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_runs = max_runs
+        self.max_memory_mb = max_memory_mb
+        # fresh interpreters, rather than forks of the app's process with its threads and session data
+        self._context = multiprocessing.get_context('spawn')
+        # the most recently used worker is reused first, as it is the most likely to have compiled the same agents
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(self.workers):
+            self._idle.put(_PooledWorker(self._context))
+
+    def __enter__(self) -> 'SandboxPool':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def run(
+        self,
+        config: SimulationConfig,
+        limits: Optional[SandboxLimits] = None,
+        sim_name: str = 'PSSimPy-web',
+        spill_threshold: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+        checkpoint_dir: Optional[str] = None,
+        resume_from: Optional[str] = None
+    ) -> Dict[str, Union[pd.DataFrame, SpilledLog]]:
+        """
+        Runs a simulation on a free worker and returns its logs keyed by their session state names. The arguments are
+        those of run_simulation_sandboxed.
+
+        Raises:
+            SandboxError: If the simulation fails, exceeds a limit or the worker process dies.
+            RuntimeError: If the pool is closed.
+        """
+        limits = SandboxLimits() if limits is None else limits
+        output_directory = SpillDirectory(spill_dir)
+        worker = self._checkout()
+        reusable = False
+        try:
+            worker.connection.send((config, limits, sim_name, output_directory.path, checkpoint_dir, resume_from))
+            # the soft CPU limit of the worker does not stop code that never returns to the interpreter
+            outcome, peak_memory_mb = _receive_outcome(worker.process, worker.connection, limits, watch_cpu=True)
+            worker.runs += 1
+            reusable = not (
+                outcome[0] in ('cpu_time', 'memory')
+                or (self.max_runs is not None and worker.runs >= self.max_runs)
+                or (self.max_memory_mb is not None and peak_memory_mb is not None and peak_memory_mb > self.max_memory_mb)
+            )
+        except BaseException:
+            # the worker may still be running, e.g. after a timeout
+            worker.process.kill()
+            raise
+        finally:
+            self._checkin(worker, reusable)
+        return _collect_logs(outcome, output_directory, spill_threshold)
+
+    def _checkout(self) -> _PooledWorker:
+        worker = self._idle.get()
+        if worker is None:
+            # the pool was closed while waiting, the marker is passed on to the next waiting run
+            self._idle.put(None)
+            raise RuntimeError('The sandbox pool is closed.')
+        if not worker.process.is_alive():
+            # died while idle, e.g. stopped by the operating system
+            worker.stop()
+            worker = _PooledWorker(self._context)
+        return worker
+
+    def _checkin(self, worker: _PooledWorker, reusable: bool):
+        with self._lock:
+            if reusable and not self._closed:
+                self._idle.put(worker)
+                return
+            closed = self._closed
+        worker.stop()
+        if not closed:
+            # the replacement starts right away, so it is ready by the time the next run needs it
+            self._idle.put(_PooledWorker(self._context))
+
+    def close(self):
+        """Stops the idle workers now and the busy ones when their runs finish."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            idle = []
+            while not self._idle.empty():
+                idle.append(self._idle.get())
+            self._idle.put(None)
+        for worker in idle:
+            if worker is not None:
+                worker.stop()
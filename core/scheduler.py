@@ -0,0 +1,145 @@
+"""
+Process-wide admission of simulation runs from all sessions of the app.
+
+RunScheduler runs at most max_concurrent runs at a time, each on a thread that usually waits on a sandboxed worker
+process. Further runs wait in a queue per session, and the sessions share the slots fairly: a free slot goes to the
+waiting session with the fewest runs in progress, and among those to the one whose turn came first, in round-robin
+order. Each session's runs start in the order it submitted them. A session that submits many runs therefore cannot
+hold back the others, and the host never runs more simulations than it has slots for, so each run takes about as
+long under load as it does alone.
+"""
+import os
+import threading
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+
+class RunTicket:
+    """
+    Handle of a submitted run. Its future holds the run's result or exception once it finishes, and is cancelled if
+    the run is cancelled while it waits.
+    """
+
+    def __init__(self, scheduler: 'RunScheduler', session_id: str, run: Callable, args: tuple, kwargs: dict):
+        self.session_id = session_id
+        self.future = Future()
+        self._scheduler = scheduler
+        self._run = run
+        self._args = args
+        self._kwargs = kwargs
+
+    def position(self) -> Optional[int]:
+        """Position of the run among the waiting runs of all sessions, counted from 1, or None if it is not waiting."""
+        return self._scheduler.position(self)
+
+    def cancel(self) -> bool:
+        """Withdraws the run if it has not started yet. Returns whether it was withdrawn."""
+        return self._scheduler.cancel(self)
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: Optional[float] = None):
+        """The run's result, raising the run's exception if it failed. Waits for the run to finish."""
+        return self.future.result(timeout)
+
+
+class RunScheduler:
+    """Runs at most max_concurrent submitted runs at a time, giving free slots to the sessions with waiting runs in turn."""
+
+    def __init__(self, max_concurrent: Optional[int] = None):
+        self.max_concurrent = max_concurrent or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        # waiting runs of each session with any, in the order in which the sessions get their next turn
+        self._queues: 'OrderedDict[str, deque]' = OrderedDict()
+        self._running = Counter()  # session id -> its runs in progress
+        self._num_running = 0
+        self._executor = ThreadPoolExecutor(self.max_concurrent, thread_name_prefix='simulation-run')
+
+    @property
+    def num_running(self) -> int:
+        return self._num_running
+
+    def submit(self, session_id: str, run: Callable, *args, **kwargs) -> RunTicket:
+        """Queues run(*args, **kwargs) for the session and starts it as soon as it gets a slot."""
+        ticket = RunTicket(self, session_id, run, args, kwargs)
+        with self._lock:
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            self._dispatch()
+        return ticket
+
+    def waiting(self) -> List[RunTicket]:
+        """The waiting runs of all sessions, in the order in which they will start if no more runs are submitted."""
+        with self._lock:
+            queues = OrderedDict((session_id, deque(queue)) for session_id, queue in self._queues.items())
+            running = Counter(self._running)
+        waiting = []
+        while queues:
+            waiting.append(self._take_turn(queues, running))
+        return waiting
+
+    def position(self, ticket: RunTicket) -> Optional[int]:
+        waiting = self.waiting()
+        return waiting.index(ticket) + 1 if ticket in waiting else None
+
+    def cancel(self, ticket: RunTicket) -> bool:
+        with self._lock:
+            queue = self._queues.get(ticket.session_id)
+            if queue is None or ticket not in queue or not ticket.future.cancel():
+                return False
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.session_id]
+            return True
+
+    def shutdown(self, wait: bool = True):
+        """Cancels the waiting runs and stops the threads once the running ones finish."""
+        with self._lock:
+            for queue in self._queues.values():
+                for ticket in queue:
+                    ticket.future.cancel()
+            self._queues.clear()
+        self._executor.shutdown(wait)
+
+    @staticmethod
+    def _take_turn(queues: 'OrderedDict[str, deque]', running: Counter) -> RunTicket:
+        """Removes the run that gets the next slot from the queues and counts it as running."""
+        session_id = min(queues, key=running.__getitem__)
+        queue = queues[session_id]
+        ticket = queue.popleft()
+        running[session_id] += 1
+        # the session goes to the back of the turn order, or leaves it if it has no more runs waiting
+        if queue:
+            queues.move_to_end(session_id)
+        else:
+            del queues[session_id]
+        return ticket
+
+    def _dispatch(self):
+        # called with the lock held
+        while self._num_running < self.max_concurrent and self._queues:
+            ticket = self._take_turn(self._queues, self._running)
+            if not ticket.future.set_running_or_notify_cancel():
+                self._finish(ticket.session_id)
+                continue
+            self._num_running += 1
+            self._executor.submit(self._execute, ticket)
+
+    def _finish(self, session_id: str):
+        self._running[session_id] -= 1
+        if not self._running[session_id]:
+            del self._running[session_id]
+
+    def _execute(self, ticket: RunTicket):
+        try:
+            result = ticket._run(*ticket._args, **ticket._kwargs)
+        except BaseException as e:
+            ticket.future.set_exception(e)
+        else:
+            ticket.future.set_result(result)
+        finally:
+            with self._lock:
+                self._num_running -= 1
+                self._finish(ticket.session_id)
+                self._dispatch()
@@ -0,0 +1,470 @@
+import io
+import os
+import ast
+import json
+import zlib
+import hashlib
+import threading
+import zipfile
+from collections import OrderedDict
+from dataclasses import replace
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Union
+import pandas as pd
+
+from core.agents import generate_bank_strategy_source, generate_agent_source, parse_agent_source, parse_agent_base
+from core.config import AGENT_FIELDS, AgentSpec, SimulationConfig
+from core.datasets import DatasetStore
+from utils.helper import replace_whitespace_with_underscore
+
+SAVED_SETTINGS_FOLDER = './saved_settings'
+
+# version of the settings bundle format written by write_settings_bundle
+# version 1 adds a manifest; bundles without one are read as version 0
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+
+# folder and file name of each custom agent within a settings bundle
+AGENT_FILES = {
+    'Constraint Handler': ('constraint_handler', 'custom_constraint_handler.py'),
+    'Transaction Fee': ('transaction_fee_handler', 'custom_transaction_fee_handler.py'),
+    'Queue': ('queue', 'custom_queue.py'),
+    'Credit Facility': ('credit_facility', 'custom_credit_facility.py')
+}
+
+# input data attribute of SimulationConfig and its file within a settings bundle, without the extension of the data format
+DATA_FILES = {
+    'banks': 'data/banks',
+    'accounts': 'data/accounts',
+    'transactions': 'data/transactions'
+}
+
+# formats in which input data can be exported
+DATA_FORMATS = ('csv', 'parquet')
+
+# compression methods of the entries of a settings bundle
+COMPRESSION_METHODS = {
+    'deflated': zipfile.ZIP_DEFLATED,
+    'stored': zipfile.ZIP_STORED,
+    'bzip2': zipfile.ZIP_BZIP2,
+    'lzma': zipfile.ZIP_LZMA
+}
+
+# upper bound on the size of the serialized datasets kept for later exports
+DATA_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+@lru_cache(maxsize=256)
+def _bank_strategy_source(strategy_name: str, implementation: str) -> bytes:
+    return generate_bank_strategy_source(strategy_name, implementation).encode('utf-8')
+
+
+@lru_cache(maxsize=256)
+def _agent_source(agent_type: str, implementation: str, params_literal: str, base: Optional[str] = None) -> bytes:
+    return generate_agent_source(agent_type, implementation, ast.literal_eval(params_literal), base).encode('utf-8')
+
+
+class BundleValidationError(ValueError):
+    """Raised when a settings bundle is not a valid zip file, has an unsupported format version or fails its checksums."""
+
+
+def dataframe_key(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame, covering its column names, dtypes and values but not its index."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(column), str(dtype)] for column, dtype in df.dtypes.items()]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+class _SerializedDataCache:
+    """Least recently used cache of serialized datasets, keyed by content hash and format, bounded by total size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._blobs = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            blob = self._blobs.get(key)
+            if blob is not None:
+                self._blobs.move_to_end(key)
+            return blob
+
+    def put(self, key, blob: bytes):
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._blobs:
+                return
+            self._blobs[key] = blob
+            self._size += len(blob)
+            while self._size > self.max_bytes:
+                _, evicted = self._blobs.popitem(last=False)
+                self._size -= len(evicted)
+
+
+_data_cache = _SerializedDataCache(DATA_CACHE_MAX_BYTES)
+
+
+def _serialize_data(df: pd.DataFrame, data_format: str) -> bytes:
+    key = (dataframe_key(df), data_format)
+    blob = _data_cache.get(key)
+    if blob is None:
+        if data_format == 'parquet':
+            buffer = io.BytesIO()
+            df.to_parquet(buffer, index=False)
+            blob = buffer.getvalue()
+        else:
+            blob = df.to_csv(index=False).encode('utf-8')
+        _data_cache.put(key, blob)
+    return blob
+
+
+def write_settings_bundle(
+    config: SimulationConfig,
+    simulation_setting_name: str,
+    include_data: bool = False,
+    save_folder: str = SAVED_SETTINGS_FOLDER,
+    compression: str = 'deflated',
+    compresslevel: Optional[int] = None,
+    data_format: str = 'csv'
+) -> str:
+    """
+    Exports the simulation settings as a zip file that can be imported again with read_settings_bundle.
+    The zip file is written directly from memory. Generated agent code and serialized datasets are cached by content,
+    so exporting unchanged settings again does not regenerate them.
+
+    Args:
+        config (SimulationConfig): The settings to export.
+        simulation_setting_name (str): Name of the settings. Whitespace is replaced with underscores.
+        include_data (bool): Whether to include the banks, accounts and transactions data.
+        save_folder (str): Folder in which the zip file is created.
+        compression (str): Compression method of the zip entries, one of COMPRESSION_METHODS.
+        compresslevel (int): Compression level, as accepted by zipfile for the method. Defaults to the method's default.
+        data_format (str): Format of the exported data, one of DATA_FORMATS. Parquet files are compressed already,
+            so they are always stored without compression.
+
+    Returns:
+        str: The path of the zip file.
+
+    Raises:
+        FileExistsError: If a settings file with the same name already exists.
+    """
+    if compression not in COMPRESSION_METHODS:
+        raise ValueError(f"Unknown compression '{compression}'. Expected one of {', '.join(COMPRESSION_METHODS)}.")
+    if data_format not in DATA_FORMATS:
+        raise ValueError(f"Unknown data format '{data_format}'. Expected one of {', '.join(DATA_FORMATS)}.")
+
+    # create saved settings folder if it does not exist
+    Path(save_folder).mkdir(parents=True, exist_ok=True)
+    simulation_setting_name = replace_whitespace_with_underscore(simulation_setting_name)
+    zip_path = os.path.join(save_folder, f'{simulation_setting_name}.zip')
+
+    # describes every entry, so that imports can validate and summarize the bundle without reading the entries
+    manifest = {'format_version': BUNDLE_FORMAT_VERSION, 'entries': {}, 'datasets': {}, 'bank_strategies': {}, 'agents': {}}
+
+    def write_entry(z: zipfile.ZipFile, name: str, data: bytes, compress_type: Optional[int] = None):
+        z.writestr(name, data, compress_type=compress_type)
+        manifest['entries'][name] = {'size': len(data), 'crc32': zlib.crc32(data), 'sha256': hashlib.sha256(data).hexdigest()}
+
+    # exclusive creation, so that an existing settings file is never overwritten
+    with open(zip_path, 'xb') as zip_file:
+        try:
+            with zipfile.ZipFile(zip_file, 'w', COMPRESSION_METHODS[compression], compresslevel=compresslevel) as z:
+                # static data
+                write_entry(z, 'static_data.json', json.dumps(config.static_data()).encode('utf-8'))
+
+                # bank strategy implementations
+                for strategy_name, implementation in config.bank_strategies.items():
+                    file_name = f'bank_strategies/{replace_whitespace_with_underscore(strategy_name)}.py'
+                    write_entry(z, file_name, _bank_strategy_source(strategy_name, implementation))
+                    manifest['bank_strategies'][strategy_name] = {
+                        'file': file_name,
+                        'class_name': replace_whitespace_with_underscore(strategy_name)
+                    }
+
+                # custom agents
+                for agent_type, (folder, file_name) in AGENT_FILES.items():
+                    spec = config.agent(agent_type)
+                    if spec.implementation is not None:
+                        write_entry(z, f'{folder}/{file_name}', _agent_source(agent_type, spec.implementation, repr(spec.params), spec.base))
+                        manifest['agents'][agent_type] = {
+                            'file': f'{folder}/{file_name}',
+                            'class_name': f"Custom{agent_type.replace(' ', '')}",
+                            'base': spec.base,
+                            'params': spec.params
+                        }
+
+                if include_data:
+                    compress_type = zipfile.ZIP_STORED if data_format == 'parquet' else None
+                    for attribute, file_name in DATA_FILES.items():
+                        df = getattr(config, attribute)
+                        if df is not None:
+                            write_entry(z, f'{file_name}.{data_format}', _serialize_data(df, data_format), compress_type)
+                            manifest['datasets'][attribute] = {
+                                'file': f'{file_name}.{data_format}',
+                                'format': data_format,
+                                'rows': len(df),
+                                'schema': {str(column): str(dtype) for column, dtype in df.dtypes.items()}
+                            }
+
+                z.writestr(MANIFEST_FILE, json.dumps(manifest, indent=2, default=str))
+        except BaseException:
+            zip_file.close()
+            os.remove(zip_path)
+            raise
+
+    return zip_path
+
+
+class SettingsBundle:
+    """
+    Settings zip file exported with write_settings_bundle, read in two phases.
+
+    Opening a bundle only reads the zip file's index, its manifest and its static data. Agent code is parsed when
+    requested and the data files are parsed when loaded, so that the parameters of a large settings file can be
+    inspected, or its data replaced, without paying for the data.
+
+    The manifest records a checksum of every entry, the row count and schema of each dataset and the class names and
+    init parameters of the agents. Bundles written before the manifest was introduced (format version 0) are read by
+    scanning the zip file's entries instead.
+    """
+
+    def __init__(self, settings_file: Union[str, BinaryIO], dataset_store: Optional[DatasetStore] = None):
+        """
+        Args:
+            settings_file (Union[str, BinaryIO]): Path or seekable file-like object of the zip file. A file-like object
+                is read again whenever data is loaded, so it must stay open while the bundle is in use.
+            dataset_store (DatasetStore): Store through which CSV data files are parsed, so that data already held by
+                the store is shared rather than parsed again. Defaults to parsing the data files directly.
+
+        Raises:
+            BundleValidationError: If the file is not a zip file or its format version is not supported.
+        """
+        self._settings_file = settings_file
+        self._dataset_store = dataset_store
+        try:
+            with self._open() as z:
+                self._infos = {info.filename: info for info in z.infolist() if not info.is_dir()}
+                self.manifest = json.loads(z.read(MANIFEST_FILE)) if MANIFEST_FILE in self._infos else None
+                self.static_data = json.loads(z.read('static_data.json')) if 'static_data.json' in self._infos else None
+        except (zipfile.BadZipFile, json.JSONDecodeError) as e:
+            raise BundleValidationError(f'Not a valid settings file: {e}') from e
+        if self.format_version > BUNDLE_FORMAT_VERSION:
+            raise BundleValidationError(
+                f'The settings file has format version {self.format_version}, '
+                f'but only versions up to {BUNDLE_FORMAT_VERSION} are supported. Please update PSSimPy-web.'
+            )
+        # size of each file in the bundle, uncompressed
+        self.files = {name: info.file_size for name, info in self._infos.items()}
+
+    @property
+    def format_version(self) -> int:
+        return 0 if self.manifest is None else self.manifest['format_version']
+
+    def _open(self) -> zipfile.ZipFile:
+        if hasattr(self._settings_file, 'seek'):
+            self._settings_file.seek(0)
+        return zipfile.ZipFile(self._settings_file)
+
+    def _read_entry(self, z: zipfile.ZipFile, name: str) -> bytes:
+        data = z.read(name)
+        if self.manifest is not None and name in self.manifest['entries']:
+            if hashlib.sha256(data).hexdigest() != self.manifest['entries'][name]['sha256']:
+                raise BundleValidationError(f"'{name}' does not match its checksum in the manifest.")
+        return data
+
+    def validate(self, full: bool = False):
+        """
+        Checks the integrity of the bundle.
+
+        The quick check compares the size and CRC-32 of every entry listed in the manifest against the zip file's index,
+        without decompressing anything. The full check also decompresses every entry and verifies its SHA-256 checksum.
+        Bundles without a manifest can only be checked fully, against the CRC-32 checksums of the zip file.
+
+        Args:
+            full (bool): Whether to decompress and verify every entry.
+
+        Raises:
+            BundleValidationError: If any entry is missing or does not match its checksums.
+        """
+        problems = []
+        if self.manifest is not None:
+            for name, entry in self.manifest['entries'].items():
+                info = self._infos.get(name)
+                if info is None:
+                    problems.append(f"'{name}' is missing.")
+                elif info.file_size != entry['size'] or info.CRC != entry['crc32']:
+                    problems.append(f"'{name}' does not match the manifest.")
+        if full and not problems:
+            with self._open() as z:
+                if self.manifest is None:
+                    bad_file = z.testzip()
+                    if bad_file is not None:
+                        problems.append(f"'{bad_file}' is corrupted.")
+                else:
+                    for name in self.manifest['entries']:
+                        try:
+                            self._read_entry(z, name)
+                        except (BundleValidationError, zipfile.BadZipFile):
+                            problems.append(f"'{name}' does not match its checksum in the manifest.")
+        if problems:
+            raise BundleValidationError('The settings file is damaged. ' + ' '.join(problems))
+
+    def data_file(self, attribute: str) -> Optional[str]:
+        """Returns the bundle's file for an input data attribute of SimulationConfig, or None if it has no such data."""
+        if self.manifest is not None:
+            dataset = self.manifest['datasets'].get(attribute)
+            return None if dataset is None else dataset['file']
+        for data_format in DATA_FORMATS:
+            file_name = f'{DATA_FILES[attribute]}.{data_format}'
+            if file_name in self.files:
+                return file_name
+        return None
+
+    def load_data(self, attribute: str) -> Optional[pd.DataFrame]:
+        """
+        Parses the data for an input data attribute of SimulationConfig, or returns None if the bundle has no such data.
+        CSV data that the dataset store already holds, by the checksum in the manifest, is not read from the bundle at all.
+        """
+        file_name = self.data_file(attribute)
+        if file_name is None:
+            return None
+        # the dataset store is keyed by the same SHA-256 checksum as the manifest
+        if self._dataset_store is not None and self.manifest is not None and file_name.endswith('.csv'):
+            df = self._dataset_store.get(self.manifest['entries'][file_name]['sha256'])
+            if df is not None:
+                return df
+        with self._open() as z:
+            data = self._read_entry(z, file_name)
+        if file_name.endswith('.parquet'):
+            return pd.read_parquet(io.BytesIO(data))
+        if self._dataset_store is not None:
+            return self._dataset_store.get_or_parse(data)[1]
+        return pd.read_csv(io.BytesIO(data))
+
+    def _bank_strategy_files(self) -> Dict[str, Optional[str]]:
+        # file of each bank strategy; the strategy names are only known from the manifest
+        if self.manifest is not None:
+            return {entry['file']: name for name, entry in self.manifest['bank_strategies'].items()}
+        return {b: None for b in self.files if b.startswith('bank_strategies/') and b.endswith('.py')}
+
+    def _agent_files(self) -> Dict[str, str]:
+        if self.manifest is not None:
+            return {agent_type: entry['file'] for agent_type, entry in self.manifest['agents'].items()}
+        agent_files = {}
+        for agent_type, (folder, _) in AGENT_FILES.items():
+            files = [f for f in self.files if f.startswith(f'{folder}/') and f.endswith('.py')]
+            if files:
+                agent_files[agent_type] = files[0]
+        return agent_files
+
+    def bank_strategies(self) -> Dict[str, str]:
+        """Parses the bank strategies, returning the implementation of each strategy name."""
+        strategies = {}
+        with self._open() as z:
+            for bank_file, strategy_name in self._bank_strategy_files().items():
+                class_name, implementation, _ = parse_agent_source('Bank Strategy', self._read_entry(z, bank_file).decode('utf-8'))
+                strategies[strategy_name or class_name] = implementation
+        return strategies
+
+    def agents(self) -> Dict[str, AgentSpec]:
+        """Parses the custom agents, returning the specification of each agent type in the bundle."""
+        agents = {}
+        with self._open() as z:
+            for agent_type, agent_file in self._agent_files().items():
+                source = self._read_entry(z, agent_file).decode('utf-8')
+                _, implementation, params = parse_agent_source(agent_type, source)
+                # the template class an agent extends is declared by the class in its module
+                agents[agent_type] = AgentSpec(implementation, params, parse_agent_base(agent_type, source))
+        return agents
+
+    def summary(self) -> dict:
+        """
+        Describes the contents of the bundle: its format version, static data, datasets, bank strategies and agents.
+        Only bundles without a manifest need their agent code to be read for this.
+        """
+        summary = {'format_version': self.format_version, 'static_data': self.static_data}
+        if self.manifest is not None:
+            summary['datasets'] = {
+                attribute: {'rows': dataset['rows'], 'columns': list(dataset['schema']), 'size': self.files[dataset['file']]}
+                for attribute, dataset in self.manifest['datasets'].items()
+            }
+            summary['bank_strategies'] = list(self.manifest['bank_strategies'])
+            summary['agents'] = {
+                agent_type: {'class_name': entry['class_name'], 'base': entry.get('base'), 'params': [param['name'] for param in entry['params']]}
+                for agent_type, entry in self.manifest['agents'].items()
+            }
+            return summary
+
+        summary['datasets'] = {
+            attribute: {'rows': None, 'columns': None, 'size': self.files[self.data_file(attribute)]}
+            for attribute in DATA_FILES if self.data_file(attribute) is not None
+        }
+        summary['bank_strategies'] = list(self.bank_strategies())
+        summary['agents'] = {}
+        with self._open() as z:
+            for agent_type, agent_file in self._agent_files().items():
+                source = z.read(agent_file).decode('utf-8')
+                class_name, _, params = parse_agent_source(agent_type, source)
+                summary['agents'][agent_type] = {
+                    'class_name': class_name,
+                    'base': parse_agent_base(agent_type, source),
+                    'params': [param['name'] for param in params]
+                }
+        return summary
+
+    def to_config(self, config: Optional[SimulationConfig] = None, load_data: bool = True) -> SimulationConfig:
+        """
+        Builds the settings of the bundle. Agent code is only parsed, not executed; it is compiled when the configuration
+        is applied or run.
+
+        Args:
+            config (SimulationConfig): Settings that are kept where the bundle has no entry. Bank strategies are merged.
+                Defaults to an empty configuration. It is not modified.
+            load_data (bool): Whether to load the bundle's data. If not, the data of config is kept.
+
+        Returns:
+            SimulationConfig: The imported settings.
+        """
+        config = SimulationConfig() if config is None else replace(config, bank_strategies=dict(config.bank_strategies))
+        if self.static_data is not None:
+            config.update_static_data(self.static_data)
+        if load_data:
+            for attribute in DATA_FILES:
+                if self.data_file(attribute) is not None:
+                    setattr(config, attribute, self.load_data(attribute))
+        config.bank_strategies.update(self.bank_strategies())
+        for agent_type, spec in self.agents().items():
+            setattr(config, AGENT_FIELDS[agent_type], spec)
+        return config
+
+
+def read_settings_bundle(
+    settings_file: Union[str, BinaryIO],
+    config: Optional[SimulationConfig] = None,
+    dataset_store: Optional[DatasetStore] = None
+) -> SimulationConfig:
+    """
+    Reads a settings zip file exported with write_settings_bundle, including its data.
+    Agent code is only parsed, not executed; it is compiled when the configuration is applied or run.
+
+    Args:
+        settings_file (Union[str, BinaryIO]): Path or file-like object of the zip file.
+        config (SimulationConfig): Settings that are kept where the zip file has no entry. Bank strategies are merged.
+            Defaults to an empty configuration. It is not modified.
+        dataset_store (DatasetStore): Store through which the data files are parsed, so that data already held by
+            the store is shared rather than parsed again. Defaults to parsing the data files directly.
+
+    Returns:
+        SimulationConfig: The imported settings.
+
+    Raises:
+        BundleValidationError: If the zip file is not a valid settings file or fails the quick integrity check.
+    """
+    bundle = SettingsBundle(settings_file, dataset_store)
+    bundle.validate()
+    return bundle.to_config(config)
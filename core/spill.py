@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import weakref
+from typing import List, Optional, Tuple, Union
+import pandas as pd
+
+
+class SpillDirectory:
+    """
+    Directory holding the spilled logs of one simulation run.
+    The directory is removed once no log handle references it any more, e.g. when the session that holds the
+    handles ends or a newer run replaces them, and at the latest when the process exits.
+    """
+
+    def __init__(self, parent_dir: Optional[str] = None):
+        if parent_dir is not None:
+            os.makedirs(parent_dir, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix='pssimpy-logs-', dir=parent_dir)
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.path, True)
+
+    def cleanup(self):
+        """Removes the directory now."""
+        self._finalizer()
+
+
+class SpilledLog:
+    """
+    Handle to a simulation log stored as an Arrow IPC (Feather) file, which is memory-mapped when queried.
+    Only the queried rows and columns are converted to a DataFrame.
+    """
+
+    def __init__(self, path: str, directory: SpillDirectory, num_rows: int, column_names: List[str], num_bytes: int):
+        self.path = path
+        self.num_rows = num_rows
+        self.column_names = column_names
+        self.num_bytes = num_bytes
+        self._directory = directory  # keeps the directory alive while the handle is in use
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __repr__(self) -> str:
+        return f"SpilledLog('{self.path}', rows={self.num_rows})"
+
+    def _read_table(self, columns: Optional[List[str]] = None):
+        import pyarrow as pa
+        with pa.memory_map(self.path, 'r') as source:
+            # the record batches reference the memory-mapped file, nothing is copied until converted to pandas
+            table = pa.ipc.open_file(source).read_all()
+        return table if columns is None else table.select(columns)
+
+    def query(
+        self,
+        days: Optional[Tuple[int, int]] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Reads the rows of the log within a day and time range.
+
+        Args:
+            days (Tuple[int, int]): First and last day to include. Defaults to all days.
+            start_time (str): Earliest time of day to include, in HH:MM format. Defaults to the start of the day.
+            end_time (str): Latest time of day to include, in HH:MM format. Defaults to the end of the day.
+            columns (List[str]): Columns to read. Defaults to all columns.
+
+        Returns:
+            pd.DataFrame: The selected rows and columns.
+        """
+        import pyarrow.compute as pc
+        table = self._read_table()
+        mask = None
+        conditions = []
+        if days is not None:
+            conditions += [pc.greater_equal(table['day'], days[0]), pc.less_equal(table['day'], days[1])]
+        # times are zero-padded HH:MM strings, so they compare correctly as strings
+        if start_time is not None:
+            conditions.append(pc.greater_equal(table['time'], start_time))
+        if end_time is not None:
+            conditions.append(pc.less_equal(table['time'], end_time))
+        for condition in conditions:
+            mask = condition if mask is None else pc.and_(mask, condition)
+        if mask is not None:
+            table = table.filter(mask)
+        if columns is not None:
+            table = table.select(columns)
+        return table.to_pandas()
+
+    def to_pandas(self) -> pd.DataFrame:
+        """Reads the whole log."""
+        return self._read_table().to_pandas()
+
+
+def convert_log_file(csv_path: str, arrow_path: str) -> Tuple[int, List[str]]:
+    """
+    Converts a simulation log csv file into an Arrow IPC file and returns its number of rows and its column names.
+    Time columns are kept as HH:MM strings, as when the log is read with pandas.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    with open(csv_path) as f:
+        header = f.readline().strip().split(',')
+    convert_options = pa_csv.ConvertOptions(column_types={column: pa.string() for column in header if column.endswith('time')})
+    table = pa_csv.read_csv(csv_path, convert_options=convert_options)
+
+    with pa.OSFile(arrow_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return table.num_rows, table.column_names
+
+
+def spill_log_file(csv_path: str, directory: SpillDirectory) -> SpilledLog:
+    """Converts a simulation log csv file into an Arrow IPC file in the spill directory and returns its handle."""
+    path = os.path.join(directory.path, os.path.splitext(os.path.basename(csv_path))[0] + '.arrow')
+    num_rows, column_names = convert_log_file(csv_path, path)
+    return SpilledLog(path, directory, num_rows, column_names, os.path.getsize(path))
+
+
+def is_spilled_log(log) -> bool:
+    return isinstance(log, SpilledLog)
+
+
+def query_log(
+    log: Union[pd.DataFrame, SpilledLog],
+    days: Optional[Tuple[int, int]] = None,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """Selects rows of a log within a day and time range, whether the log is held in memory or spilled to disk."""
+    if is_spilled_log(log):
+        return log.query(days, start_time, end_time, columns)
+    mask = pd.Series(True, index=log.index)
+    if days is not None:
+        mask &= log['day'].between(days[0], days[1])
+    if start_time is not None:
+        mask &= log['time'] >= start_time
+    if end_time is not None:
+        mask &= log['time'] <= end_time
+    log = log[mask] if not mask.all() else log
+    return log if columns is None else log[columns]
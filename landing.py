@@ -1,5 +1,5 @@
 import streamlit as st
-from utils.session import import_simulation_setting
+from utils.session import import_simulation_setting, describe_simulation_setting
 
 st.write('''
          # Welcome to PSSimPy: A Large-Value Payment System Simulator
@@ -32,10 +32,34 @@ uploaded_file = st.file_uploader(
     help="Upload a .zip file containing the simulation setting."
 )
 
+# Summarize the uploaded settings before they are imported
+valid_file = True
+if uploaded_file is not None:
+    try:
+        summary = describe_simulation_setting(uploaded_file)
+    except ValueError as e:
+        valid_file = False
+        st.error(str(e))
+    else:
+        with st.expander("Settings Contents"):
+            if summary['static_data'] is not None:
+                st.write('**Parameters**', summary['static_data']['Parameters'])
+                st.write('**Random transactions:**', summary['static_data']['Random Transactions'])
+            for attribute, dataset in summary['datasets'].items():
+                rows = f"{dataset['rows']:,} rows, " if dataset['rows'] is not None else ''
+                st.write(f"**Data - {attribute}:** {rows}{dataset['size'] / 1024:,.1f} KB")
+            if not summary['datasets']:
+                st.write('**Data:** not included')
+            st.write('**Bank strategies:**', ', '.join(summary['bank_strategies']) or 'none')
+            for agent_type, agent in summary['agents'].items():
+                params = f" (parameters: {', '.join(agent['params'])})" if agent['params'] else ''
+                base = f" extends {agent['base']}" if agent.get('base') else ''
+                st.write(f"**{agent_type}:** {agent['class_name']}{base}{params}")
+
 # Add an "Import" button to trigger the import logic
-if st.button("Import Simulation Setting"):
+if st.button("Import Simulation Setting", disabled=not valid_file):
     if uploaded_file is not None:
-        st.success('Settings successfully imported!')
         import_simulation_setting(uploaded_file)
+        st.success('Settings successfully imported!')
     else:
         st.error("No file selected. Please upload a valid .zip file.")
\ No newline at end of file
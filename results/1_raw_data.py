@@ -1,22 +1,31 @@
 import streamlit as st
 
+from core.spill import query_log
+from utils.session import select_log_days
+
 st.markdown("# Raw Data Output")
 
+if not st.session_state['Log Files']:
+    st.info('No simulation results yet. Please run a simulation on the Preview page.')
+    st.stop()
+
+days = select_log_days('raw_data_days')
+
 if st.session_state['Random Transactions']:
     st.markdown('## Transactions Arrival')
-    st.dataframe(st.session_state['Log Files']['Transactions Arrival'])
+    st.dataframe(query_log(st.session_state['Log Files']['Transactions Arrival'], days))
 
 st.markdown('## Processed Transactions')
-st.dataframe(st.session_state['Log Files']['Processed Transactions'])
+st.dataframe(query_log(st.session_state['Log Files']['Processed Transactions'], days))
 
 st.markdown('## Account Balances')
-st.dataframe(st.session_state['Log Files']['Account Balance'])
+st.dataframe(query_log(st.session_state['Log Files']['Account Balance'], days))
 
 st.markdown('## Queue Statistics')
-st.dataframe(st.session_state['Log Files']['Queue Stats'])
+st.dataframe(query_log(st.session_state['Log Files']['Queue Stats'], days))
 
 st.markdown('## Credit Facility Statistics')
-st.dataframe(st.session_state['Log Files']['Credit Facility'])
+st.dataframe(query_log(st.session_state['Log Files']['Credit Facility'], days))
 
 st.markdown('## Transaction Fees')
-st.dataframe(st.session_state['Log Files']['Transaction Fees'])
\ No newline at end of file
+st.dataframe(query_log(st.session_state['Log Files']['Transaction Fees'], days))
\ No newline at end of file
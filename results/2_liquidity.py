@@ -1,119 +1,28 @@
 import streamlit as st
-import pandas as pd
 import altair as alt
 
-from utils.date_time import add_minutes_to_time, get_time_windows, is_time_earlier_or_equal
-from utils.indicator import turnover_ratio, average_payment_delay
+from core.indicators import calculate_turnover_ratios, calculate_avg_pmt_delay
+from core.spill import query_log
+from utils.session import select_log_days
 
-dynamic_width = max(150, 900/st.session_state['Parameters']['Number of Days'])
-
-# Turnover Ratio Calculation Function
-def calculate_turnover_ratios(transactions_df, balances_df, opening_time, closing_time, processing_window, num_days):
-    # Create an empty list to store the results
-    results = []
-
-    # Loop through each day of the simulation
-    for day in range(1, num_days + 1):
-        # Get the time windows for the day
-        time_windows = get_time_windows(opening_time, closing_time, processing_window)
-        
-        # For each time window, calculate the turnover ratio
-        for i, time_window in enumerate(time_windows):
-            # Filter transactions up to the current time window
-            filtered_transactions = transactions_df[
-                (transactions_df['day'] == day) & 
-                (transactions_df['time'].apply(lambda t: is_time_earlier_or_equal(t, time_window))) &
-                (transactions_df['status'] == 'Success')
-            ]
-
-            
-            # Sum of all successful payments settled
-            total_payments_settled = filtered_transactions['amount'].sum()
-            
-            # Filter balances up to the current time window
-            filtered_balances = balances_df[
-                (balances_df['day'] == day) & 
-                (balances_df['time'] <= time_window)
-            ]
-            
-            # Average liquidity (sum of all balances divided by number of periods passed)
-            periods_passed = i + 1
-            average_liquidity = filtered_balances['balance'].sum() / periods_passed
-            
-            # Calculate turnover ratio for the current period
-            turnover = turnover_ratio(total_payments_settled, average_liquidity)
-            
-            # Append results to the list
-            results.append({
-                'day': day,
-                'time': time_window,
-                'turnover_ratio': turnover
-            })
-
-    # Convert the results list to a DataFrame
-    turnover_df = pd.DataFrame(results)
-
-    return turnover_df
+if not st.session_state['Log Files']:
+    st.info('No simulation results yet. Please run a simulation on the Preview page.')
+    st.stop()
 
-# Average Payment Delay Calculation Function
-def calculate_avg_pmt_delay(transactions_df, opening_time, closing_time, processing_window, num_days, delay_from_arrival=False):
-    # Create an empty list to store the results
-    results = []
-
-    # Loop through each day of the simulation
-    for day in range(1, num_days + 1):
-        # Get the time windows for the day
-        time_windows = get_time_windows(opening_time, closing_time, processing_window)
-    
-        # For each time window, calculate the average payment delay
-        for i, time_window in enumerate(time_windows):
-            # Filter transactions up to the current time window
-            filtered_transactions = transactions_df[
-                (
-                    (transactions_df['day'] == day) & 
-                    (transactions_df['time'].apply(lambda t: is_time_earlier_or_equal(t, time_window))) &
-                    (transactions_df['status'] == 'Success')
-                ) |
-                (
-                    (transactions_df['day'] < day) &
-                    (transactions_df['status'] == 'Success')
-                )
-            ]
-            
-            # select whether to calculate delay from time of arrival or time of payment submission
-            transaction_start_times = filtered_transactions['time'] if delay_from_arrival else filtered_transactions['submission_time']
-            transaction_start_days = filtered_transactions['day'] if delay_from_arrival else filtered_transactions['submission_day']
-
-            payment_delay_metric = average_payment_delay(
-                transaction_start_times.tolist(), 
-                filtered_transactions['settlement_time'].tolist(), 
-                transaction_start_days.tolist(),
-                filtered_transactions['settlement_day'].tolist(),
-                filtered_transactions['amount'].tolist(),
-                True
-            )
-            
-            # Append results to the list
-            results.append({
-                'day': day,
-                'time': time_window,
-                'average_payment_delay': payment_delay_metric
-            })
-
-    # Convert the results list to a DataFrame
-    payment_delay_df = pd.DataFrame(results)
-
-    return payment_delay_df
+dynamic_width = max(150, 900/st.session_state['Parameters']['Number of Days'])
 
 st.markdown("# Liquidity Results")
 
+days = select_log_days('liquidity_days')
+
 # establish relevant variables
-transactions_df = st.session_state['Log Files']['Processed Transactions']
-balances_df = st.session_state['Log Files']['Account Balance']
 opening_time = st.session_state['Parameters']['Opening Time']
 closing_time = st.session_state['Parameters']['Closing Time']
 processing_window = st.session_state['Parameters']['Processing Window']
 num_days = st.session_state['Parameters']['Number of Days']
+first_day, last_day = days if days is not None else (1, num_days)
+transactions_df = query_log(st.session_state['Log Files']['Processed Transactions'], days)
+balances_df = query_log(st.session_state['Log Files']['Account Balance'], days)
 
 st.markdown("## Turnover Ratio")
 
@@ -124,7 +33,8 @@ turnover_ratios_df = calculate_turnover_ratios(
     opening_time, 
     closing_time, 
     processing_window, 
-    num_days
+    last_day,
+    first_day
 )
 # plot ratios
 # Step 1: Combine day and time into a single column for better x-axis representation
@@ -153,7 +63,10 @@ st.markdown("## Average Payment Delay")
 
 delay_from_arrival = st.checkbox('Caclculate delay from time of transaction arrival', value=False,)
 
-df_pmt_delay = calculate_avg_pmt_delay(transactions_df, opening_time, closing_time, processing_window, num_days, delay_from_arrival=delay_from_arrival)
+# the average payment delay is cumulative, so it needs the transactions of the days before the selection as well
+delay_columns = ['day', 'time', 'status', 'amount', 'submission_day', 'submission_time', 'settlement_day', 'settlement_time']
+delay_transactions_df = query_log(st.session_state['Log Files']['Processed Transactions'], (1, last_day), columns=delay_columns)
+df_pmt_delay = calculate_avg_pmt_delay(delay_transactions_df, opening_time, closing_time, processing_window, last_day, delay_from_arrival=delay_from_arrival, first_day=first_day)
 df_pmt_delay = df_pmt_delay.sort_values(by=['day', 'time'])
 # print(df_pmt_delay)
 # # Create the Altair chart
@@ -1,12 +1,21 @@
 import altair as alt
 import streamlit as st
 
+from core.spill import query_log
+from utils.session import select_log_days
+
+
+if not st.session_state['Log Files']:
+    st.info('No simulation results yet. Please run a simulation on the Preview page.')
+    st.stop()
+
+days = select_log_days('credit_usage_days')
 
 # Section Header
 st.markdown("## Credit Usage")
 
 # Load the Credit Facility log from session state
-df_credit = st.session_state['Log Files']['Credit Facility']
+df_credit = query_log(st.session_state['Log Files']['Credit Facility'], days)
 
 # Prepare the DataFrame by sorting it for time-series plotting
 df_credit = df_credit.sort_values(by=['day', 'time'])
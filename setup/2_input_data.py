@@ -1,7 +1,10 @@
+import time
 import streamlit as st
-import pandas as pd
 
 from utils.file import check_missing_headers
+from utils.resources import read_uploaded_csv
+from utils.generator import generate_transactions, AMOUNT_DISTRIBUTIONS, ARRIVAL_CURVES
+from utils.scenario import scale_scenario, load_template_scenario
 
 st.markdown("# Input Data")
 
@@ -13,7 +16,7 @@ st.markdown("## Banks")
 df_banks = None
 uploaded_banks = st.file_uploader("Upload your Banks input file", type=["csv"])
 if uploaded_banks is not None:
-    df_banks = pd.read_csv(uploaded_banks)
+    df_banks = read_uploaded_csv(uploaded_banks)
 
     # validation
     bank_upload_validation_fail = False
@@ -31,7 +34,7 @@ st.markdown("## Accounts")
 df_accounts = None
 uploaded_accounts = st.file_uploader("Upload your Accounts input file", type=["csv"])
 if uploaded_accounts is not None:
-    df_accounts = pd.read_csv(uploaded_accounts)
+    df_accounts = read_uploaded_csv(uploaded_accounts)
 
     # validation
     account_upload_validation_fail = False
@@ -53,21 +56,66 @@ if st.session_state['random_transactions_flag']:
     min_txn_amount = st.number_input('Minimum Transaction Amount', min_value=1, value=1)
     max_txn_amount = st.number_input('Maximum Transaction Amount', min_value=1, value=100)
 else:
-    uploaded_transactions = st.file_uploader("Upload your Transactions input file", type=["csv"])
-    if uploaded_transactions is not None:
-        df_transactions = pd.read_csv(uploaded_transactions)
+    transactions_source = st.radio('Transactions source', ['Upload file', 'Synthetic generator'], horizontal=True)
+    if transactions_source == 'Upload file':
+        uploaded_transactions = st.file_uploader("Upload your Transactions input file", type=["csv"])
+        if uploaded_transactions is not None:
+            df_transactions = read_uploaded_csv(uploaded_transactions)
 
-        # validation
-        transaction_upload_validation_fail = False
-        missing_transaction_headers = check_missing_headers(df_transactions, ['sender_account', 'recipient_account', 'amount', 'time'])
-        if len(missing_transaction_headers) > 0:
-            transaction_upload_validation_fail = True
-            st.error(f"The following required column(s) are missing: {', '.join(missing_transaction_headers)}")
+            # validation
+            transaction_upload_validation_fail = False
+            missing_transaction_headers = check_missing_headers(df_transactions, ['sender_account', 'recipient_account', 'amount', 'time'])
+            if len(missing_transaction_headers) > 0:
+                transaction_upload_validation_fail = True
+                st.error(f"The following required column(s) are missing: {', '.join(missing_transaction_headers)}")
 
-        if not transaction_upload_validation_fail:
-            st.dataframe(df_transactions)
-        else:
-            df_transactions = None
+            if not transaction_upload_validation_fail:
+                st.dataframe(df_transactions)
+            else:
+                df_transactions = None
+    else:
+        # generate transactions over the uploaded accounts, or the registered accounts if none are uploaded
+        generator_accounts = df_accounts if df_accounts is not None else st.session_state['Input Data']['Accounts']
+        col1, col2 = st.columns(2)
+        with col1:
+            num_generated_txns = st.number_input('Number of Transactions', min_value=1, value=10000, step=1000)
+            amount_distribution = st.selectbox('Amount Distribution', AMOUNT_DISTRIBUTIONS)
+            amount_median = st.number_input('Median Transaction Amount', min_value=1, value=100)
+            amount_shape = st.number_input('Distribution Shape', min_value=0.01, value=1.0, step=0.1,
+                                           help='Sigma for Log-normal amounts (larger is heavier-tailed), tail index alpha for Pareto amounts (smaller is heavier-tailed). Ignored for Uniform amounts.')
+            max_generated_amount = st.number_input('Maximum Transaction Amount (0 for no cap)', min_value=0, value=0)
+        with col2:
+            arrival_curve = st.selectbox('Intraday Arrival Curve', ARRIVAL_CURVES, index=ARRIVAL_CURVES.index('Bimodal'))
+            network_skew = st.number_input('Network Skew', min_value=0.0, value=1.0, step=0.1,
+                                           help='Concentration of activity on a few senders and recipients. 0 spreads transactions evenly across accounts.')
+            generator_seed = st.number_input('Random Seed', min_value=0, value=0)
+        if st.button('Generate Transactions'):
+            if generator_accounts is None or len(generator_accounts) < 2:
+                st.error('Please upload Accounts data with at least two accounts before generating transactions.')
+            else:
+                parameters = st.session_state['Parameters']
+                generation_start = time.perf_counter()
+                st.session_state['generated_transactions'] = generate_transactions(
+                    generator_accounts,
+                    num_generated_txns,
+                    open_time=parameters['Opening Time'] or '08:00',
+                    close_time=parameters['Closing Time'] or '17:00',
+                    num_days=parameters['Number of Days'] or 1,
+                    amount_distribution=amount_distribution,
+                    amount_median=amount_median,
+                    amount_shape=amount_shape,
+                    max_amount=max_generated_amount if max_generated_amount > 0 else None,
+                    network_skew=network_skew,
+                    arrival_curve=arrival_curve,
+                    seed=generator_seed
+                )
+                generation_time = time.perf_counter() - generation_start
+                st.success(f'Generated {num_generated_txns:,} transactions in {generation_time:.3f}s '
+                           f'({num_generated_txns / generation_time / 1e6:.2f} million rows per second).')
+        df_transactions = st.session_state.get('generated_transactions')
+        if df_transactions is not None:
+            st.dataframe(df_transactions.head(1000))
+            st.caption(f'Showing the first {min(1000, len(df_transactions)):,} of {len(df_transactions):,} generated transactions.')
 
 if st.button('Register Input Data'):
     # validation
@@ -93,3 +141,42 @@ if st.button('Register Input Data'):
             st.session_state['Random Transactions'] = False
             st.session_state['Input Data']['Transactions'] = df_transactions
         st.success('Input Data successfully registered!')
+
+st.markdown("## Scale Scenario")
+with st.expander("Replicate the scenario to a larger system size"):
+    scale_source = st.radio('Scenario to scale', ['Registered Input Data', 'File Templates'], horizontal=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        scale_factor = st.number_input('Scale Factor', min_value=1, value=10, help='Number of copies of the banks, accounts and transactions.')
+        balance_multiplier = st.number_input('Balance Multiplier', min_value=0.0, value=1.0, step=0.1)
+    with col2:
+        cross_replica_share = st.number_input('Cross-Replica Transaction Share', min_value=0.0, max_value=1.0, value=0.0, step=0.05,
+                                              help='Share of transactions redirected to the same recipient account in another copy, linking the copies into one network.')
+        scale_seed = st.number_input('Random Seed', min_value=0, value=0, key='scale_seed')
+    if st.button('Build Scaled Scenario'):
+        if scale_source == 'File Templates':
+            source_banks, source_accounts, source_transactions = load_template_scenario()
+        else:
+            source_banks = st.session_state['Input Data']['Banks']
+            source_accounts = st.session_state['Input Data']['Accounts']
+            source_transactions = st.session_state['Input Data']['Transactions']
+        if source_banks is None or source_accounts is None or len(source_accounts) == 0:
+            st.error('Please register Banks and Accounts data before scaling.')
+        else:
+            scaling_start = time.perf_counter()
+            scaled_banks, scaled_accounts, scaled_transactions = scale_scenario(
+                source_banks,
+                source_accounts,
+                source_transactions,
+                scale_factor,
+                balance_multiplier=balance_multiplier,
+                cross_replica_share=cross_replica_share,
+                seed=scale_seed
+            )
+            scaling_time = time.perf_counter() - scaling_start
+            st.session_state['Input Data'] = {'Banks': scaled_banks, 'Accounts': scaled_accounts, 'Transactions': scaled_transactions}
+            if scaled_transactions is not None:
+                st.session_state['Random Transactions'] = False
+            num_scaled_transactions = 0 if scaled_transactions is None else len(scaled_transactions)
+            st.success(f'Registered a scaled scenario with {len(scaled_banks):,} banks, {len(scaled_accounts):,} accounts '
+                       f'and {num_scaled_transactions:,} transactions (built in {scaling_time:.3f}s).')
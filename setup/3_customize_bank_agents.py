@@ -2,10 +2,11 @@ import streamlit as st
 import textwrap
 from code_editor import code_editor # uses streamlit-code-editor package
 from PSSimPy import Bank
-from PSSimPy.queues import AbstractQueue
 
+from core.agents import compile_bank_strategy
 from utils.object import SUBMIT_BUTTON
 from utils.helper import get_function_header
+from utils.session import check_agent_code
 
 st.write('# Customize Bank Agents')
 
@@ -31,22 +32,12 @@ new_strategy_implementation = code_editor(existing_strategy_implementation,
 
 if (existing_strategy_implementation != new_strategy_implementation['text']) and (new_strategy_implementation['text'] != '') and (strategy_name != ''):
     existing_strategy_implementation = "\n".join(new_strategy_implementation['text'].splitlines()[1:])
-    class CustomBank(Bank):
+    if check_agent_code('Bank Strategy', existing_strategy_implementation):
+        # compile the strategy into a new Bank class
+        CustomBank = compile_bank_strategy(strategy_name, existing_strategy_implementation)
 
-        def __init__(self, name, strategy_type=strategy_name, **kwargs):
-            super().__init__(name, strategy_type, **kwargs)
+        # Store new Bank class in session state
+        st.session_state['Bank Strategies'][strategy_name] = {'class': CustomBank, 'implementation': existing_strategy_implementation}
 
-    # full_strategy_code = f"def strategy(self):\n{textwrap.indent(existing_strategy_implementation, '    ')}"
 
-    # Use exec to dynamically define the new strategy method
-    local_vars = {}
-    exec(existing_strategy_implementation, globals(), local_vars)
-
-    # Overwrite the strategy method of CustomBank with the dynamically created function
-    CustomBank.strategy = local_vars['strategy']
-
-    # Store new Bank class in session state
-    st.session_state['Bank Strategies'][strategy_name] = {'class': CustomBank, 'implementation': existing_strategy_implementation}
-
-
-    st.success(f'Strategy "{strategy_name}" implementation updated!')
\ No newline at end of file
+        st.success(f'Strategy "{strategy_name}" implementation updated!')
\ No newline at end of file
@@ -2,16 +2,16 @@ import streamlit as st
 import inspect
 import textwrap
 from copy import copy
-from PSSimPy.constraint_handler import AbstractConstraintHandler, PassThroughHandler, MaxSizeConstraintHandler, MinBalanceConstraintHandler
+from PSSimPy.constraint_handler import PassThroughHandler, MaxSizeConstraintHandler, MinBalanceConstraintHandler
 from PSSimPy.transaction_fee import AbstractTransactionFee, FixedTransactionFee
-from PSSimPy.transaction import Transaction
-from PSSimPy.account import Account
-from PSSimPy.utils import min_balance_maintained
 from code_editor import code_editor
-from typing import Union, Dict
 
+from core.agents import compile_agent, agent_base_class, agent_methods
+from core.constraint_handlers import BatchConstraintHandler, BatchMaxSizeConstraintHandler, BatchMinBalanceConstraintHandler, BankCapConstraintHandler
+from core.fees import ScheduledTransactionFee, validate_fee_schedule
 from utils.object import SUBMIT_BUTTON
-from utils.helper import get_function_header, add_parameter_row, ClassImplementationModifier
+from utils.helper import get_function_header, ClassImplementationModifier
+from utils.session import add_parameter_row, check_agent_code
 from utils.date_time import is_24_hour_format
 
 
@@ -34,19 +34,40 @@ ootb_constraint_templates = {
     "Maximum Size": MaxSizeConstraintHandler,
     "Minimum Balance": MinBalanceConstraintHandler,
 }
+# handlers that evaluate a whole processing window at once; custom code extends them and implements process_batch
+optimized_constraint_templates = {
+    "Maximum Size (batch)": BatchMaxSizeConstraintHandler,
+    "Minimum Balance (batch)": BatchMinBalanceConstraintHandler,
+    "Per-Bank Cap (batch)": BankCapConstraintHandler,
+}
+ootb_constraint_templates.update(optimized_constraint_templates)
 
 constraint_select = st.selectbox(
     "Select constraint handler",
-    ["", "Pass Through", "Maximum Size", "Minimum Balance", "(No Template)"],
+    ["", *ootb_constraint_templates, "(No Template)", "(No Template, batch)"],
 )
 
-if constraint_select == "(No Template)":
+# template class that the saved constraint handler extends, None for AbstractConstraintHandler
+if constraint_select == "":
+    constraint_base = st.session_state['Constraint Handler'].get('base')
+elif constraint_select in optimized_constraint_templates:
+    constraint_base = optimized_constraint_templates[constraint_select].__name__
+elif constraint_select == "(No Template, batch)":
+    constraint_base = BatchConstraintHandler.__name__
+else:
+    constraint_base = None
+# process_transaction, or process_batch for the batch templates
+constraint_method = agent_methods('Constraint Handler', constraint_base)[0]
+if constraint_base is not None:
+    st.info(f"Extends {constraint_base}. {inspect.getdoc(agent_base_class('Constraint Handler', constraint_base))}")
+
+if constraint_select in ("(No Template)", "(No Template, batch)"):
     if st.session_state["current_constraint_handler"] != constraint_select:
         st.session_state["temp_params"] = [] # reset
         st.session_state["param_counter"] = 0
     st.session_state["current_constraint_handler"] = constraint_select
     constraint_function_header = get_function_header(
-        AbstractConstraintHandler.process_transaction, is_abstract_method=True
+        getattr(agent_base_class('Constraint Handler', constraint_base), constraint_method), is_abstract_method=True
     )
     old_constraint_code = f"{constraint_function_header}\n{textwrap.indent('pass', '    ')}"
 
@@ -74,7 +95,7 @@ else:
         if existing_param["name"] not in [param["name"] for param in st.session_state["temp_params"]]:
             st.session_state["temp_params"].append({"name": key, "default": value})
     constraint_template_code = inspect.getsource(
-        ootb_constraint_templates[constraint_select].process_transaction
+        getattr(ootb_constraint_templates[constraint_select], constraint_method)
     )
     old_constraint_code = textwrap.dedent("\n".join(constraint_template_code.splitlines()))
 
@@ -100,7 +121,7 @@ for i, param in enumerate(st.session_state["temp_params"]):
         default_value = st.text_input(
             "Default Value (optional)", 
             key=f"default_value_{i}", 
-            value=param["default"] or "", 
+            value="" if param["default"] is None else str(param["default"]), 
             placeholder="Enter default value"
         )
         # Store None if the input is blank
@@ -121,34 +142,16 @@ constraint_implementation['text'] = "\n".join(constraint_implementation['text'].
 if (constraint_implementation['text'] != '') and (
     (constraint_implementation['text'] != st.session_state['Constraint Handler']['implementation'])
     or (st.session_state['Constraint Handler']['params'] != st.session_state['temp_params'])
+    or (constraint_base != st.session_state['Constraint Handler'].get('base'))
     ):
-    # initialize constraint handler class with provided implementation
-    class CustomConstraintHandler(AbstractConstraintHandler):
-        def __init__(self):
-            super().__init__()
-
-        # implement placeholder abstract function
-        def process_transaction(self, transaction):        
-            pass
-
-    init_implementation = ClassImplementationModifier.generate_init_method({param["name"]: param["default"] for param in st.session_state['temp_params']}, True, "AbstractConstraintHandler")
-    # Use exec to dynamically define the new constraint method
-    exec_env = {
-            'Transaction': Transaction,
-            'AbstractConstraintHandler': AbstractConstraintHandler,
-            'min_balance_maintained': min_balance_maintained
-    }
-    exec(init_implementation, globals(), exec_env)
-    exec(constraint_implementation['text'], globals(), exec_env)
-
-    # overwrite placeholder init and abstract functions
-    CustomConstraintHandler.__init__ = exec_env['__init__']
-    CustomConstraintHandler.process_transaction = exec_env['process_transaction']
-
-    # commit to session state
-    st.session_state['Constraint Handler'] = {'class': CustomConstraintHandler, 'implementation': constraint_implementation['text'], 'params': copy(st.session_state['temp_params'])}
-
-    st.success('Constraint logic saved')
+    if check_agent_code('Constraint Handler', constraint_implementation['text'], base=constraint_base):
+        # compile constraint handler class with provided implementation
+        CustomConstraintHandler = compile_agent('Constraint Handler', constraint_implementation['text'], st.session_state['temp_params'], constraint_base)
+
+        # commit to session state
+        st.session_state['Constraint Handler'] = {'class': CustomConstraintHandler, 'implementation': constraint_implementation['text'], 'params': copy(st.session_state['temp_params']), 'base': constraint_base}
+
+        st.success('Constraint logic saved')
 
 # Transaction Fee
 st.write('## Define Transaction Fee')
@@ -159,7 +162,7 @@ if is_dynamic_fee:
     num_rows = st.number_input("Number of time-rate pairs", min_value=1, max_value=24, value=1, step=1)
 
     # Create input fields dynamically for each time-rate pair
-    time_rate_pairs = {}
+    time_rate_pairs = []
     for i in range(num_rows):
         cols = st.columns([2, 1])  # Adjust the column ratio
         with cols[0]:
@@ -169,22 +172,38 @@ if is_dynamic_fee:
         with cols[1]:
             rate = st.number_input(f"Rate {i+1}", min_value=0.0, max_value=1.0, step=0.0001, format="%.4f", key=f"rate_{i}")
         
-        # Store the input in the dictionary
-        time_rate_pairs[time] = rate
+        time_rate_pairs.append((time, rate))
 
-    # Save the dictionary to session state
-    st.session_state['Transaction Fee']['rate'] = time_rate_pairs
+    # only a valid schedule is saved, so that fee handlers can compile it without further checks
+    fee_schedule_problems = validate_fee_schedule(time_rate_pairs)
+    if fee_schedule_problems:
+        st.error('The time-rate pairs were not saved: ' + ' '.join(fee_schedule_problems))
+    else:
+        # Save the dictionary to session state, ordered by time
+        st.session_state['Transaction Fee']['rate'] = dict(sorted(time_rate_pairs, key=lambda pair: pair[0].zfill(5)))
     st.write('Current Time-Rate pairs:', st.session_state['Transaction Fee']['rate'])
-
-    # Save the dictionary to session state
-    st.session_state['Transaction Fee']['rate'] = time_rate_pairs
+    first_time = next(iter(st.session_state['Transaction Fee']['rate']), None) if isinstance(st.session_state['Transaction Fee']['rate'], dict) else None
+    if first_time is not None and first_time.zfill(5) != '00:00':
+        st.caption(f'Transactions settled before {first_time} are charged the rate of {first_time}.')
 else:
     st.session_state['Transaction Fee']['rate'] = st.number_input('Fixed Rate', min_value=0.0, max_value=1.0, step=0.0001)
 
 st.write('### Fee Logic')
 # let users select from fee template or define their own
-ootb_fee_templates = {'Fixed Rate': FixedTransactionFee}
-fee_select = st.selectbox('Select constraint handler', ['', 'Fixed Rate', '(No Template)'])
+ootb_fee_templates = {'Fixed Rate': FixedTransactionFee, 'Scheduled Rate (optimized)': ScheduledTransactionFee}
+fee_select = st.selectbox('Select constraint handler', ['', *ootb_fee_templates, '(No Template)'])
+# template class that the saved fee handler extends, None for AbstractTransactionFee
+if fee_select == '':
+    fee_base = st.session_state['Transaction Fee'].get('base')
+elif fee_select == 'Scheduled Rate (optimized)':
+    fee_base = ScheduledTransactionFee.__name__
+else:
+    fee_base = None
+if fee_base is not None:
+    fee_base_class = agent_base_class('Transaction Fee', fee_base)
+    st.info(f"Extends {fee_base}. {inspect.getdoc(fee_base_class)}"
+            + (" Use self.fee_schedule(rate).fees(amounts, time) to price many transactions at once."
+               if issubclass(fee_base_class, ScheduledTransactionFee) else ""))
 if fee_select == '(No Template)':
     # get function header of abstract method in the Transaction Fee Handler
     fee_function_header = get_function_header(AbstractTransactionFee.calculate_fee, is_abstract_method=True)
@@ -208,25 +227,17 @@ fee_implementation = code_editor('\n' + old_fee_code, # pad empty first line
 
 # save session state on submit
 fee_implementation['text'] = "\n".join(fee_implementation['text'].splitlines()[1:]) # strip first empty line
-if (fee_implementation['text'] != '') and (fee_implementation['text'] != st.session_state['Transaction Fee']['implementation']):
-    # initialize transactino fee handler class with provided implementation
-    class CustomTransactionFee(AbstractTransactionFee):
-        def __init__(self):
-            super().__init__()
-
-        # implement placeholder abstract function
-        def calculate_fee(self, txn_amount: int, time: str, rate: Union[float, Dict[str, float]]) -> float:
-            pass
-    
-    # Use exec to dynamically define the new constraint method
-    local_vars = {}
-    exec(fee_implementation['text'], globals(), local_vars)
-
-    # overwrite placeholder abstract function
-    CustomTransactionFee.process_transaction = local_vars['calculate_fee']
-
-    # commit to session state
-    st.session_state['Transaction Fee']['class'] = CustomTransactionFee
-    st.session_state['Transaction Fee']['implementation'] = fee_implementation['text']
-
-    st.success('Constraint logic saved')
\ No newline at end of file
+if (fee_implementation['text'] != '') and (
+    (fee_implementation['text'] != st.session_state['Transaction Fee']['implementation'])
+    or (fee_base != st.session_state['Transaction Fee'].get('base'))
+):
+    if check_agent_code('Transaction Fee', fee_implementation['text'], base=fee_base):
+        # compile transaction fee handler class with provided implementation
+        CustomTransactionFee = compile_agent('Transaction Fee', fee_implementation['text'], st.session_state['Transaction Fee']['params'], fee_base)
+
+        # commit to session state
+        st.session_state['Transaction Fee']['class'] = CustomTransactionFee
+        st.session_state['Transaction Fee']['implementation'] = fee_implementation['text']
+        st.session_state['Transaction Fee']['base'] = fee_base
+
+        st.success('Constraint logic saved')
\ No newline at end of file
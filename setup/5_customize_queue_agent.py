@@ -1,20 +1,37 @@
 import streamlit as st
 import inspect
 import textwrap
-from typing import Tuple, List, Set
-from sortedcontainers import SortedList
 from code_editor import code_editor
 from PSSimPy.queues import AbstractQueue, DirectQueue, FIFOQueue, PriorityQueue
-from PSSimPy.utils import min_balance_maintained
-from PSSimPy import Transaction
 
+from core.agents import compile_agent
+from core.queues import QUEUE_TEMPLATE_CLASSES, SenderFIFOQueue, BypassFIFOQueue, HeapPriorityQueue
 from utils.object import SUBMIT_BUTTON
 from utils.helper import get_function_header
+from utils.session import check_agent_code
 
 st.write('# Customize Queue Agent')
 
 ootb_queue_templates = {'Direct Queue': DirectQueue, 'FIFO Queue': FIFOQueue, 'Priority Queue': PriorityQueue}
-queue_select = st.selectbox('Select queue template', ['', 'Direct Queue', 'FIFO Queue', 'Priority Queue', '(No Template)'])
+# queues indexed by sender account that scale to large backlogs; custom code extends them rather than AbstractQueue
+optimized_queue_templates = {
+    'Sender FIFO Queue (optimized)': SenderFIFOQueue,
+    'Bypass FIFO Queue (optimized)': BypassFIFOQueue,
+    'Heap Priority Queue (optimized)': HeapPriorityQueue
+}
+ootb_queue_templates.update(optimized_queue_templates)
+queue_select = st.selectbox('Select queue template', ['', *ootb_queue_templates, '(No Template)'])
+
+# template class that the saved queue extends, None for AbstractQueue
+if queue_select == '':
+    queue_base = st.session_state['Queue'].get('base')
+elif queue_select in optimized_queue_templates:
+    queue_base = optimized_queue_templates[queue_select].__name__
+else:
+    queue_base = None
+if queue_base is not None:
+    # the template's docstring describes its behaviour and complexity
+    st.info(f"Extends {queue_base}. {inspect.getdoc(QUEUE_TEMPLATE_CLASSES[queue_base])}")
 
 if queue_select == '(No Template)':
     # get abstract function headers
@@ -45,37 +62,17 @@ queue_implementation = code_editor('\n' + old_merged_code, # pad empty first lin
 
 # save to session state on save
 queue_implementation['text'] = "\n".join(queue_implementation['text'].splitlines()[1:]) # strip first empty line
-if (queue_implementation['text'] != '') and (queue_implementation['text'] != st.session_state['Queue']['implementation']):
-    # initialize transaction fee handler class with provided implementation
-    class CustomQueue(AbstractQueue):
-
-        def __init__(self):
-            super().__init__()
-
-        def sorting_logic(queue_item):
-            pass
-
-        def dequeue_criteria(queue_item):
-            pass
-
-    # Use exec to dynamically define the new constraint method
-    exec_env = {
-            'AbstractQueue': AbstractQueue,
-            'Transaction': Transaction,
-            'Tuple': Tuple,
-            'List': List,
-            'Set': Set,
-            'SortedList': SortedList,
-            'min_balance_maintained': min_balance_maintained
-    }
-    exec(queue_implementation['text'], globals(), exec_env)
-
-    # add abstract function implementation
-    CustomQueue.sorting_logic = exec_env['sorting_logic']
-    CustomQueue.dequeue_criteria = exec_env['dequeue_criteria']
+if (queue_implementation['text'] != '') and (
+    (queue_implementation['text'] != st.session_state['Queue']['implementation'])
+    or (queue_base != st.session_state['Queue'].get('base'))
+):
+    if check_agent_code('Queue', queue_implementation['text']):
+        # compile queue class with provided implementation
+        CustomQueue = compile_agent('Queue', queue_implementation['text'], st.session_state['Queue']['params'], queue_base)
 
-    # commit to session state
-    st.session_state['Queue']['class'] = CustomQueue
-    st.session_state['Queue']['implementation'] = queue_implementation['text']
+        # commit to session state
+        st.session_state['Queue']['class'] = CustomQueue
+        st.session_state['Queue']['implementation'] = queue_implementation['text']
+        st.session_state['Queue']['base'] = queue_base
 
-    st.success('Queue logic saved')
\ No newline at end of file
+        st.success('Queue logic saved')
\ No newline at end of file
@@ -4,10 +4,12 @@ import textwrap
 from copy import copy, deepcopy
 from code_editor import code_editor
 from PSSimPy.credit_facilities import AbstractCreditFacility, SimpleCollateralized, SimplePriced
-from PSSimPy import Account
 
+from core.agents import compile_agent
+from core.credit_facilities import CREDIT_FACILITY_TEMPLATE_CLASSES, IndexedPricedCreditFacility, IndexedCollateralizedCreditFacility
 from utils.object import SUBMIT_BUTTON
-from utils.helper import get_function_header, add_parameter_row, ClassImplementationModifier
+from utils.helper import get_function_header, ClassImplementationModifier
+from utils.session import add_parameter_row, check_agent_code
 
 # Initialize session state variables if they don't exist
 if "temp_facility_params" not in st.session_state:
@@ -19,7 +21,24 @@ if "current_facility" not in st.session_state:
 
 st.write('# Customize Credit Facility Agent')
 ootb_facility_templates = {'Simple Priced': SimplePriced, 'Simple Collateralized': SimpleCollateralized}
-facility_select = st.selectbox('Select credit facility template', ['', 'Simple Priced', 'Simple Collateralized', '(No Template)'])
+# facilities that index outstanding credit by account; custom code extends them rather than AbstractCreditFacility
+optimized_facility_templates = {
+    'Indexed Priced (optimized)': IndexedPricedCreditFacility,
+    'Indexed Collateralized (optimized)': IndexedCollateralizedCreditFacility
+}
+ootb_facility_templates.update(optimized_facility_templates)
+facility_select = st.selectbox('Select credit facility template', ['', *ootb_facility_templates, '(No Template)'])
+
+# template class that the saved credit facility extends, None for AbstractCreditFacility
+if facility_select == '':
+    facility_base = st.session_state['Credit Facility'].get('base')
+elif facility_select in optimized_facility_templates:
+    facility_base = optimized_facility_templates[facility_select].__name__
+else:
+    facility_base = None
+if facility_base is not None:
+    st.info(f"Extends {facility_base}. {inspect.getdoc(CREDIT_FACILITY_TEMPLATE_CLASSES[facility_base])} "
+            "Record loans with self.record_loan(account, amount) and repay them with self.repay_loans(account) to keep the totals indexed.")
 
 if facility_select == '(No Template)':
     if st.session_state["current_facility"] != facility_select:
@@ -92,7 +111,7 @@ for i, param in enumerate(st.session_state["temp_facility_params"]):
         default_value = st.text_input(
             "Default Value (optional)", 
             key=f"default_value_{i}", 
-            value=str(param["default"]) if isinstance(param["default"], (dict, list)) else param["default"] or "", 
+            value="" if param["default"] is None else str(param["default"]), 
             placeholder="Enter default value"
         )
         # Store None if the input is blank
@@ -108,39 +127,18 @@ facility_implementation = code_editor('\n' + old_merged_code, # pad empty first
 
 # save to session state on save
 facility_implementation['text'] = "\n".join(facility_implementation['text'].splitlines()[1:]) # strip first empty line
-if (facility_implementation['text'] != '') and (facility_implementation['text'] != st.session_state['Credit Facility']['implementation']):
-    # initialize credit facility class with provided implementation
-    class CustomCreditFacility(AbstractCreditFacility):
-
-        def __init__(self):
-            super().__init__()
-
-        # placeholder abstract function implementations
-        def calculate_fee(self, amount):
-            pass
-        def lend_credit(self, account, amount):
-            pass
-        def collect_repayment(self, account):
-            pass
-
-    init_implementation = ClassImplementationModifier.generate_init_method({param["name"]: param["default"] for param in st.session_state['temp_facility_params']}, True, "AbstractCreditFacility")
-    # Use exec to dynamically define the new methods
-    exec_env = {
-            'AbstractCreditFacility': AbstractCreditFacility,
-            'Account': Account
-    }
-    exec(init_implementation, globals(), exec_env)
-    exec(facility_implementation['text'], globals(), exec_env)
-
-    # add abstract function implementation
-    CustomCreditFacility.__init__ = exec_env['__init__']
-    CustomCreditFacility.calculate_fee = exec_env['calculate_fee']
-    CustomCreditFacility.lend_credit = exec_env['lend_credit']
-    CustomCreditFacility.collect_repayment = exec_env['collect_repayment']
-
-    # commit to session state
-    st.session_state['Credit Facility']['class'] = CustomCreditFacility
-    st.session_state['Credit Facility']['implementation'] = facility_implementation['text']
-    st.session_state['Credit Facility']['params'] = copy(st.session_state['temp_facility_params'])
-
-    st.success('Credit Facility logic saved')
\ No newline at end of file
+if (facility_implementation['text'] != '') and (
+    (facility_implementation['text'] != st.session_state['Credit Facility']['implementation'])
+    or (facility_base != st.session_state['Credit Facility'].get('base'))
+):
+    if check_agent_code('Credit Facility', facility_implementation['text']):
+        # compile credit facility class with provided implementation
+        CustomCreditFacility = compile_agent('Credit Facility', facility_implementation['text'], st.session_state['temp_facility_params'], facility_base)
+
+        # commit to session state
+        st.session_state['Credit Facility']['class'] = CustomCreditFacility
+        st.session_state['Credit Facility']['implementation'] = facility_implementation['text']
+        st.session_state['Credit Facility']['base'] = facility_base
+        st.session_state['Credit Facility']['params'] = copy(st.session_state['temp_facility_params'])
+
+        st.success('Credit Facility logic saved')
\ No newline at end of file
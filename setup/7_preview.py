@@ -1,10 +1,20 @@
 import os
+import time
+import functools
+import tempfile
 import streamlit as st
+import pandas as pd
 import plotly.express as px
-from PSSimPy.simulator import ABMSim
-from PSSimPy.constraint_handler import AbstractConstraintHandler
 
-from utils.file import log_file_reader, delete_log_files
+from core.config import SimulationConfig
+from core.checkpoint import list_checkpoints, load_checkpoint
+from core.fastpath import fast_path_blockers
+from core.liquidity import liquidity_bounds, window_net_debits, BELOW_LOWER_BOUND, BETWEEN_BOUNDS
+from core.optimizer import TARGET_METRICS, LiquidityOptimizer, SettlementTarget
+from core.runner import run_simulation
+from core.sandbox import SandboxError, SandboxLimits
+from utils.resources import LOG_SPILL_THRESHOLD_MB, LOG_SPILL_DIR, SANDBOX_ENABLED, SANDBOX_CPU_SECONDS, SANDBOX_MEMORY_MB, CHECKPOINT_DIR, \
+    get_run_scheduler, get_sandbox_pool
 from utils.session import save_simulation_settings
 
 st.markdown("# Preview")
@@ -32,26 +42,112 @@ st.divider()
 # Section 2: Banks and Accounts
 st.markdown("## Banks and Accounts")
 
-# Create a hierarchical sunburst chart for banks and accounts
-df_banks = st.session_state['Input Data']['Banks']
-if 'strategy_type' not in df_banks.columns:
-    # default strategy type to "Normal" if no strategy specified
-    df_banks['strategy_type'] = 'Normal'
-df_accounts = st.session_state['Input Data']['Accounts'].merge(df_banks, left_on='owner', right_on='name')
-df_sunburst = df_accounts.copy()
-df_sunburst['level_0'] = 'Banks'
-
-fig = px.sunburst(df_sunburst, 
-                  path=['level_0', 'strategy_type', 'owner', 'id'], 
-                  title='Bank-Account Hierarchy with Strategies',
-                  color='strategy_type',  # Color by strategy type for clear differentiation
-                  color_discrete_sequence=px.colors.qualitative.Set3
-                  )
-st.plotly_chart(fig)
+if len(st.session_state['Input Data']['Banks']) == 0 or len(st.session_state['Input Data']['Accounts']) == 0:
+    st.info('No Banks and Accounts data registered yet. Please register them on the Input Data page.')
+else:
+    # Create a hierarchical sunburst chart for banks and accounts
+    df_banks = st.session_state['Input Data']['Banks']
+    if 'strategy_type' not in df_banks.columns:
+        # default strategy type to "Normal" if no strategy specified (without modifying the registered data, which may be shared)
+        df_banks = df_banks.assign(strategy_type='Normal')
+    df_accounts = st.session_state['Input Data']['Accounts'].merge(df_banks, left_on='owner', right_on='name')
+    df_sunburst = df_accounts.copy()
+    df_sunburst['level_0'] = 'Banks'
+
+    fig = px.sunburst(df_sunburst, 
+                      path=['level_0', 'strategy_type', 'owner', 'id'], 
+                      title='Bank-Account Hierarchy with Strategies',
+                      color='strategy_type',  # Color by strategy type for clear differentiation
+                      color_discrete_sequence=px.colors.qualitative.Set3
+                      )
+    st.plotly_chart(fig)
 
 st.divider()
 
-# Section 3: Show non-bank agents that have been implemented
+# Section 3: Liquidity needed to settle the registered transactions, compared with the account balances
+st.markdown("## Liquidity Bounds")
+
+if st.session_state['Input Data']['Transactions'] is None or st.session_state['Random Transactions']:
+    st.info('Liquidity bounds are computed from transactions registered on the Input Data page.')
+elif len(st.session_state['Input Data']['Banks']) == 0 or None in st.session_state['Parameters'].values():
+    st.info('Register banks and accounts and set the simulation parameters to compute liquidity bounds.')
+else:
+    liquidity_args = (st.session_state['Input Data']['Banks'], st.session_state['Input Data']['Accounts'],
+                      st.session_state['Input Data']['Transactions'], st.session_state['Parameters'])
+    bounds = liquidity_bounds(*liquidity_args)
+    st.caption('The upper bound is the liquidity a bank needs to settle every payment in the processing window it arrives in, '
+               'the lower bound what it needs if payments can wait for incoming ones until the end of the day.')
+    st.dataframe(bounds, hide_index=True)
+    num_below = int((bounds['status'] == BELOW_LOWER_BOUND).sum())
+    num_between = int((bounds['status'] == BETWEEN_BOUNDS).sum())
+    if num_below:
+        st.warning(f'{num_below} bank(s) hold less than their lower bound and cannot settle all payments without intraday credit.')
+    if num_between:
+        st.info(f'{num_between} bank(s) hold less than their upper bound, so some payments will wait for incoming ones.')
+    with st.expander('Net debit by processing window'):
+        st.dataframe(window_net_debits(*liquidity_args), hide_index=True)
+
+    # simulates the configuration at several scalings of the opening balances, see core/optimizer.py
+    with st.expander('Minimum liquidity search'):
+        col1, col2 = st.columns(2)
+        with col1:
+            target_metric = st.selectbox('Target', list(TARGET_METRICS), format_func=lambda metric: TARGET_METRICS[metric][0])
+            if TARGET_METRICS[target_metric][1] == 'min':
+                target_threshold = st.number_input('At least', min_value=0.0, max_value=1.0, value=0.99, step=0.01)
+            else:
+                target_threshold = st.number_input('At most', min_value=0.0, value=15.0, step=1.0)
+        with col2:
+            search_banks = st.multiselect('Scale the balances of', list(st.session_state['Input Data']['Banks']['name']),
+                                          placeholder='All banks')
+            search_each_bank = st.checkbox('Search each bank separately', help='Scales one bank at a time, with the other banks\' balances unchanged.')
+            search_tolerance = st.number_input('Tolerance of the scaling', min_value=0.001, value=0.05, step=0.01, format='%.3f')
+            search_credit = st.checkbox('Allow intraday credit',
+                                        help='Simulates the scalings with the configured credit facility. Without it, no credit is lent '
+                                             'and the balances have to fund the payments settled.')
+        if st.button('Search'):
+            target = SettlementTarget(target_metric, target_threshold)
+            # the simulations run sandboxed and take their turns in the simulation slots shared with other sessions
+            optimizer = LiquidityOptimizer(
+                SimulationConfig.from_session_state(st.session_state),
+                get_sandbox_pool(),
+                SandboxLimits(cpu_seconds=SANDBOX_CPU_SECONDS, memory_mb=SANDBOX_MEMORY_MB),
+                functools.partial(get_run_scheduler().submit, st.session_state['Session ID']),
+                allow_credit=search_credit
+            )
+            results = None
+            try:
+                with st.spinner('Simulating...'), optimizer:
+                    if search_each_bank:
+                        results = optimizer.search_per_bank(target, search_banks or None, tolerance=search_tolerance)
+                    else:
+                        results = {'Selected banks' if search_banks else 'All banks': optimizer.search(target, search_banks or None, tolerance=search_tolerance)}
+            except SandboxError as e:
+                st.error(str(e))
+                # expanders cannot be nested, so the traceback is shown as is
+                if e.details:
+                    st.code(e.details)
+            if results is not None:
+                st.dataframe(pd.DataFrame([
+                    {'banks': name, 'minimal_scaling': result.minimal_scaling, 'minimal_liquidity': result.minimal_liquidity,
+                     'of which intraday credit': result.minimal_credit}
+                    for name, result in results.items()
+                ]), hide_index=True)
+                st.caption('Liquidity is the opening balance of the scaled banks plus the largest intraday credit they draw. '
+                           'A scaling only meets the target if none of the scaled accounts is overdrawn.')
+                if any(result.minimal_scaling is None for result in results.values()):
+                    st.warning('The target is not met even at 64 times the current balances.')
+                if any(result.minimal_credit for result in results.values()):
+                    st.warning('The target is only met with intraday credit, as the credit facility lends the shortfall of '
+                               'every processing window. With a facility that lends without limit, even zero balances settle '
+                               'every payment, so the minimal liquidity is mostly credit drawn. Clear "Allow intraday credit" '
+                               'to find the balances needed without credit.')
+                curves = pd.concat([result.curve.assign(banks=name) for name, result in results.items()])
+                st.plotly_chart(px.line(curves, x='liquidity', y=target_metric, color='banks', markers=True,
+                                        labels={target_metric: TARGET_METRICS[target_metric][0]}))
+
+st.divider()
+
+# Section 4: Show non-bank agents that have been implemented
 st.markdown("## Agents Implemented")
 # Initialize the agent implementation states
 agents = {
@@ -80,52 +176,99 @@ if not agents['Credit Facility Agent']:
 
 st.divider()
 
-if st.button('Begin Simulation'):
-    with st.spinner('Running simulation...'):
-        # identify params
-        sim_params = {
-            'name': 'PSSimPy-web',
-            'banks': st.session_state['Input Data']['Banks'], 
-            'accounts': st.session_state['Input Data']['Accounts'],
-            'open_time': st.session_state['Parameters']['Opening Time'],
-            'close_time': st.session_state['Parameters']['Closing Time'],
-            'processing_window': st.session_state['Parameters']['Processing Window'],
-            'num_days': st.session_state['Parameters']['Number of Days'],
-            'eod_clear_queue': st.session_state['Parameters']['EOD Clear Queue'],
-            'eod_force_settlement': st.session_state['Parameters']['EOD Force Settlement'],
-            'constraint_handler': st.session_state['Constraint Handler']['class'](),
-            'queue': st.session_state['Queue']['class'](),
-            'credit_facility': st.session_state['Credit Facility']['class'](),
-            'transaction_fee_handler': st.session_state['Transaction Fee']['class'](),
-            'transaction_fee_rate': st.session_state['Transaction Fee']['rate'],
-            'strategy_mapping': {key: val['class'] for (key, val) in st.session_state['Bank Strategies'].items()}
-        }
-
-        if st.session_state['Random Transactions']:
-            sim_params['txn_arrival_prob'] = st.session_state['Transaction Probability']
-            sim_params['txn_amount_range'] = st.session_state['Transaction Amount Range']
-        else:
-            sim_params['transactions'] = st.session_state['Input Data']['Transactions']
+sandboxed = st.checkbox(
+    'Run in an isolated worker process',
+    value=SANDBOX_ENABLED,
+    help=f'Stops the simulation if it uses more than {SANDBOX_CPU_SECONDS} seconds of CPU time or {SANDBOX_MEMORY_MB} MB of memory, '
+         'e.g. because of an endless loop in custom agent code.'
+)
+# day-end checkpoints of a run are kept in a subfolder of CHECKPOINT_DIR named after the run, see core/checkpoint.py
+with st.expander('Checkpoints'):
+    checkpoint_runs = sorted(name for name in os.listdir(CHECKPOINT_DIR) if os.path.isdir(os.path.join(CHECKPOINT_DIR, name))) \
+        if os.path.isdir(CHECKPOINT_DIR) else []
+    resume_run = st.selectbox('Resume from the checkpoints of', ['', *checkpoint_runs], help='Runs with the current settings from the '
+                              'day after the checkpoint. Settings that differ from the checkpoint\'s fork the run.')
+    resume_from = None
+    if resume_run:
+        run_checkpoints = list_checkpoints(os.path.join(CHECKPOINT_DIR, resume_run))
+        resume_day = st.selectbox('Day', list(run_checkpoints), format_func=lambda day: f'After day {day}')
+        if resume_day is not None:
+            resume_from = os.path.abspath(run_checkpoints[resume_day])
+            if st.button("Load the checkpoint's settings"):
+                load_checkpoint(resume_from).config.apply_to_session_state(st.session_state)
+                st.rerun()
+    save_checkpoints = st.checkbox('Save a checkpoint after each day')
+    checkpoint_run = st.text_input('Checkpoint name', value='default', disabled=not save_checkpoints).strip()
+    if save_checkpoints and checkpoint_run == resume_run:
+        st.warning('The checkpoints of the resumed run will be replaced from the next day on. Enter another name to keep them.')
+checkpoint_dir = os.path.abspath(os.path.join(CHECKPOINT_DIR, checkpoint_run)) if save_checkpoints and checkpoint_run else None
 
-        # initialize and run simulator
-        sim = ABMSim(**sim_params)
-        sim.run()
+# configurations that only use the default agents are settled by the vectorized engine in core/fastpath.py
+fast_path_reasons = fast_path_blockers(SimulationConfig.from_session_state(st.session_state))
+if checkpoint_dir is not None or resume_from is not None:
+    st.caption('Runs on the agent-based simulator, as checkpoints are saved or resumed.')
+elif fast_path_reasons:
+    st.caption('Runs on the agent-based simulator. ' + ' '.join(fast_path_reasons))
+else:
+    st.caption('Runs on the fast path engine, which settles each processing window with NumPy and writes the same logs.')
 
-        # ingest simulation output
-        st.session_state['Log Files'] = {
-            'Processed Transactions': log_file_reader('processed_transactions'),
-            'Transaction Fees': log_file_reader('transaction_fees'),
-            'Queue Stats': log_file_reader('queue_stats'),
-            'Account Balance': log_file_reader('account_balance'),
-            'Credit Facility': log_file_reader('credit_facility')
-        }
-        if st.session_state['Random Transactions']:
-            st.session_state['Log Files']['Transactions Arrival'] = log_file_reader('transactions_arrival')
+def run_queued_simulation(config: SimulationConfig, sandbox_pool, checkpoint_dir, resume_from):
+    # runs on a thread of the run scheduler, so it must not call Streamlit
+    spill_threshold = int(LOG_SPILL_THRESHOLD_MB * 1024 * 1024)
+    if sandbox_pool is not None:
+        return sandbox_pool.run(
+            config,
+            SandboxLimits(cpu_seconds=SANDBOX_CPU_SECONDS, memory_mb=SANDBOX_MEMORY_MB),
+            spill_threshold=spill_threshold,
+            spill_dir=LOG_SPILL_DIR,
+            checkpoint_dir=checkpoint_dir,
+            resume_from=resume_from
+        )
+    # runs of other sessions may write their log files at the same time
+    with tempfile.TemporaryDirectory() as log_dir:
+        return run_simulation(config, log_dir=log_dir, spill_threshold=spill_threshold, spill_dir=LOG_SPILL_DIR,
+                              checkpoint_dir=checkpoint_dir, resume_from=resume_from)
 
-        # clear log files from directory
-        delete_log_files()
 
-    st.success('Simulation completed!')
+# runs of all sessions share a bounded number of slots, see core/scheduler.py
+scheduler = get_run_scheduler()
+# the sandbox workers are started when the page is first opened, so they are warm by the time a run starts
+sandbox_pool = get_sandbox_pool() if sandboxed else None
+run_ticket = st.session_state['Simulation Run']
+if st.button('Begin Simulation', disabled=run_ticket is not None):
+    # release the logs of the previous run first, so that its spilled log files are removed
+    st.session_state['Log Files'] = {}
+    run_ticket = st.session_state['Simulation Run'] = scheduler.submit(
+        st.session_state['Session ID'], run_queued_simulation,
+        SimulationConfig.from_session_state(st.session_state), sandbox_pool, checkpoint_dir, resume_from
+    )
+
+# a run continues when the session leaves the page, and its logs are collected when the page is opened again
+if run_ticket is not None:
+    if st.button('Cancel', disabled=run_ticket.position() is None, help='Withdraws the simulation while it waits for a slot.'):
+        run_ticket.cancel()
+    status = st.empty()
+    while not run_ticket.done():
+        position = run_ticket.position()
+        if position is None:
+            status.info('Running simulation...')
+        else:
+            status.info(f'Waiting for a free simulation slot, with {position - 1} simulation(s) ahead. '
+                        f'{scheduler.num_running} of {scheduler.max_concurrent} slots are in use.')
+        time.sleep(0.5)
+    st.session_state['Simulation Run'] = None
+    if run_ticket.future.cancelled():
+        status.warning('Simulation cancelled.')
+    else:
+        try:
+            st.session_state['Log Files'] = run_ticket.result()
+        except SandboxError as e:
+            status.error(str(e))
+            if e.details:
+                with st.expander('Details'):
+                    st.code(e.details)
+            st.stop()
+        status.success('Simulation completed!')
 
 st.write('# Export Simulation Settings')
 # Save simulation settings
@@ -138,6 +281,9 @@ with col1:
 with col2:
     # Checkbox for export option
     export_data = st.checkbox("Export data?")
+    # Parquet files are smaller and faster to import, and are stored in the zip file without further compression
+    data_format = st.selectbox("Data format", ['csv', 'parquet'], disabled=not export_data)
+    compression = st.selectbox("Compression", ['deflated', 'stored', 'bzip2', 'lzma'], help="Use 'stored' to skip compression and export faster.")
 with col3:
     # Button to save simulation settings
     if st.button("Export Simulation Settings"):
@@ -151,5 +297,5 @@ with col3:
             st.error("The setting name cannot be empty. Please enter a valid name.")
         else:
             # If no conflict, call the save function
-            save_simulation_settings(setting_name, export_data)
+            save_simulation_settings(setting_name, export_data, data_format, compression)
             st.success(f"'{setting_name}' has been successfully exported.")
\ No newline at end of file
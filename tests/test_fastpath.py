@@ -0,0 +1,8 @@
+"""Checks that the fast path engine logs the same runs as ABMSim. Run from the repository root with `python -m pytest tests`."""
+from benchmarks.benchmark import check_fast_path
+
+
+def test_fast_path_matches_abmsim():
+    rows = check_fast_path(['small'])
+    mismatched = [row['scenario'] for row in rows if not row['match']]
+    assert not mismatched, f'The fast path logs differ from ABMSim for: {mismatched}'
@@ -0,0 +1,132 @@
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from utils.date_time import add_minutes_to_time, calculate_time_difference
+
+AMOUNT_DISTRIBUTIONS = ['Log-normal', 'Pareto', 'Uniform']
+ARRIVAL_CURVES = ['Uniform', 'Morning Peak', 'Afternoon Peak', 'Bimodal']
+
+
+def _sample_amounts(rng: np.random.Generator, size: int, distribution: str, median: float, shape: float,
+                    min_amount: int, max_amount: Optional[int]) -> np.ndarray:
+    """Draws integer transaction amounts from the selected distribution."""
+    if distribution == 'Log-normal':
+        # shape is the standard deviation of the underlying normal; larger values give heavier tails
+        amounts = rng.lognormal(mean=np.log(median), sigma=shape, size=size)
+    elif distribution == 'Pareto':
+        # shape is the Pareto tail index alpha; smaller values give heavier tails
+        # the scale is chosen so that the median of the distribution equals the requested median
+        scale = median / (2 ** (1 / shape))
+        amounts = (rng.pareto(shape, size=size) + 1) * scale
+    elif distribution == 'Uniform':
+        upper = max_amount if max_amount is not None else 2 * median - min_amount
+        amounts = rng.uniform(min_amount, max(upper, min_amount), size=size)
+    else:
+        raise ValueError(f"Invalid amount distribution: {distribution}. Valid distributions are: {', '.join(AMOUNT_DISTRIBUTIONS)}")
+
+    amounts = np.rint(amounts)
+    return np.clip(amounts, min_amount, max_amount if max_amount is not None else None).astype(np.int64)
+
+
+def _sample_minutes(rng: np.random.Generator, size: int, curve: str, num_minutes: int) -> np.ndarray:
+    """Draws arrival minutes (offsets from opening time) following an intraday arrival curve."""
+    if curve == 'Uniform':
+        fractions = rng.random(size)
+    elif curve == 'Morning Peak':
+        fractions = rng.beta(2, 5, size)
+    elif curve == 'Afternoon Peak':
+        fractions = rng.beta(5, 2, size)
+    elif curve == 'Bimodal':
+        # mixture of a morning and an afternoon peak; arrivals are sorted afterwards so the components can simply be concatenated
+        num_morning = rng.binomial(size, 0.5)
+        fractions = np.concatenate([rng.beta(2, 6, num_morning), rng.beta(6, 2, size - num_morning)])
+    else:
+        raise ValueError(f"Invalid arrival curve: {curve}. Valid curves are: {', '.join(ARRIVAL_CURVES)}")
+
+    return np.minimum((fractions * num_minutes).astype(np.int64), num_minutes - 1)
+
+
+def _account_weights(rng: np.random.Generator, num_accounts: int, skew: float) -> np.ndarray:
+    """Zipf-like activity weights, randomly assigned to accounts so that the busiest accounts are not always the first rows."""
+    ranks = rng.permutation(num_accounts) + 1
+    weights = ranks.astype(np.float64) ** -skew
+    return weights / weights.sum()
+
+
+def generate_transactions(
+    accounts: pd.DataFrame,
+    num_transactions: int,
+    open_time: str = '08:00',
+    close_time: str = '17:00',
+    num_days: int = 1,
+    amount_distribution: str = 'Log-normal',
+    amount_median: float = 100,
+    amount_shape: float = 1.0,
+    min_amount: int = 1,
+    max_amount: Optional[int] = None,
+    network_skew: float = 1.0,
+    arrival_curve: str = 'Bimodal',
+    seed: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Generates a synthetic transactions dataset over the provided accounts in a single vectorized pass.
+
+    Args:
+        accounts (pd.DataFrame): Accounts data. Only the 'id' column is used.
+        num_transactions (int): Number of transactions to generate.
+        open_time (str): Opening time in 'HH:MM' format.
+        close_time (str): Closing time in 'HH:MM' format. Generated arrival times are strictly earlier than this.
+        num_days (int): Number of simulation days to spread the transactions over.
+        amount_distribution (str): One of 'Log-normal', 'Pareto' or 'Uniform'.
+        amount_median (float): Median transaction amount.
+        amount_shape (float): Sigma for 'Log-normal', tail index alpha for 'Pareto'. Ignored for 'Uniform'.
+        min_amount (int): Smallest allowed transaction amount.
+        max_amount (int): Largest allowed transaction amount, or None for no cap.
+        network_skew (float): Exponent of the Zipf-like sender/recipient activity weights. 0 gives a uniform network.
+        arrival_curve (str): One of 'Uniform', 'Morning Peak', 'Afternoon Peak' or 'Bimodal'.
+        seed (int): Seed for the random number generator. The same seed always produces the same dataset.
+
+    Returns:
+        pd.DataFrame: Transactions with columns 'sender_account', 'recipient_account', 'amount', 'time' and 'day',
+            sorted by day and time.
+    """
+    account_ids = accounts['id'].to_numpy()
+    num_accounts = len(account_ids)
+    if num_accounts < 2:
+        raise ValueError("At least two accounts are required to generate transactions.")
+    num_minutes = int(calculate_time_difference(open_time, close_time))
+    if num_minutes == 0:
+        raise ValueError("Closing time must be later than opening time.")
+
+    rng = np.random.default_rng(seed)
+
+    # sender and recipient networks
+    weights = _account_weights(rng, num_accounts, network_skew)
+    senders = rng.choice(num_accounts, size=num_transactions, p=weights)
+    recipients = rng.choice(num_accounts, size=num_transactions, p=weights)
+    # shift self-payments to a different account
+    self_payments = senders == recipients
+    recipients[self_payments] = (
+        recipients[self_payments] + rng.integers(1, num_accounts, size=self_payments.sum())
+    ) % num_accounts
+
+    amounts = _sample_amounts(rng, num_transactions, amount_distribution, amount_median, amount_shape, min_amount, max_amount)
+    minutes = _sample_minutes(rng, num_transactions, arrival_curve, num_minutes)
+    days = rng.integers(0, num_days, size=num_transactions)
+
+    # arrivals are drawn independently of the other columns, so only the arrival slots need ordering
+    # a counting sort over the (day, minute) slots does this in linear time
+    slot_counts = np.bincount(days * num_minutes + minutes, minlength=num_days * num_minutes)
+    slots = np.repeat(np.arange(num_days * num_minutes), slot_counts)
+
+    # map minute offsets to 'HH:MM' labels through a lookup table
+    time_labels = np.array([add_minutes_to_time(open_time, minute) for minute in range(num_minutes)], dtype=object)
+
+    return pd.DataFrame({
+        'sender_account': account_ids[senders],
+        'recipient_account': account_ids[recipients],
+        'amount': amounts,
+        'time': time_labels[slots % num_minutes],
+        'day': slots // num_minutes + 1
+    })
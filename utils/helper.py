@@ -3,7 +3,6 @@ import inspect
 import textwrap
 import re
 import ast
-import streamlit as st
 from collections import OrderedDict
 
 def initialize_dict_key(dictionary: dict, key, initialization_value):
@@ -57,6 +56,8 @@ def format_value(value):
         try:
             # Attempt to parse the string as a Python literal
             literal_value = ast.literal_eval(value)
+            if literal_value is None:
+                return 'None'
             if isinstance(literal_value, (int, float, dict, list)):
                 print(f"'{value}' is converted to {type(literal_value).__name__}: {literal_value}")
                 return literal_value
@@ -109,14 +110,6 @@ def remove_one_indent_level(text):
     return "\n".join(dedented_lines)
 
 
-def add_parameter_row(temp_param_name: str, temp_param_counter: str):
-    """Add a new parameter row."""
-    st.session_state[temp_param_name].append(
-        {"name": "", "default": None}
-    )
-    st.session_state[temp_param_counter] += 1
-
-
 class ClassImplementationModifier():
 
     def __init__(self, code: str):
@@ -307,6 +300,7 @@ class ClassImplementationModifier():
         Returns:
             dict: A dictionary with parameter names as keys and default values as values.
                 If a parameter has no default value, its value in the dictionary is None.
+                A default of None is returned as the text 'None', so that the parameter stays optional.
         """
         # Parse the code into an AST
         try:
@@ -365,6 +359,9 @@ class ClassImplementationModifier():
         # For parameters with defaults, get the default value
         for name, default in zip(param_names[num_non_defaults:], defaults):
             # default is an AST node, we need to evaluate it
+            if isinstance(default, ast.Constant) and default.value is None:
+                params[name] = 'None'
+                continue
             try:
                 # For safety, we can use ast.literal_eval, which supports simple constants
                 default_value = ast.literal_eval(default)
@@ -436,3 +433,155 @@ class ClassImplementationModifier():
         # Generate the final __init__ method
         init_method = f"def __init__(self{last_comma_string}{all_params}):\n    {body}"
         return init_method
+
+
+class ClassCodeAssembler():
+    """
+    Edits the source code of a class like ClassImplementationModifier, with identical results, but parses the code only once.
+
+    The source is kept as a list of lines, together with the line span of every function definition found when parsing.
+    Edits splice lines and shift the spans of the functions below them, so that no edit needs to search or parse the
+    whole code again, and replacing a function can never hit an identical piece of text elsewhere in the code.
+    """
+
+    CLASS_NAME_PATTERN = r"^class\s+\w+\s*(\(.*\))?:"
+
+    def __init__(self, code: str):
+        self._lines = code.split('\n')
+        self._functions = {}  # function name -> list of [start line, def line, end line) spans, decorators included
+        self._syntax_error = None
+        self._index_functions(code, 0)
+
+    @property
+    def code(self) -> str:
+        return '\n'.join(self._lines)
+
+    def _index_functions(self, code: str, line_offset: int):
+        """Adds the spans of the function definitions in code, which starts at the given line of the assembled code."""
+        try:
+            tree = ast.parse(textwrap.dedent(code))
+        except SyntaxError as e:
+            # like ClassImplementationModifier, invalid code is only reported when a function needs to be found again
+            self._syntax_error = e
+            return
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef):
+                start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+                self._functions.setdefault(node.name, []).append(
+                    [start - 1 + line_offset, node.lineno - 1 + line_offset, node.end_lineno + line_offset]
+                )
+
+    def _find_function(self, function_name: str):
+        if self._syntax_error is not None:
+            raise SyntaxError(f"Syntax error in code: {self._syntax_error}")
+        spans = self._functions.get(function_name)
+        # ClassImplementationModifier finds the last definition in the order of the source
+        return max(spans, key=lambda span: span[1]) if spans else None
+
+    def _splice(self, start: int, end: int, new_lines: list):
+        """Replaces lines start to end (exclusive) and shifts the spans of the functions below them."""
+        self._lines[start:end] = new_lines
+        shift = len(new_lines) - (end - start)
+        for name, spans in self._functions.items():
+            kept_spans = []
+            for span in spans:
+                if span[0] >= end:
+                    # below the spliced lines
+                    kept_spans.append([line + shift for line in span])
+                elif span[2] <= start:
+                    # above the spliced lines
+                    kept_spans.append(span)
+                elif span[0] < start or span[2] > end:
+                    # enclosing the spliced lines; functions within them are dropped
+                    kept_spans.append([span[0], span[1] + shift if span[1] >= end else span[1], span[2] + shift])
+            self._functions[name] = kept_spans
+
+    def _insert_text(self, line: int, text: str, at_line_end: bool = False):
+        """Inserts text at the start (or end) of a line, as inserting it into the code string would."""
+        parts = text.split('\n')
+        if at_line_end:
+            self._lines[line] += parts[0]
+            self._splice(line + 1, line + 1, parts[1:])
+            return line + 1
+        self._lines[line] = parts[-1] + self._lines[line]
+        self._splice(line, line, parts[:-1])
+        return line
+
+    def replace_class_name(self, new_class_name: str):
+        for i, line in enumerate(self._lines):
+            if re.match(self.CLASS_NAME_PATTERN, line):
+                self._lines[i] = re.sub(self.CLASS_NAME_PATTERN, f"class {new_class_name}:", line, count=1)
+                return
+
+    def replace_function(self, function_name: str, new_function_code: str):
+        """
+        Replace or insert a function in the class code.
+
+        Args:
+            function_name (str): The name of the function to replace or insert.
+            new_function_code (str): The code of the new function to insert or replace.
+        """
+        span = self._find_function(function_name)
+        if span is not None:
+            start, _, end = span
+            match = re.match(r"(\s*)def", self._lines[start]) or re.match(r"(\s*)@", self._lines[start])
+            if not match:
+                raise ValueError(f"Could not extract indentation from function '{function_name}'.")
+            new_lines = f"\n{self._indent(new_function_code, match.group(1))}\n".split('\n')
+            self._splice(start, end, new_lines)
+            # the new code starts after the empty line inserted before it
+            self._index_functions(new_function_code, start + 1)
+            return
+
+        class_indentation = re.match(r"(\s*)class", self.code).group(1)
+        new_code = f"\n{self._indent(new_function_code, class_indentation + '    ')}\n"
+        init_span = self._find_function('__init__')
+        if init_span is not None:
+            # insert right after __init__
+            first_line = self._insert_text(init_span[2] - 1, new_code, at_line_end=True)
+        else:
+            # insert at the start of the class body
+            code = self.code
+            class_match = re.search(r'(class\s+\w+\s*(\(.*\))?:\s*\n)', code)
+            if not class_match:
+                raise ValueError("Could not find class definition. Please ensure the class follows the correct syntax.")
+            first_line = self._insert_text(code.count('\n', 0, class_match.end()), new_code) + 1
+        self._index_functions(new_function_code, first_line)
+
+    @staticmethod
+    def _indent(code: str, indentation: str) -> str:
+        return "\n".join(indentation + line if line.strip() else "" for line in code.splitlines())
+
+    def insert_import_statement(self, import_statement: str):
+        self._insert_text(0, f"{import_statement}\n\n")
+
+    @staticmethod
+    def extract_functions(code: str, function_names: list) -> dict:
+        """
+        Extracts the code of several functions, including their decorators, with a single parse.
+        Returns the same code as ClassImplementationModifier.extract_function_code for each name, or an empty string if not found.
+        """
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            raise SyntaxError(f"Syntax error in code: {e}")
+
+        function_nodes = {}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef) and node.name in function_names:
+                current = function_nodes.get(node.name)
+                if current is None or node.lineno > current.lineno:
+                    function_nodes[node.name] = node
+
+        code_lines = code.splitlines()
+        functions = {}
+        for name in function_names:
+            node = function_nodes.get(name)
+            if node is None:
+                functions[name] = ""
+                continue
+            decorator_lines = []
+            for decorator in node.decorator_list:
+                decorator_lines.extend(code_lines[decorator.lineno - 1:decorator.end_lineno])
+            functions[name] = "\n".join(decorator_lines + code_lines[node.lineno - 1:node.end_lineno])
+        return functions
@@ -0,0 +1,60 @@
+"""
+Settings of the app from PSSIMPY_WEB_* environment variables, and the resources shared by all of its sessions.
+
+The core modules behind the resources are imported by their getters, so importing this module stays cheap.
+"""
+import os
+import streamlit as st
+
+# set to a folder to keep uploaded datasets as memory-mapped Arrow files
+DATASET_STORE_DIR = os.environ.get('PSSIMPY_WEB_DATASET_DIR')
+# simulation logs larger than this many megabytes are spilled to memory-mapped files instead of being held in memory
+LOG_SPILL_THRESHOLD_MB = float(os.environ.get('PSSIMPY_WEB_SPILL_THRESHOLD_MB', 256))
+# folder for spilled logs, defaults to the system's temporary folder
+LOG_SPILL_DIR = os.environ.get('PSSIMPY_WEB_SPILL_DIR')
+# run simulations in a separate worker process with the limits below by default
+SANDBOX_ENABLED = os.environ.get('PSSIMPY_WEB_SANDBOX', '1').lower() not in ('0', 'false', 'no')
+SANDBOX_CPU_SECONDS = int(os.environ.get('PSSIMPY_WEB_SANDBOX_CPU_SECONDS', 600))
+SANDBOX_MEMORY_MB = int(os.environ.get('PSSIMPY_WEB_SANDBOX_MEMORY_MB', 4096))
+# sandboxed runs reuse warm worker processes, each replaced after this many runs or once its peak memory exceeds this many megabytes
+SANDBOX_WORKER_MAX_RUNS = int(os.environ.get('PSSIMPY_WEB_SANDBOX_WORKER_MAX_RUNS', 50))
+SANDBOX_WORKER_MAX_MEMORY_MB = float(os.environ.get('PSSIMPY_WEB_SANDBOX_WORKER_MAX_MEMORY_MB', 1024))
+# simulations that run at the same time across all sessions, further runs wait for a free slot
+SIMULATION_SLOTS = int(os.environ.get('PSSIMPY_WEB_SIMULATION_SLOTS', os.cpu_count() or 1))
+# folder holding a subfolder of day-end checkpoints for each checkpointed run
+CHECKPOINT_DIR = os.environ.get('PSSIMPY_WEB_CHECKPOINT_DIR', './checkpoints')
+
+
+@st.cache_resource
+def get_dataset_store() -> 'DatasetStore':
+    """The dataset store shared by all sessions of the app."""
+    from core.datasets import DatasetStore
+    return DatasetStore(DATASET_STORE_DIR)
+
+
+@st.cache_resource
+def get_run_scheduler() -> 'RunScheduler':
+    """The simulation run scheduler shared by all sessions of the app."""
+    from core.scheduler import RunScheduler
+    return RunScheduler(SIMULATION_SLOTS)
+
+
+@st.cache_resource
+def get_sandbox_pool() -> 'SandboxPool':
+    """The warm sandbox workers shared by all sessions of the app, one for each simulation slot."""
+    from core.sandbox import SandboxPool
+    return SandboxPool(SIMULATION_SLOTS, SANDBOX_WORKER_MAX_RUNS, SANDBOX_WORKER_MAX_MEMORY_MB)
+
+
+def read_uploaded_csv(uploaded_file):
+    """
+    Parses an uploaded csv file through the shared dataset store, so identical uploads are parsed once and shared.
+    The returned DataFrame is shared between sessions and must not be modified in place.
+    A file that cannot be parsed is reported on the page, which stops there.
+    """
+    try:
+        _, df = get_dataset_store().get_or_parse(uploaded_file.getvalue())
+    except ValueError as e:
+        st.error(f'{uploaded_file.name}: {e}')
+        st.stop()
+    return df
@@ -0,0 +1,98 @@
+from pathlib import Path
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+
+TEMPLATE_FOLDER = Path(__file__).resolve().parent.parent / 'file_templates'
+
+
+def load_template_scenario() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Reads the Banks, Accounts and Transactions examples from the file_templates folder."""
+    # the templates are saved with a byte order mark
+    df_banks = pd.read_csv(TEMPLATE_FOLDER / 'bank_template.csv', encoding='utf-8-sig')
+    df_accounts = pd.read_csv(TEMPLATE_FOLDER / 'account_template.csv', encoding='utf-8-sig')
+    df_transactions = pd.read_csv(TEMPLATE_FOLDER / 'transaction_template.csv', encoding='utf-8-sig')
+    return df_banks, df_accounts, df_transactions
+
+
+def _replicate_rows(df: pd.DataFrame, scale_factor: int) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Stacks scale_factor copies of the dataframe and returns them with the replica number of each row."""
+    num_rows = len(df)
+    replicated = df.iloc[np.tile(np.arange(num_rows), scale_factor)].reset_index(drop=True)
+    replica = np.repeat(np.arange(scale_factor), num_rows)
+    return replicated, replica
+
+
+def _rename_for_replica(values: pd.Series, replica: np.ndarray, scale_factor: int) -> np.ndarray:
+    """
+    Renames the identifiers of the original (unreplicated) rows for each replicated row.
+    Identifiers are suffixed with their replica number; the first replica keeps the original identifiers.
+    """
+    # build the renamed label of every distinct identifier once per replica, then gather by integer index
+    codes, uniques = pd.factorize(values.astype(str))
+    uniques = np.asarray(uniques, dtype=object)
+    suffixes = np.array([''] + [f'_{k}' for k in range(1, scale_factor)], dtype=object)
+    labels = np.add.outer(uniques, suffixes).T.ravel()
+    return labels[replica * len(uniques) + np.tile(codes, scale_factor)]
+
+
+def scale_scenario(
+    banks: pd.DataFrame,
+    accounts: pd.DataFrame,
+    transactions: Optional[pd.DataFrame],
+    scale_factor: int,
+    balance_multiplier: float = 1.0,
+    cross_replica_share: float = 0.0,
+    seed: Optional[int] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame, Optional[pd.DataFrame]]:
+    """
+    Builds a larger scenario by replicating banks, accounts and transactions.
+
+    Replica k > 0 renames every bank and account by appending "_k" and remaps account owners and
+    transaction senders/recipients to the renamed identifiers of the same replica, so each replica
+    is a consistent copy of the original payment system. Any additional columns are carried over.
+
+    Args:
+        banks (pd.DataFrame): Banks data with a 'name' column.
+        accounts (pd.DataFrame): Accounts data with 'id', 'owner' and 'balance' columns.
+        transactions (pd.DataFrame): Transactions data with 'sender_account' and 'recipient_account' columns, or None.
+        scale_factor (int): Number of replicas to build.
+        balance_multiplier (float): Factor applied to every account balance.
+        cross_replica_share (float): Share of replicated transactions whose recipient is moved to the same account
+            in another replica, linking the replicas into one payment network.
+        seed (int): Seed for selecting the cross-replica transactions.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame, Optional[pd.DataFrame]]: The scaled banks, accounts and transactions.
+    """
+    if scale_factor < 1:
+        raise ValueError("Scale factor must be at least 1.")
+    if not 0.0 <= cross_replica_share <= 1.0:
+        raise ValueError("Cross-replica share must be between 0 and 1.")
+
+    # banks
+    scaled_banks, bank_replica = _replicate_rows(banks, scale_factor)
+    scaled_banks['name'] = _rename_for_replica(banks['name'], bank_replica, scale_factor)
+
+    # accounts
+    scaled_accounts, account_replica = _replicate_rows(accounts, scale_factor)
+    scaled_accounts['id'] = _rename_for_replica(accounts['id'], account_replica, scale_factor)
+    scaled_accounts['owner'] = _rename_for_replica(accounts['owner'], account_replica, scale_factor)
+    scaled_accounts['balance'] = scaled_accounts['balance'] * balance_multiplier
+    if not scaled_accounts['id'].is_unique:
+        raise ValueError("Scaled account ids are not unique. Please ensure no original account id ends with a replica suffix such as '_1'.")
+
+    # transactions
+    scaled_transactions = None
+    if transactions is not None:
+        scaled_transactions, txn_replica = _replicate_rows(transactions, scale_factor)
+        recipient_replica = txn_replica
+        if cross_replica_share > 0 and scale_factor > 1:
+            rng = np.random.default_rng(seed)
+            is_cross = rng.random(len(txn_replica)) < cross_replica_share
+            offsets = rng.integers(1, scale_factor, size=len(txn_replica))
+            recipient_replica = np.where(is_cross, (txn_replica + offsets) % scale_factor, txn_replica)
+        scaled_transactions['sender_account'] = _rename_for_replica(transactions['sender_account'], txn_replica, scale_factor)
+        scaled_transactions['recipient_account'] = _rename_for_replica(transactions['recipient_account'], recipient_replica, scale_factor)
+
+    return scaled_banks, scaled_accounts, scaled_transactions
@@ -1,22 +1,87 @@
+import sys
+import uuid
 import streamlit as st
-import pandas as pd
-import json
-import shutil
-import inspect
-import zipfile
-from typing import Tuple, List, Set
-from sortedcontainers import SortedList
-from pathlib import Path
-from PSSimPy import Bank, Account, Transaction
-from PSSimPy.constraint_handler import AbstractConstraintHandler, PassThroughHandler
-from PSSimPy.transaction_fee import AbstractTransactionFee, FixedTransactionFee
-from PSSimPy.queues import AbstractQueue, DirectQueue
-from PSSimPy.credit_facilities import AbstractCreditFacility, SimplePriced
-from PSSimPy.utils import min_balance_maintained
 
-from utils.helper import initialize_dict_key, replace_whitespace_with_underscore, dict_to_list, remove_one_indent_level, ClassImplementationModifier
+from utils.helper import initialize_dict_key
+
+# Session state starts with cheap placeholders so that a new session does not import pandas or PSSimPy:
+# tables are created on first access, and an agent class of None stands for the default agent
+# (see core.agents.DEFAULT_AGENT_CLASSES). Settings export and import load their dependencies when they are called.
+
+# set once the session state has been initialized, so that reruns skip building the defaults
+SESSION_INITIALIZED_KEY = '_session_initialized'
+
+# columns of the empty input tables
+INPUT_TABLE_COLUMNS = {
+        'Banks': ['name'],
+        'Accounts': ['id', 'owner', 'balance']
+}
+# logs of a simulation run, empty until a simulation has been run
+LOG_TABLE_COLUMNS = {
+        'Processed Transactions': [],
+        'Transaction Fees': [],
+        'Queue Stats': [],
+        'Account Balance': [],
+        'Credit Facility': [],
+        'Transactions Arrival': []
+}
+
+
+class LazyTables(dict):
+        """
+        Dictionary of DataFrames that creates a missing table as an empty DataFrame with its expected columns on first access.
+        Tables that are never accessed cost nothing, and iterating over the dictionary only visits materialized tables.
+        """
+        __slots__ = ('_columns',)
+
+        def __init__(self, columns: dict, **tables):
+                super().__init__(**tables)
+                self._columns = columns
+
+        def __missing__(self, key):
+                if key not in self._columns:
+                        raise KeyError(key)
+                import pandas as pd
+                table = self[key] = pd.DataFrame(columns=self._columns[key])
+                return table
+
+        def __reduce__(self):
+                return (self.__class__, (self._columns,), None, None, iter(self.items()))
+
+
+class BundleTables(dict):
+        """
+        Input data of an imported settings bundle, parsed from the bundle on first access.
+        Tables that the bundle does not contain are taken from the input data held before the import.
+        """
+        __slots__ = ('_bundle', '_previous')
+
+        # session state name of each input table and its SimulationConfig attribute
+        ATTRIBUTES = {'Banks': 'banks', 'Accounts': 'accounts', 'Transactions': 'transactions'}
+
+        def __init__(self, bundle, previous: dict, **tables):
+                super().__init__(**tables)
+                self._bundle = bundle
+                self._previous = previous
+
+        def __missing__(self, key):
+                if key not in self.ATTRIBUTES:
+                        raise KeyError(key)
+                attribute = self.ATTRIBUTES[key]
+                if self._bundle.data_file(attribute) is not None:
+                        table = self._bundle.load_data(attribute)
+                else:
+                        table = self._previous[key]
+                self[key] = table
+                return table
+
+        def __reduce__(self):
+                return (self.__class__, (self._bundle, self._previous), None, None, iter(self.items()))
+
 
 def initialize_session_state_variables():
+        if st.session_state.get(SESSION_INITIALIZED_KEY):
+                return
         # Parameters
         initialize_dict_key(st.session_state, 'Parameters', {
                 'Opening Time': None,
@@ -27,11 +92,7 @@ def initialize_session_state_variables():
                 'EOD Force Settlement': None
         })
         # Input Data
-        initialize_dict_key(st.session_state, 'Input Data', {
-                'Banks': pd.DataFrame(columns=['name']),
-                'Accounts': pd.DataFrame(columns=['id', 'owner', 'balance']),
-                'Transactions': None
-        })
+        initialize_dict_key(st.session_state, 'Input Data', LazyTables(INPUT_TABLE_COLUMNS, Transactions=None))
         # Random Transactions
         initialize_dict_key(st.session_state, 'Random Transactions', False)
         # Transaction Probability
@@ -41,314 +102,119 @@ def initialize_session_state_variables():
         # Bank Strategies
         initialize_dict_key(st.session_state, 'Bank Strategies', {})
         # Constraint Handler
-        initialize_dict_key(st.session_state, 'Constraint Handler', {'class': PassThroughHandler, 'implementation': None, 'params':[]}) # default to pass through
+        initialize_dict_key(st.session_state, 'Constraint Handler', {'class': None, 'implementation': None, 'params':[], 'base': None}) # default to pass through
         # Transaction Fee
         initialize_dict_key(st.session_state, 'Transaction Fee', {
                 'rate': 0.0,
-                'class': FixedTransactionFee, # placeholder
+                'class': None, # default to fixed transaction fee
                 'implementation': None,
-                'params': []
+                'params': [],
+                'base': None
         })
         # Queue Handler
-        initialize_dict_key(st.session_state, 'Queue', {'class': DirectQueue, 'implementation': None, 'params': []})
+        initialize_dict_key(st.session_state, 'Queue', {'class': None, 'implementation': None, 'params': [], 'base': None}) # default to direct queue
         # Credit Facility
-        initialize_dict_key(st.session_state, 'Credit Facility', {'class': SimplePriced, 'implementation': None, 'params': []})
+        initialize_dict_key(st.session_state, 'Credit Facility', {'class': None, 'implementation': None, 'params': [], 'base': None}) # default to simple priced
         # Output Files
-        initialize_dict_key(st.session_state, 'Log Files', {
-                'Processed Transactions': pd.DataFrame(),
-                'Transaction Fees': pd.DataFrame(),
-                'Queue Stats': pd.DataFrame(),
-                'Account Balance': pd.DataFrame(),
-                'Credit Facility': pd.DataFrame(),
-                'Transactions Arrival': pd.DataFrame()
-        })
-
-
-def save_simulation_settings(simulation_setting_name: str, include_data: bool=False) -> bool:
-        # create saved settings folder if it does not exist
-        Path("./saved_settings").mkdir(parents=True, exist_ok=True)
-
-        # create folder to contain settings
-        simulation_setting_name = replace_whitespace_with_underscore(simulation_setting_name)
-        settings_folder = f"./saved_settings/{simulation_setting_name}"
-        Path(settings_folder).mkdir(parents=True)
-
-        # create json file for static data
-        static_data = {
-                'Parameters': st.session_state['Parameters'], 
-                'Random Transactions': st.session_state['Random Transactions'],
-                'Transaction Probability': st.session_state['Transaction Probability'],
-                'Transaction Amount Range': st.session_state['Transaction Amount Range'],
-                'Transaction Fee Rate': st.session_state['Transaction Fee']['rate']
-                }
-        with open(f"{settings_folder}/static_data.json", "w") as file:
-                json.dump(static_data , file) 
-
-        # create bank strategy implementations
-        if st.session_state['Bank Strategies']:
-                Path(f"{settings_folder}/bank_strategies").mkdir(parents=True)
-                base_bank_code = inspect.getsource(Bank)
-                for strategy_name, value in st.session_state['Bank Strategies'].items():
-                        strategy_name = replace_whitespace_with_underscore(strategy_name)
-                        strategy_mod = ClassImplementationModifier(base_bank_code)
-                        strategy_mod.replace_class_name(strategy_name)
-                        strategy_mod_init_params = ClassImplementationModifier.generate_init_method(
-                                {'name': None, 'strategy_type': strategy_name},
-                                has_kwargs=True
-                        )
-                        strategy_mod.replace_function('__init__', strategy_mod_init_params)
-                        strategy_mod.replace_function('strategy', value['implementation'])
-                        strategy_mod.insert_import_statement('from PSSimPy.queues import AbstractQueue')
-                        # Save the generated code to a file
-                        with open(f"{settings_folder}/bank_strategies/{strategy_name}.py", "w") as f:
-                                f.write(strategy_mod.code)
-
-        # constraint handler
-        if st.session_state['Constraint Handler']['implementation'] is not None:
-                Path(f"{settings_folder}/constraint_handler").mkdir(parents=True)
-                base_constraint_handler_code = inspect.getsource(AbstractConstraintHandler)
-                constraint_handler_mod = ClassImplementationModifier(base_constraint_handler_code)
-                constraint_handler_mod.replace_class_name("CustomConstraintHandler(AbstractConstraintHandler)")
-                constraint_handler_init_params = ClassImplementationModifier.generate_init_method(
-                        {param["name"]: param["default"] for param in st.session_state['Constraint Handler']['params']}, 
-                        True,
-                        "AbstractConstraintHandler"
-                )
-                constraint_handler_mod.replace_function('__init__', constraint_handler_init_params)
-                constraint_handler_mod.replace_function('process_transaction', st.session_state['Constraint Handler']['implementation'])
-                constraint_handler_mod.insert_import_statement('from PSSimPy.constraint_handler import AbstractConstraintHandler')
-                constraint_handler_mod.insert_import_statement('from PSSimPy.transaction import Transaction')
-                # Save the generated code to a file
-                with open(f"{settings_folder}/constraint_handler/custom_constraint_handler.py", "w") as f:
-                        f.write(constraint_handler_mod.code)
-        
-        # transaction fee handler
-        if st.session_state['Transaction Fee']['implementation'] is not None:
-                Path(f"{settings_folder}/transaction_fee_handler").mkdir(parents=True)
-                base_transaction_fee_handler_code = inspect.getsource(AbstractTransactionFee)
-                transaction_fee_handler_mod = ClassImplementationModifier(base_transaction_fee_handler_code)
-                transaction_fee_handler_mod.replace_class_name("CustomTransactionFee(AbstractTransactionFee)")
-                transaction_fee_handler_init_params = ClassImplementationModifier.generate_init_method(
-                        {param["name"]: param["default"] for param in st.session_state['Transaction Fee']['params']}, 
-                        True,
-                        "AbstractTransactionFee"
-                )
-                transaction_fee_handler_mod.replace_function('__init__', transaction_fee_handler_init_params)
-                transaction_fee_handler_mod.replace_function('calculate_fee', st.session_state['Transaction Fee']['implementation'])
-                transaction_fee_handler_mod.insert_import_statement('from PSSimPy.transaction_fee import AbstractTransactionFee')
-                # Save the generated code to a file
-                with open(f"{settings_folder}/transaction_fee_handler/custom_transaction_fee_handler.py", "w") as f:
-                        f.write(transaction_fee_handler_mod.code)
-
-        # queue
-        if st.session_state['Queue']['implementation'] is not None:
-                Path(f"{settings_folder}/queue").mkdir(parents=True)
-                base_queue_code = inspect.getsource(AbstractQueue)
-                queue_mod = ClassImplementationModifier(base_queue_code)
-                queue_mod.replace_class_name("CustomQueue(AbstractQueue)")
-
-                # replace init
-                queue_init_params = ClassImplementationModifier.generate_init_method(
-                        {param["name"]: param["default"] for param in st.session_state['Queue']['params']}, 
-                        True,
-                        "AbstractQueue"
-                )
-                queue_mod.replace_function('__init__', queue_init_params)
-
-                # extract and replace custom implementation of queue functions
-                sorting_logic_code = queue_mod.extract_function_code(st.session_state['Queue']['implementation'], 'sorting_logic')
-                queue_mod.replace_function('sorting_logic', sorting_logic_code)
-                dequeue_criteria_code = queue_mod.extract_function_code(st.session_state['Queue']['implementation'], 'dequeue_criteria')
-                queue_mod.replace_function('dequeue_criteria', dequeue_criteria_code)
-
-                queue_mod.insert_import_statement('from PSSimPy.utils import min_balance_maintained')
-                queue_mod.insert_import_statement('from PSSimPy import Transaction')
-                queue_mod.insert_import_statement('from PSSimPy.queues import AbstractQueue')
-                queue_mod.insert_import_statement('from typing import Tuple')
-                # Save the generated code to a file
-                with open(f"{settings_folder}/queue/custom_queue.py", "w") as f:
-                        f.write(queue_mod.code)
-
-        # credit facility
-        if st.session_state['Credit Facility']['implementation'] is not None:
-                Path(f"{settings_folder}/credit_facility").mkdir(parents=True)
-                base_credit_facility_code = inspect.getsource(AbstractCreditFacility)
-                credit_facility_mod = ClassImplementationModifier(base_credit_facility_code)
-                credit_facility_mod.replace_class_name("CustomCreditFacility(AbstractCreditFacility)")
-
-                # replace init
-                credit_facility_init_params = ClassImplementationModifier.generate_init_method(
-                        {param["name"]: param["default"] for param in st.session_state['Credit Facility']['params']}, 
-                        True,
-                        "AbstractCreditFacility"
-                )
-                credit_facility_mod.replace_function('__init__', credit_facility_init_params)
-
-                # extract and replace custom implementation of queue functions
-                calculate_fee_code = credit_facility_mod.extract_function_code(st.session_state['Credit Facility']['implementation'], 'calculate_fee')
-                credit_facility_mod.replace_function('calculate_fee', calculate_fee_code)
-                lend_credit_code = credit_facility_mod.extract_function_code(st.session_state['Credit Facility']['implementation'], 'lend_credit')
-                credit_facility_mod.replace_function('lend_credit', lend_credit_code)
-                collect_repayment_code = credit_facility_mod.extract_function_code(st.session_state['Credit Facility']['implementation'], 'collect_repayment')
-                credit_facility_mod.replace_function('collect_repayment', collect_repayment_code)
-
-                credit_facility_mod.insert_import_statement('from PSSimPy import Account')
-                credit_facility_mod.insert_import_statement('from PSSimPy.credit_facilities import AbstractCreditFacility')
-                credit_facility_mod.insert_import_statement('from typing import List, Dict')
-                # Save the generated code to a file
-                with open(f"{settings_folder}/credit_facility/custom_credit_facility.py", "w") as f:
-                        f.write(credit_facility_mod.code)
-
-        if include_data:
-                Path(f"{settings_folder}/data").mkdir(parents=True)
-                if st.session_state['Input Data']['Banks'] is not None:
-                        st.session_state['Input Data']['Banks'].to_csv(f'{settings_folder}/data/banks.csv', index=False)
-                if st.session_state['Input Data']['Accounts'] is not None:
-                        st.session_state['Input Data']['Accounts'].to_csv(f'{settings_folder}/data/accounts.csv', index=False)
-                if st.session_state['Input Data']['Transactions'] is not None:
-                        st.session_state['Input Data']['Transactions'].to_csv(f'{settings_folder}/data/transactions.csv', index=False)
-
-        # zip settings folder
-        shutil.make_archive(f"saved_settings/{simulation_setting_name}", 'zip', settings_folder)
-
+        initialize_dict_key(st.session_state, 'Log Files', LazyTables(LOG_TABLE_COLUMNS)) # filled by a simulation run
+        # identifies the session's runs in the run scheduler shared by all sessions
+        initialize_dict_key(st.session_state, 'Session ID', uuid.uuid4().hex)
+        # ticket of the session's submitted simulation until its logs are collected
+        initialize_dict_key(st.session_state, 'Simulation Run', None)
+        st.session_state[SESSION_INITIALIZED_KEY] = True
+
+
+def save_simulation_settings(simulation_setting_name: str, include_data: bool=False, data_format: str='csv', compression: str='deflated') -> bool:
+        from core.config import SimulationConfig
+        from core.settings import write_settings_bundle
+        write_settings_bundle(
+                SimulationConfig.from_session_state(st.session_state),
+                simulation_setting_name,
+                include_data,
+                compression=compression,
+                data_format=data_format
+        )
         return True
 
 def import_simulation_setting(uploaded_file):
-        with zipfile.ZipFile(uploaded_file) as z:
-                # import parameters
-                if 'static_data.json' in z.namelist():
-                        with z.open('static_data.json') as f:
-                                data = json.load(f)
-                                st.session_state['Parameters'] = data['Parameters']
-                                st.session_state['Random Transactions'] = data['Random Transactions']
-                                st.session_state['Transaction Probability'] = data['Transaction Probability']
-                                st.session_state['Transaction Amount Range'] = data['Transaction Amount Range']
-                                st.session_state['Transaction Fee']['rate'] = data['Transaction Fee Rate']
-
-                # import data
-                if 'data/banks.csv' in z.namelist():
-                        with z.open('data/banks.csv') as f:
-                                df_banks = pd.read_csv(f)
-                                st.session_state['Input Data']['Banks'] = df_banks
-                if 'data/accounts.csv' in z.namelist():
-                        with z.open('data/accounts.csv') as f:
-                                df_accounts = pd.read_csv(f)
-                                st.session_state['Input Data']['Accounts'] = df_accounts
-                if 'data/transactions.csv' in z.namelist():
-                        with z.open('data/transactions.csv') as f:
-                                df_accounts = pd.read_csv(f)
-                                st.session_state['Input Data']['Transactions'] = df_accounts
-
-                # import bank strategies
-                bank_files = [b for b in z.namelist() if b.startswith('bank_strategies/') and b.endswith('.py')]
-                if bank_files:
-                        for bank_file in bank_files:
-                                with z.open(bank_file) as f:
-                                        file_content = f.read().decode('utf-8')  # Decode bytes to string
-                                        # st.code(file_content, language='python')
-
-                                        # compile bank class
-                                        bank_class_name = ClassImplementationModifier.get_first_class_name(file_content)
-                                        exec_env = {'AbstractQueue': AbstractQueue}
-                                        exec(file_content, globals(), exec_env)
-                                        CustomBank = exec_env[bank_class_name]
-
-                                        # populate session state
-                                        st.session_state['Bank Strategies'][bank_class_name] = {
-                                                'class': CustomBank,
-                                                'implementation': remove_one_indent_level(ClassImplementationModifier.extract_function_code(file_content, 'strategy'))
-                                        }
-
-
-
-                # import constraint handler
-                constraint_handler_files = [f for f in z.namelist() if f.startswith('constraint_handler/') and f.endswith('.py')]
-                if constraint_handler_files:
-                        constraint_handler_file = constraint_handler_files[0]
-                        with z.open(constraint_handler_file) as f:
-                                file_content = f.read().decode('utf-8')
-
-                                # compile constraint handler class
-                                constraint_handler_class_name = ClassImplementationModifier.get_first_class_name(file_content)
-                                exec_env = {
-                                        'Transaction': Transaction,
-                                        'AbstractConstraintHandler': AbstractConstraintHandler,
-                                        'min_balance_maintained': min_balance_maintained
-                                }
-                                exec(file_content, globals(), exec_env)
-                                CustomConstraintHandler = exec_env[constraint_handler_class_name]
-
-                                # populate session_state
-                                st.session_state['Constraint Handler']['class'] = CustomConstraintHandler
-                                st.session_state['Constraint Handler']['implementation'] = remove_one_indent_level(ClassImplementationModifier.extract_function_code(file_content, 'process_transaction'))
-                                st.session_state['Constraint Handler']['params'] = dict_to_list(ClassImplementationModifier.extract_init_params(file_content), 'name', 'default')
-
-                # import transaction fee handler
-                transaction_fee_handler_files = [f for f in z.namelist() if f.startswith('transaction_fee_handler/') and f.endswith('.py')]
-                if transaction_fee_handler_files:
-                        transaction_fee_handler_file = transaction_fee_handler_files[0]
-                        with z.open(transaction_fee_handler_file) as f:
-                                file_content = f.read().decode('utf-8')
-
-                                # compile transaction fee handler class
-                                transaction_fee_handler_class_name = ClassImplementationModifier.get_first_class_name(file_content)
-                                exec_env = {'AbstractTransactionFee': AbstractTransactionFee}
-                                exec(file_content, globals(), exec_env)
-                                CustomTransactionFee = exec_env[transaction_fee_handler_class_name]
-
-                                # populate session_state
-                                st.session_state['Transaction Fee']['class'] = CustomTransactionFee
-                                st.session_state['Transaction Fee']['implementation'] = remove_one_indent_level(ClassImplementationModifier.extract_function_code(file_content, 'calculate_fee'))
-                                st.session_state['Transaction Fee']['params'] = dict_to_list(ClassImplementationModifier.extract_init_params(file_content), 'name', 'default')
-
-                # import queue
-                queue_files = [f for f in z.namelist() if f.startswith('queue/') and f.endswith('.py')]
-                if queue_files:
-                        queue_file = queue_files[0]
-                        with z.open(queue_file) as f:
-                                file_content = f.read().decode('utf-8')
-
-                                # compile queue class
-                                queue_class_name = ClassImplementationModifier.get_first_class_name(file_content)
-                                exec_env = {
-                                        'AbstractQueue': AbstractQueue,
-                                        'Transaction': Transaction,
-                                        'Tuple': Tuple,
-                                        'List': List,
-                                        'Set': Set,
-                                        'SortedList': SortedList,
-                                        'min_balance_maintained': min_balance_maintained
-                                }
-                                exec(file_content, globals(), exec_env)
-                                CustomQueue = exec_env[queue_class_name]
-
-                                # populate session_state
-                                sorting_logic_code = remove_one_indent_level(ClassImplementationModifier.extract_function_code(file_content, 'sorting_logic'))
-                                dequeue_criteria_code = remove_one_indent_level(ClassImplementationModifier.extract_function_code(file_content, 'dequeue_criteria'))
-                                st.session_state['Queue']['class'] = CustomQueue
-                                st.session_state['Queue']['implementation'] = sorting_logic_code + '\n\n' + dequeue_criteria_code
-                                st.session_state['Queue']['params'] = dict_to_list(ClassImplementationModifier.extract_init_params(file_content), 'name', 'default')
-
-                # import credit facility
-                credit_facility_files = [f for f in z.namelist() if f.startswith('credit_facility/') and f.endswith('.py')]
-                if credit_facility_files:
-                        credit_facility_file = credit_facility_files[0]
-                        with z.open(credit_facility_file) as f:
-                                file_content = f.read().decode('utf-8')
-
-                                # compile credit facility class
-                                credit_facility_class_name = ClassImplementationModifier.get_first_class_name(file_content)
-                                exec_env = {
-                                        'AbstractCreditFacility': AbstractCreditFacility,
-                                        'Account': Account
-                                }
-                                exec(file_content, globals(), exec_env)
-                                CustomCreditFacility = exec_env[credit_facility_class_name]
-
-                                # populate session state
-                                calculate_fee_code = remove_one_indent_level(ClassImplementationModifier.extract_function_code(file_content, 'calculate_fee'))
-                                lend_credit_code = remove_one_indent_level(ClassImplementationModifier.extract_function_code(file_content, 'lend_credit'))
-                                collect_repayment_code = remove_one_indent_level(ClassImplementationModifier.extract_function_code(file_content, 'collect_repayment'))
-                                st.session_state['Credit Facility']['class'] = CustomCreditFacility
-                                st.session_state['Credit Facility']['implementation'] = calculate_fee_code + '\n\n' + lend_credit_code + '\n\n' + collect_repayment_code
-                                st.session_state['Credit Facility']['params'] = dict_to_list(ClassImplementationModifier.extract_init_params(file_content), 'name', 'default')
\ No newline at end of file
+        """
+        Imports a settings zip file into the session. Only its static data and agent code are read now; its data tables
+        are parsed when first accessed and its agents are compiled when first used.
+        """
+        from core.config import SimulationConfig
+        from core.settings import SettingsBundle
+        from utils.resources import get_dataset_store
+        bundle = SettingsBundle(uploaded_file, get_dataset_store())
+        bundle.validate()
+        config = bundle.to_config(SimulationConfig.from_session_state(st.session_state, include_data=False), load_data=False)
+        config.apply_to_session_state(st.session_state, include_data=False)
+        st.session_state['Input Data'] = BundleTables(bundle, st.session_state['Input Data'])
+
+def describe_simulation_setting(uploaded_file) -> dict:
+        """
+        Summarizes the contents of a settings zip file from its manifest, without importing it.
+        Raises a ValueError if the file is not a valid settings file or fails the quick integrity check.
+        """
+        from core.settings import SettingsBundle
+        bundle = SettingsBundle(uploaded_file)
+        bundle.validate()
+        return bundle.summary()
+
+def add_parameter_row(temp_param_name: str, temp_param_counter: str):
+        """Add a new parameter row."""
+        st.session_state[temp_param_name].append(
+                {"name": "", "default": None}
+        )
+        st.session_state[temp_param_counter] += 1
+
+def _memory_usage(value) -> int:
+        """Approximate size of an object in bytes, including the data of DataFrames and the contents of containers."""
+        if hasattr(value, 'memory_usage') and hasattr(value, 'columns'):
+                # pandas DataFrame
+                return int(value.memory_usage(deep=True).sum())
+        if isinstance(value, dict):
+                return sys.getsizeof(value) + sum(_memory_usage(k) + _memory_usage(v) for k, v in value.items())
+        if isinstance(value, (list, tuple, set)):
+                return sys.getsizeof(value) + sum(_memory_usage(item) for item in value)
+        return sys.getsizeof(value)
+
+def session_memory_usage() -> dict:
+        """Returns the approximate memory used by each session state entry of the current session, in bytes, largest first."""
+        usage = {key: _memory_usage(value) for key, value in st.session_state.to_dict().items()}
+        return dict(sorted(usage.items(), key=lambda item: item[1], reverse=True))
+
+def select_log_days(key: str):
+        """
+        Lets the user select a range of simulation days when any log of the run has been spilled to disk, so that only those days are loaded.
+        Returns the selected (first day, last day), or None to use the whole logs when they are all held in memory.
+        """
+        from core.spill import is_spilled_log
+        if not any(is_spilled_log(log) for log in st.session_state['Log Files'].values()):
+                return None
+        num_days = st.session_state['Parameters']['Number of Days']
+        st.caption('The logs of this run are large and kept on disk. Select the days to load.')
+        if num_days == 1:
+                return (1, 1)
+        return st.slider('Days', min_value=1, max_value=num_days, value=(1, min(num_days, 7)), key=key)
+
+def check_agent_code(agent_type: str, code: str, line_offset: int = 1, base: str = None) -> bool:
+        """
+        Lints agent code submitted in a code editor and shows the issues found.
+        Returns whether the code can be saved, i.e. no error-level issue was found. Warnings are shown but do not block saving.
+        line_offset is added to the reported line numbers, for editors that show the code below a padding line.
+        base is the template class that the code extends, which determines the methods it must define.
+        """
+        from core.agents import agent_methods
+        from core.lint import lint_agent_code
+        issues = lint_agent_code(agent_type, code, methods=agent_methods(agent_type, base))
+        errors = [issue for issue in issues if issue.severity == 'error']
+        warnings = [issue for issue in issues if issue.severity == 'warning']
+
+        def describe(issue):
+                return f"Line {issue.line + line_offset}: {issue.message} [{issue.rule}]"
+
+        if errors:
+                st.error('The code was not saved:\n\n' + '\n\n'.join(describe(issue) for issue in errors))
+        if warnings:
+                st.warning('The code may slow down the simulation:\n\n' + '\n\n'.join(describe(issue) for issue in warnings))
+        return not errors